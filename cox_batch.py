@@ -0,0 +1,242 @@
+#Cox GUI batch mode -- run the GUI's models headless from a JSON/YAML spec (no Tk, no display needed)
+#usage: python cox_batch.py spec.json [--output-dir DIR] [--check] [--trace FILE [--trace-memory]]
+#only the standard library is imported up front; pandas/numpy/lifelines load when a run actually starts.
+#
+#example spec (JSON shown; the same keys work in YAML if PyYAML is installed):
+#{
+#  "data": "example_dataset/rossi.csv",
+#  "duration": "week",
+#  "event": "arrest",
+#  "engine": "lifelines",             (or "native-efron" / "native-breslow")
+#  "ph_check": true,
+#  "out_of_core": false,              (true: sort the model's columns on disk and stream the fit; native engines only)
+#  "output_dir": "results",
+#  "models": [
+#    {"name": "age_unadjusted", "variable_of_interest": "age"},
+#    {"name": "adjusted", "covariates": ["fin", "age", "prio"]}
+#  ]
+#}
+import argparse
+import json
+import os
+import sys
+
+ENGINE_TIES = {"lifelines": None, "native-efron": "efron", "native-breslow": "breslow"}
+
+
+class SpecError(ValueError):
+    pass
+
+
+def load_spec(spec_path):
+    with open(spec_path, "r", encoding="utf-8") as handle:
+        text = handle.read()
+    if spec_path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise SpecError("YAML specs need PyYAML (pip install pyyaml); or use a .json spec.")
+        try:
+            spec = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise SpecError(f"not valid YAML: {e}")
+    else:
+        spec = json.loads(text)
+    return validate_spec(spec, base_dir=os.path.dirname(os.path.abspath(spec_path)))
+
+
+def _resolve(path, base_dir):
+    #paths in a spec are relative to the spec file, so a spec gives the same result wherever it is run from
+    return path if path is None or os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def validate_spec(spec, base_dir="."):
+    if not isinstance(spec, dict):
+        raise SpecError("the spec must be a mapping")
+    for key in ("data", "duration", "event", "models"):
+        if key not in spec:
+            raise SpecError(f"missing required key '{key}'")
+    engine = spec.get("engine", "lifelines")
+    if engine not in ENGINE_TIES:
+        raise SpecError(f"unknown engine '{engine}'; choose one of {sorted(ENGINE_TIES)}")
+    out_of_core = bool(spec.get("out_of_core", False))
+    if out_of_core and ENGINE_TIES[engine] is None:
+        raise SpecError("'out_of_core' needs a native engine ('native-efron' or 'native-breslow')")
+    block_rows = spec.get("block_rows")
+    if block_rows is not None and (not isinstance(block_rows, int) or block_rows < 1):
+        raise SpecError("'block_rows' must be a positive integer")
+    models = spec["models"]
+    if not isinstance(models, list) or not models:
+        raise SpecError("'models' must be a non-empty list")
+    normalized = []
+    for i, model in enumerate(models):
+        if not isinstance(model, dict):
+            raise SpecError(f"model {i + 1} must be a mapping with 'name' and 'covariates' or 'variable_of_interest'")
+        name = model.get("name") or f"model_{i + 1}"
+        if ("covariates" in model) == ("variable_of_interest" in model):
+            raise SpecError(f"model '{name}' needs exactly one of 'covariates' or 'variable_of_interest'")
+        if "variable_of_interest" in model:
+            normalized.append({"name": name, "covariates": [model["variable_of_interest"]], "strict": True})
+        else:
+            covariates = model["covariates"]
+            if not isinstance(covariates, list) or not covariates:
+                raise SpecError(f"model '{name}': 'covariates' must be a non-empty list")
+            normalized.append({"name": name, "covariates": list(covariates), "strict": False})
+    return {
+        "data": _resolve(spec["data"], base_dir),
+        "duration": spec["duration"],
+        "event": spec["event"],
+        "engine": engine,
+        "ph_check": bool(spec.get("ph_check", False)),
+        "use_cache": bool(spec.get("use_cache", True)),
+        "out_of_core": out_of_core,
+        "block_rows": block_rows,
+        "work_dir": _resolve(spec.get("work_dir"), base_dir),
+        "output_dir": _resolve(spec.get("output_dir", "cox_results"), base_dir),
+        "models": normalized,
+    }
+
+
+def run_model(dataset, spec, model_spec):
+    from cox_data import DataPreparationError
+    from cox_engine import fit_cox_model, model_concordance
+    from cox_ph import proportional_hazard_table
+    from cox_store import load_model, model_key, save_model
+
+    record = {"name": model_spec["name"], "requested_covariates": model_spec["covariates"]}
+    try:
+        prepared = dataset.prepare(spec["duration"], spec["event"], model_spec["covariates"], strict_covariates=model_spec["strict"])
+    except DataPreparationError as e:
+        record["error"] = str(e)
+        return record, None, None
+    record["notes"] = [note.strip() for note in prepared.notes]
+    record["warnings"] = prepared.warnings
+    record["covariates"] = prepared.covariate_cols
+    record["n_rows"] = len(prepared.frame)
+    record["n_events"] = int(prepared.frame[spec["event"]].sum())
+
+    fit_df = prepared.frame
+    ties = ENGINE_TIES[spec["engine"]]
+    #use_cache also covers the result store: an identical model fitted before is read back, not refitted
+    key = model_key(fit_df, spec["duration"], spec["event"], prepared.covariate_cols, ties) if spec["use_cache"] else None
+    model = load_model(key) if key else None
+    record["from_store"] = model is not None
+    if model is None:
+        model = fit_cox_model(fit_df, spec["duration"], spec["event"], prepared.covariate_cols, ties=ties)
+        concordance = model_concordance(model, fit_df, spec["duration"], spec["event"], prepared.covariate_cols)
+        if key:
+            save_model(key, model, concordance, {"data": os.path.basename(spec["data"]), "duration": spec["duration"],
+                                                 "event": spec["event"], "n_rows": len(fit_df)}, fit_df=fit_df)
+    else:
+        concordance = model.concordance_index_
+    summary = model.summary
+    record["log_likelihood"] = float(model.log_likelihood_)
+    record["concordance_index"] = float(concordance)
+    record["summary"] = json.loads(summary.to_json(orient="index"))
+
+    ph = None
+    if spec["ph_check"]:
+        ph = proportional_hazard_table(model, fit_df, spec["duration"], spec["event"])
+        record["ph_check"] = json.loads(ph.to_json(orient="index"))
+    return record, summary, ph
+
+
+def run_model_out_of_core(spec, model_spec):
+    #bounded memory: the CSV is never loaded whole. C-index and PH test need every row in memory and are skipped.
+    from cox_data import DataPreparationError
+    from cox_outofcore import BLOCK_ROWS, build_sorted_data, fit_out_of_core
+
+    record = {"name": model_spec["name"], "requested_covariates": model_spec["covariates"], "from_store": False}
+    try:
+        sorted_data = build_sorted_data(spec["data"], spec["duration"], spec["event"], model_spec["covariates"],
+                                        work_dir=spec["work_dir"], strict_covariates=model_spec["strict"])
+    except DataPreparationError as e:
+        record["error"] = str(e)
+        return record, None, None
+    with sorted_data:
+        record["notes"] = [note.strip() for note in sorted_data.notes]
+        record["warnings"] = sorted_data.warnings
+        model = fit_out_of_core(sorted_data, ties=ENGINE_TIES[spec["engine"]], block_rows=spec["block_rows"] or BLOCK_ROWS)
+        record["covariates"] = model.covariates
+        record["n_rows"] = sorted_data.n_rows
+        record["n_events"] = int(sorted_data.n_events)
+    summary = model.summary
+    record["log_likelihood"] = float(model.log_likelihood_)
+    record["concordance_index"] = None
+    record["summary"] = json.loads(summary.to_json(orient="index"))
+    if spec["ph_check"]:
+        record["ph_check"] = {"skipped": "not available with out_of_core"}
+    return record, summary, None
+
+
+def run(spec, output_dir=None, log=print):
+    from cox_data import Dataset
+    from cox_trace import stage
+
+    output_dir = output_dir or spec["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    if spec["out_of_core"]:
+        dataset = None
+        log(f"Out-of-core mode: each model's columns of {spec['data']} are sorted on disk and streamed.")
+    else:
+        with stage("load data"):
+            dataset = Dataset.open(spec["data"], use_cache=spec["use_cache"])
+        log(f"Loaded {spec['data']}: {dataset.shape[0]} rows, {dataset.shape[1]} columns{' (from cache)' if dataset.from_cache else ''}.")
+
+    records, failures = [], 0
+    for model_spec in spec["models"]:
+        try:
+            with stage(f"model {model_spec['name']}"):
+                if dataset is None:
+                    record, summary, ph = run_model_out_of_core(spec, model_spec)
+                else:
+                    record, summary, ph = run_model(dataset, spec, model_spec)
+        except Exception as e:
+            record, summary, ph = {"name": model_spec["name"], "error": f"{type(e).__name__}: {e}"}, None, None
+        records.append(record)
+        if "error" in record:
+            failures += 1
+            log(f"[{record['name']}] failed: {record['error']}")
+            continue
+        summary.to_csv(os.path.join(output_dir, f"{record['name']}_summary.csv"))
+        if ph is not None:
+            ph.to_csv(os.path.join(output_dir, f"{record['name']}_ph_test.csv"))
+        c_index = "n/a" if record["concordance_index"] is None else f"{record['concordance_index']:.4f}"
+        log(f"[{record['name']}] n={record['n_rows']}, C-index={c_index}{' (from the result store)' if record['from_store'] else ''}")
+
+    with open(os.path.join(output_dir, "results.json"), "w", encoding="utf-8") as handle:
+        json.dump({"spec": spec, "models": records}, handle, indent=2, default=str)
+    log(f"Wrote results for {len(records)} models to {output_dir}.")
+    return records, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Cox models headless from a JSON/YAML spec file.")
+    parser.add_argument("spec", help="path to the model spec (.json, .yaml or .yml)")
+    parser.add_argument("--output-dir", help="overrides output_dir from the spec (relative to the current directory)")
+    parser.add_argument("--check", action="store_true", help="only validate the spec, do not load data or fit")
+    parser.add_argument("--trace", metavar="FILE", help="time every stage and write a Chrome trace (JSON) to FILE")
+    parser.add_argument("--trace-memory", action="store_true", help="with --trace: also record peak memory per stage (slower)")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"Invalid spec: {e}", file=sys.stderr)
+        return 2
+    if args.check:
+        print(f"Spec OK: {len(spec['models'])} models on {spec['data']}.")
+        return 0
+    if args.trace:
+        from cox_trace import TRACER, export_chrome_trace, format_breakdown
+        TRACER.start(memory=args.trace_memory)
+    _, failures = run(spec, output_dir=args.output_dir)
+    if args.trace:
+        roots, _ = TRACER.roots_since(0)
+        print(format_breakdown(roots))
+        print(f"Wrote {export_chrome_trace(args.trace, metadata={'spec': args.spec})} timed stages to {args.trace}.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+#Cox GUI benchmarks -- seeded synthetic survival data and per-stage timings / peak memory of the analysis pipeline
+#usage: python cox_bench.py [--preset small|medium|large] [--n N ...] [--p P ...] [--engine E ...] [--output FILE]
+#       python cox_bench.py --compare OLD.json [--max-slowdown 1.25] ...   (also run, then compare against OLD)
+#runs without a display (no Tk, no matplotlib); results are JSON so runs of different versions can be compared.
+#stages follow the GUI: load (Dataset.open), prepare (what _get_selected_columns does), fit, concordance,
+#ph_check and plot_data (the partial-effect curves behind a plot). fit_out_of_core is available on request.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from cox_batch import ENGINE_TIES
+
+BENCH_SEED = 20250601
+STAGES = ("load", "prepare", "fit", "concordance", "ph_check", "plot_data")
+OPTIONAL_STAGES = ("fit_out_of_core",)
+PRESETS = {
+    "small": {"n": [1_000, 10_000], "p": [1, 10]},
+    "medium": {"n": [100_000, 1_000_000], "p": [10, 100]},
+    "large": {"n": [10_000_000], "p": [10, 1000]},
+}
+#rows per generated chunk; every chunk has its own seeded generator, so the data does not depend on this
+GENERATOR_CHUNK_ROWS = 100_000
+#rows used to calibrate the censoring distribution to the requested censored fraction
+PILOT_ROWS = 20_000
+#rows of the untimed lifelines warm-up fit
+WARM_UP_ROWS = 200
+
+_lifelines_warm = False
+
+
+def true_coefficients(p, seed=BENCH_SEED):
+    #scaled so the linear predictor has about the same spread whatever p is
+    return np.random.default_rng([seed, 0]).normal(0.0, 0.5 / np.sqrt(p), p)
+
+
+def _event_times(rng, X, beta, distribution, shape):
+    #inverse-CDF draw from a proportional hazards Weibull (exponential: shape 1) with unit scale
+    k = 1.0 if distribution == "exponential" else shape
+    return (-np.log(rng.random(len(X))) / np.exp(X @ beta)) ** (1.0 / k)
+
+
+def _censoring_scale(beta, distribution, shape, censoring, seed):
+    #scale of exponential censoring times giving about `censoring` censored, found by bisection on a pilot sample
+    if censoring <= 0:
+        return None
+    rng = np.random.default_rng([seed, 1])
+    X = rng.normal(size=(PILOT_ROWS, len(beta)))
+    T = _event_times(rng, X, beta, distribution, shape)
+    C = rng.exponential(size=PILOT_ROWS)
+    lo, hi = 1e-6, 1e6
+    for _ in range(60):
+        mid = np.sqrt(lo * hi)
+        if np.mean(C * mid < T) > censoring:
+            lo = mid
+        else:
+            hi = mid
+    return np.sqrt(lo * hi)
+
+
+def generate_chunks(n, p, distribution="weibull", shape=1.5, censoring=0.3, tie_decimals=None, seed=BENCH_SEED):
+    #yields DataFrames (time, event, x0..x{p-1}) of at most GENERATOR_CHUNK_ROWS rows; memory stays bounded for any n
+    if distribution not in ("weibull", "exponential"):
+        raise ValueError("distribution must be 'weibull' or 'exponential'")
+    beta = true_coefficients(p, seed)
+    censor_scale = _censoring_scale(beta, distribution, shape, censoring, seed)
+    columns = [f"x{j}" for j in range(p)]
+    for k, start in enumerate(range(0, n, GENERATOR_CHUNK_ROWS)):
+        rng = np.random.default_rng([seed, 2, k])
+        m = min(GENERATOR_CHUNK_ROWS, n - start)
+        X = rng.normal(size=(m, p))
+        T = _event_times(rng, X, beta, distribution, shape)
+        E = np.ones(m, dtype=np.int8)
+        if censor_scale is not None:
+            C = rng.exponential(censor_scale, m)
+            E = (T <= C).astype(np.int8)
+            T = np.minimum(T, C)
+        if tie_decimals is not None:
+            #coarser times -> more ties; never round down to zero
+            T = np.maximum(np.round(T, tie_decimals), 10.0 ** -tie_decimals)
+        chunk = pd.DataFrame(X, columns=columns)
+        chunk.insert(0, "event", E)
+        chunk.insert(0, "time", T)
+        yield chunk
+
+
+def generate_survival_data(n, p, **options):
+    return pd.concat(list(generate_chunks(n, p, **options)), ignore_index=True)
+
+
+def write_survival_csv(path, n, p, **options):
+    for i, chunk in enumerate(generate_chunks(n, p, **options)):
+        chunk.to_csv(path, mode="a" if i else "w", header=(i == 0), index=False)
+    return path
+
+
+def _measure(func, memory):
+    #(result, seconds, peak bytes allocated above the starting point); tracemalloc sees numpy's buffers too
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - before if memory else None
+    return result, seconds, peak
+
+
+def _plot_values(series):
+    #same quantiles as the GUI's partial-effects plot
+    values = np.unique(series.quantile([0.1, 0.25, 0.5, 0.75, 0.9]).to_numpy())
+    return values.tolist() if len(values) >= 2 else sorted(series.unique())[:5]
+
+
+def _warm_up_lifelines(log=print):
+    #importing lifelines (over a second, several under tracemalloc) and its first fit happen once per process;
+    #done untimed so the first lifelines "fit" measures fitting, not the import
+    global _lifelines_warm
+    if _lifelines_warm:
+        return
+    from cox_engine import fit_cox_model
+    log("warming up lifelines (import and one small fit, not timed)...")
+    df = generate_survival_data(WARM_UP_ROWS, 2)
+    fit_cox_model(df, "time", "event", ["x0", "x1"], ties=None)
+    _lifelines_warm = True
+
+
+def run_case(case, engines, stages, work_dir, memory=True, repeat=1, log=print):
+    #one (n, p, data options) case: the CSV is generated once, then every stage is timed for every engine
+    from cox_data import Dataset
+    from cox_engine import fit_cox_model, model_concordance, partial_effect_curves
+    from cox_ph import proportional_hazard_table
+
+    n, p = case["n"], case["p"]
+    options = {key: case[key] for key in ("distribution", "shape", "censoring", "tie_decimals", "seed")}
+    path = os.path.join(work_dir, f"bench-n{n}-p{p}.csv")
+    log(f"n={n} p={p}: generating data...")
+    write_survival_csv(path, n, p, **options)
+    covariates = [f"x{j}" for j in range(p)]
+    rows = []
+
+    def record(stage, engine, r, seconds, peak, **extra):
+        row = dict(case, engine=engine, stage=stage, repeat=r, seconds=seconds,
+                   peak_mb=None if peak is None else peak / 2 ** 20, **extra)
+        rows.append(row)
+        log(f"  {stage:<16} {engine or '-':<15} {seconds:9.3f} s" + ("" if peak is None else f" {row['peak_mb']:9.1f} MB peak"))
+
+    def timed(stage, engine, func):
+        #every repeat of a requested stage is recorded; one that later stages need but was not requested (load,
+        #prepare, fit) runs once untimed. a failing stage is recorded once with its error and skips the stages after it
+        requested = stage in stages
+        result = None
+        for r in range(repeat if requested else 1):
+            try:
+                if requested:
+                    result, seconds, peak = _measure(func, memory)
+                else:
+                    result = func()
+            except Exception as e:
+                rows.append(dict(case, engine=engine, stage=stage, repeat=r, error=f"{type(e).__name__}: {e}"))
+                log(f"  {stage:<16} {engine or '-':<15} failed: {type(e).__name__}: {e}")
+                return None
+            if requested:
+                record(stage, engine, r, seconds, peak)
+        return result
+
+    in_memory = set(STAGES) & set(stages)
+    if in_memory - {"load", "prepare"} and any(ENGINE_TIES[engine] is None for engine in engines):
+        _warm_up_lifelines(log)
+    try:
+        dataset = timed("load", None, lambda: Dataset.open(path, use_cache=False)) if in_memory else None
+        prepared = timed("prepare", None, lambda: _prepare_cold(dataset, covariates)) if dataset is not None else None
+        for engine in engines:
+            ties = ENGINE_TIES[engine]
+            if prepared is not None and in_memory - {"load", "prepare"}:
+                frame, cols = prepared.frame, prepared.covariate_cols
+                model = timed("fit", engine, lambda: fit_cox_model(frame, "time", "event", cols, ties=ties))
+                if model is not None and "concordance" in stages:
+                    timed("concordance", engine, lambda: model_concordance(model, frame, "time", "event", cols))
+                if model is not None and "ph_check" in stages:
+                    #the residual cache would make repeats free; each repeat times a cold check
+                    timed("ph_check", engine, lambda: proportional_hazard_table(_uncached(model), frame, "time", "event"))
+                if model is not None and "plot_data" in stages:
+                    timed("plot_data", engine, lambda: partial_effect_curves(model, cols[0], _plot_values(frame[cols[0]])))
+            if "fit_out_of_core" in stages and ties is not None:
+                timed("fit_out_of_core", engine, lambda: _fit_out_of_core(path, covariates, ties, work_dir))
+    finally:
+        os.remove(path)
+    return rows
+
+
+def _prepare_cold(dataset, covariates):
+    #the GUI keeps prepared column sets; a benchmark repeat must not be served from that cache
+    dataset.prepared_cache.clear()
+    return dataset.prepare("time", "event", covariates)
+
+
+def _uncached(model):
+    import cox_ph
+    cox_ph._residual_cache.pop(model, None)
+    return model
+
+
+def _fit_out_of_core(path, covariates, ties, work_dir):
+    from cox_outofcore import build_sorted_data, fit_out_of_core
+    with build_sorted_data(path, "time", "event", covariates, work_dir=work_dir) as sorted_data:
+        return fit_out_of_core(sorted_data, ties=ties)
+
+
+def environment():
+    info = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        import lifelines
+        info["lifelines"] = lifelines.__version__
+    except ImportError:
+        pass
+    try:
+        info["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def _case_key(row):
+    return tuple(str(row.get(key)) for key in ("n", "p", "distribution", "shape", "censoring", "tie_decimals", "seed", "engine", "stage"))
+
+
+def best_times(results):
+    #fastest repeat per case/engine/stage
+    best = {}
+    for row in results:
+        if row.get("seconds") is not None:
+            key = _case_key(row)
+            best[key] = min(best.get(key, np.inf), row["seconds"])
+    return best
+
+
+def compare(old_results, new_results, log=print):
+    #new/old ratio of the best time for every stage both runs measured; returns the largest ratio,
+    #or None if the runs have no case/engine/stage in common
+    old, new = best_times(old_results), best_times(new_results)
+    shared_keys = sorted(set(old) & set(new))
+    if not shared_keys:
+        log("  no case/engine/stage was measured by both runs; nothing to compare")
+        return None
+    worst = 0.0
+    for key in shared_keys:
+        ratio = new[key] / old[key] if old[key] > 0 else np.inf
+        worst = max(worst, ratio)
+        n, p, *_, engine, stage = key
+        log(f"  n={n:<9} p={p:<5} {engine if engine != 'None' else '-':<15} {stage:<16} {old[key]:9.3f} s -> {new[key]:9.3f} s  x{ratio:.2f}")
+    return worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Cox pipeline on seeded synthetic survival data.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="predefined n/p grid (overridden by --n/--p)")
+    parser.add_argument("--n", type=int, nargs="+", help="numbers of rows")
+    parser.add_argument("--p", type=int, nargs="+", help="numbers of covariates")
+    parser.add_argument("--engine", nargs="+", default=["native-efron"], choices=sorted(ENGINE_TIES))
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES + OPTIONAL_STAGES)
+    parser.add_argument("--distribution", default="weibull", choices=["weibull", "exponential"])
+    parser.add_argument("--shape", type=float, default=1.5, help="Weibull shape")
+    parser.add_argument("--censoring", type=float, default=0.3, help="target censored fraction")
+    parser.add_argument("--tie-decimals", type=int, help="round times to this many decimals (more ties)")
+    parser.add_argument("--seed", type=int, default=BENCH_SEED)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (slightly faster, no peak_mb)")
+    parser.add_argument("--work-dir", help="where generated CSVs are written (default: system temp dir)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--max-slowdown", type=float, help="with --compare: exit 1 if any stage got slower than this ratio")
+    args = parser.parse_args(argv)
+
+    preset = PRESETS.get(args.preset, PRESETS["small"])
+    settings = {
+        "n": args.n or preset["n"],
+        "p": args.p or preset["p"],
+        "engines": args.engine,
+        "stages": args.stages,
+        "repeat": args.repeat,
+    }
+    memory = not args.no_memory
+    if memory:
+        tracemalloc.start()
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        for n in settings["n"]:
+            for p in settings["p"]:
+                case = {"n": n, "p": p, "distribution": args.distribution, "shape": args.shape,
+                        "censoring": args.censoring, "tie_decimals": args.tie_decimals, "seed": args.seed}
+                results.extend(run_case(case, args.engine, args.stages, work_dir, memory=memory, repeat=args.repeat))
+    if memory:
+        tracemalloc.stop()
+
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump({"environment": environment(), "settings": settings, "results": results}, handle, indent=2, default=str)
+    print(f"Wrote {len(results)} measurements to {args.output}.")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            old = json.load(handle)
+        print(f"Compared with {args.compare} ({old.get('environment', {}).get('git_commit', 'unknown version')}):")
+        worst = compare(old["results"], results)
+        if worst is None and args.max_slowdown is not None:
+            print("Cannot check --max-slowdown without common measurements.")
+            return 1
+        if args.max_slowdown is not None and worst > args.max_slowdown:
+            print(f"Slowest stage regressed by x{worst:.2f} (limit x{args.max_slowdown:.2f}).")
+            return 1
+    failures = sum(1 for row in results if "error" in row)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
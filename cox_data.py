@@ -0,0 +1,383 @@
+#Cox GUI data layer -- compact columnar loading with an on-disk Parquet cache
+#the CSV is parsed once in chunks into compact dtypes (small ints, float32 where it is exact, categoricals);
+#if pyarrow is installed the result is written to a Parquet sidecar keyed on path+mtime+size,
+#so later opens only read (memory-mapped) the columns a model actually uses.
+import os
+import hashlib
+import glob
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from cox_trace import stage
+
+try:
+    import pyarrow.parquet as pq #optional, enables the sidecar cache
+except ImportError:
+    pq = None
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "coxgui")
+CHUNK_ROWS = 250_000
+HEAD_ROWS = 5
+#object columns with at most this fraction of distinct values become categoricals
+CATEGORY_MAX_UNIQUE_FRACTION = 0.5
+#memory budget for prepared (numeric, NaN-free) column sets kept per dataset
+PREPARED_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def compact_column(series, float32=True):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series) and float32:
+        #only where float32 holds every value exactly: durations with many digits would otherwise gain ties
+        #or lose them, and chunks that stay float64 promote the whole column when they are concatenated
+        compact = series.astype("float32")
+        if np.array_equal(compact.to_numpy(dtype=np.float64), series.to_numpy(dtype=np.float64), equal_nan=True):
+            return compact
+    return series
+
+
+def compact_frame(df, float32=True):
+    return pd.DataFrame({col: compact_column(df[col], float32=float32) for col in df.columns}, index=df.index)
+
+
+def _categorize(df):
+    for col in df.columns:
+        if df[col].dtype == object and len(df) > 0:
+            if df[col].nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_FRACTION * len(df):
+                df[col] = df[col].astype("category")
+    return df
+
+
+def _concat_chunks(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    #pandas promotes to the smallest common dtype (int8 + int16 -> int16, int8 + float32 -> float32)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_csv_compact(file_path, usecols=None, float32=True, chunk_rows=CHUNK_ROWS, progress=None, cancelled=None):
+    total_bytes = max(os.path.getsize(file_path), 1)
+    chunks = []
+    with open(file_path, "rb") as handle:
+        reader = pd.read_csv(handle, usecols=usecols, chunksize=chunk_rows, low_memory=False)
+        for chunk in reader:
+            if cancelled is not None and cancelled():
+                return None
+            chunks.append(compact_frame(chunk, float32=float32))
+            if progress is not None:
+                progress(min(handle.tell() / total_bytes, 1.0))
+    if not chunks:
+        #header only: still return the right columns
+        return pd.read_csv(file_path, usecols=usecols, nrows=0)
+    df = _concat_chunks(chunks)
+    del chunks
+    return _categorize(df)
+
+
+def cache_path_for(file_path, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    path_key = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+    version_key = hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{path_key}-{version_key}.parquet")
+
+
+def _write_cache(df, cache_path):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    #older caches of the same file are stale once its mtime/size changed
+    path_key = os.path.basename(cache_path).split("-")[0]
+    for stale in glob.glob(os.path.join(os.path.dirname(cache_path), f"{path_key}-*.parquet")):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    tmp_path = cache_path + ".tmp"
+    try:
+        df.to_parquet(tmp_path, engine="pyarrow", index=False)
+        os.replace(tmp_path, cache_path)
+    finally:
+        #a failed write leaves no partial file behind
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class Dataset:
+    #a loaded CSV: metadata plus column-projected access to the data.
+    #backed either by the Parquet sidecar (columns read on demand) or an in-memory compact frame.
+    def __init__(self, file_path, columns, n_rows, head, frame=None, cache_path=None):
+        self.file_path = file_path
+        self.columns = list(columns)
+        self._column_set = None
+        self.n_rows = n_rows
+        self._head = head
+        self._frame = frame
+        self.cache_path = cache_path
+        self.from_cache = False
+        self.prepared_cache = PreparedDataCache()
+
+    @property
+    def shape(self):
+        return (self.n_rows, len(self.columns))
+
+    def head(self, n=HEAD_ROWS):
+        return self._head.head(n)
+
+    def dtypes(self):
+        if self._frame is not None:
+            return self._frame.dtypes
+        return self._head.dtypes
+
+    def load(self, columns):
+        columns = list(dict.fromkeys(columns)) #drop duplicates, keep order
+        missing = self.missing_columns(columns)
+        if missing:
+            raise KeyError(f"columns not in dataset: {missing}")
+        if self._frame is not None:
+            return self._frame[columns]
+        table = pq.read_table(self.cache_path, columns=columns, memory_map=True)
+        return table.to_pandas()
+
+    def missing_columns(self, columns):
+        #set lookup: selections on very wide files can name tens of thousands of columns
+        if self._column_set is None:
+            self._column_set = set(self.columns)
+        return [c for c in columns if c not in self._column_set]
+
+    def prepare(self, duration_col, event_col, covariate_cols, strict_covariates=False):
+        #cached per column set; callers must treat the returned frame as read-only
+        missing = self.missing_columns([duration_col, event_col] + list(covariate_cols))
+        if missing:
+            raise DataPreparationError(f"Column(s) not found in the dataset: {', '.join(map(str, missing))}")
+        key = (duration_col, event_col, tuple(covariate_cols), strict_covariates)
+        with stage("prepare") as span:
+            prepared = self.prepared_cache.get(key)
+            span.args["cached"] = prepared is not None
+            if prepared is None:
+                prepared = self._prepare_from_cached(duration_col, event_col, covariate_cols, strict_covariates)
+                span.args["derived"] = prepared is not None
+                if prepared is None:
+                    prepared = prepare_survival_data(self.load, duration_col, event_col, covariate_cols, strict_covariates)
+                self.prepared_cache.put(key, prepared)
+            span.rows = len(prepared.frame)
+        return prepared
+
+    def _prepare_from_cached(self, duration_col, event_col, covariate_cols, strict_covariates):
+        #a covariate set that differs from a cached one by a few columns (interactive model building): when neither
+        #loses rows to missing covariate values, both cover the same rows, so only the added columns are prepared
+        #and the rest is projected from the cached frame. None when no cached set qualifies.
+        best, best_shared = None, 0
+        for prepared in self.prepared_cache.values():
+            if (prepared.duration_col, prepared.event_col) != (duration_col, event_col) or prepared.rows_lost_to_covariates:
+                continue
+            kept = set(prepared.covariate_cols)
+            n_shared = sum(col in kept for col in covariate_cols)
+            if n_shared > best_shared:
+                best, best_shared = prepared, n_shared
+        if best is None:
+            return None
+        kept = set(best.covariate_cols)
+        added = [col for col in covariate_cols if col not in kept]
+        #with no added columns this still prepares duration/event, whose notes and warnings apply to every model;
+        #any problem (e.g. no usable added column) is left to the full preparation to report
+        try:
+            extra = prepare_survival_data(self.load, duration_col, event_col, added, strict_covariates)
+        except DataPreparationError:
+            return None
+        if extra.rows_lost_to_covariates or not extra.frame.index.equals(best.frame.index):
+            return None
+        from_extra = set(extra.covariate_cols)
+        final_cols = [col for col in covariate_cols if col in kept or col in from_extra]
+        frame = pd.concat([best.frame[[duration_col, event_col] + [col for col in final_cols if col in kept]],
+                           extra.frame[extra.covariate_cols]], axis=1)[[duration_col, event_col] + final_cols]
+        return PreparedData(frame, duration_col, event_col, final_cols, extra.notes, extra.warnings)
+
+    @classmethod
+    def open(cls, file_path, use_cache=True, float32=True, progress=None, cancelled=None):
+        use_cache = use_cache and pq is not None
+        cache_path = cache_path_for(file_path) if use_cache else None
+
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                with stage("read columnar cache"):
+                    parquet_file = pq.ParquetFile(cache_path, memory_map=True)
+                    if parquet_file.metadata.num_rows:
+                        head = next(parquet_file.iter_batches(batch_size=HEAD_ROWS)).to_pandas()
+                    else:
+                        head = parquet_file.schema_arrow.empty_table().to_pandas()
+                dataset = cls(file_path, parquet_file.schema_arrow.names, parquet_file.metadata.num_rows, head, cache_path=cache_path)
+                dataset.from_cache = True
+                if progress is not None:
+                    progress(1.0)
+                return dataset
+            except Exception:
+                pass #unreadable cache: fall through and rebuild it
+
+        with stage("parse CSV", path=os.path.basename(file_path)) as span:
+            df = read_csv_compact(file_path, float32=float32, progress=progress, cancelled=cancelled)
+            if df is None:
+                return None
+            span.rows = len(df)
+        head = df.head(HEAD_ROWS).copy()
+        if cache_path is not None:
+            try:
+                with stage("write columnar cache", rows=len(df)):
+                    _write_cache(df, cache_path)
+                return cls(file_path, df.columns, len(df), head, cache_path=cache_path)
+            except Exception:
+                pass #cache dir not writable etc.: keep the data in memory instead
+        return cls(file_path, df.columns, len(df), head, frame=df)
+
+
+class DataPreparationError(ValueError):
+    pass
+
+
+class PreparedData:
+    #numeric, NaN-free duration/event/covariate columns for one model spec.
+    #`frame` is shared between fitting, C-index, PH check and plots, so nobody may modify it in place.
+    #`notes` go to the results pane, `warnings` are shown as popups; both are replayed on cache hits.
+    def __init__(self, frame, duration_col, event_col, covariate_cols, notes, warnings, rows_lost_to_covariates=0):
+        self.frame = frame
+        self.duration_col = duration_col
+        self.event_col = event_col
+        self.covariate_cols = covariate_cols
+        self.notes = notes
+        self.warnings = warnings
+        self.rows_lost_to_covariates = rows_lost_to_covariates #complete in duration/event, dropped for a covariate
+
+    @property
+    def nbytes(self):
+        return int(self.frame.memory_usage(index=True, deep=True).sum())
+
+
+class PreparedDataCache:
+    #LRU over PreparedData bounded by total frame size; used from the job worker as well, hence the lock
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else PREPARED_CACHE_MAX_BYTES
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+            return prepared
+
+    def put(self, key, prepared):
+        size = prepared.nbytes
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            if size > self.max_bytes:
+                return #too big to keep; the caller still has it
+            self._entries[key] = prepared
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def values(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def prepare_survival_data(load_columns, duration_col, event_col, covariate_cols, strict_covariates=False):
+    #shared by the GUI and batch runs. strict_covariates (single Variable of Interest) turns
+    #covariate problems into errors; otherwise the offending covariate is skipped with a warning.
+    notes, warnings = [], []
+    for col_name in covariate_cols:
+        if col_name == duration_col or col_name == event_col:
+            raise DataPreparationError(f"Covariate/VOI '{col_name}' cannot be the same as Duration or Event column.")
+
+    #only the columns this model needs are read (projected from the columnar cache when available)
+    with stage("load columns") as span:
+        raw = load_columns([duration_col, event_col] + list(covariate_cols))
+        span.rows = len(raw)
+    columns = {}
+    with stage("numeric coercion", rows=len(raw), columns=len(covariate_cols) + 2):
+        try:
+            columns[duration_col] = pd.to_numeric(raw[duration_col])
+        except (ValueError, TypeError):
+            raise DataPreparationError(f"Duration column '{duration_col}' must be convertible to a numeric type.")
+        if columns[duration_col].isnull().any():
+            notes.append(f"Warning: Duration column '{duration_col}' has missing values after numeric conversion. Rows with these NaNs will be dropped.\n")
+
+        try:
+            columns[event_col] = pd.to_numeric(raw[event_col])
+        except (ValueError, TypeError):
+            raise DataPreparationError(f"Event column '{event_col}' must be convertible to a numeric type.")
+        if columns[event_col].isnull().any():
+            notes.append(f"Warning: Event column '{event_col}' has missing values after numeric conversion. Rows with these NaNs will be dropped.\n")
+        if not columns[event_col].dropna().isin([0, 1]).all():
+            warnings.append(f"Event column '{event_col}' contains values other than 0 and 1 (and NaNs). Ensure 1 means event and 0 means censored.")
+
+        processed_covariate_cols = []
+        for col_name in covariate_cols:
+            try:
+                #forcing to numeric, coercing errors. If a column is truly categorical and
+                #needs to be treated as such by lifelines (e.g. with C() syntax),
+                #this simple conversion might not be ideal. But for basic numeric covariates, it's fine.
+                numeric_col_series = pd.to_numeric(raw[col_name], errors='coerce')
+            except Exception as e:
+                msg = f"Could not process covariate/VOI '{col_name}' as numeric (Error: {e}). It will be skipped."
+                if strict_covariates: raise DataPreparationError(msg)
+                warnings.append(msg); continue
+            if numeric_col_series.isnull().all():
+                msg = f"Covariate/VOI '{col_name}' contains no valid numeric data after conversion and will be excluded."
+                if strict_covariates: raise DataPreparationError(msg)
+                warnings.append(msg); continue
+            columns[col_name] = numeric_col_series
+            processed_covariate_cols.append(col_name)
+
+    if covariate_cols and not processed_covariate_cols:
+        if strict_covariates:
+            raise DataPreparationError("The selected Variable of Interest could not be processed or was invalid.")
+        raise DataPreparationError("No valid covariates selected or remaining after initial processing for the adjusted model.")
+
+    frame = pd.DataFrame(columns, copy=False)
+    del raw, columns
+    original_rows = len(frame)
+    with stage("dropna", rows=original_rows) as span:
+        keep = frame.notna().all(axis=1).to_numpy()
+        rows_lost_to_covariates = int((keep != frame[[duration_col, event_col]].notna().all(axis=1).to_numpy()).sum())
+        if not keep.all():
+            frame = frame[keep]
+        span.args["dropped"] = original_rows - len(frame)
+    if len(frame) < original_rows:
+        notes.append(f"Note: {original_rows - len(frame)} rows with missing values in selected columns (Duration, Event, and processed Covariates/VOI) were dropped.\n")
+
+    if len(frame) == 0:
+        raise DataPreparationError("No data remains after dropping missing values from selected columns.")
+
+    final_covariate_cols = []
+    with stage("variance check", rows=len(frame)):
+        for col_name in processed_covariate_cols:
+            if frame[col_name].nunique(dropna=True) <= 1:
+                msg = f"Covariate/VOI '{col_name}' has no variance (all values are the same) in the filtered data and will be excluded."
+                if strict_covariates and len(processed_covariate_cols) == 1:
+                    raise DataPreparationError(msg)
+                warnings.append(msg)
+                continue
+            final_covariate_cols.append(col_name)
+
+    if covariate_cols and not final_covariate_cols:
+        raise DataPreparationError("No usable covariates/VOI with variance remain after data cleaning. Cannot fit model.")
+    if len(final_covariate_cols) < len(processed_covariate_cols):
+        frame = frame[[duration_col, event_col] + final_covariate_cols]
+
+    return PreparedData(frame, duration_col, event_col, final_covariate_cols, notes, warnings, rows_lost_to_covariates)
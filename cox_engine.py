@@ -0,0 +1,294 @@
+#Cox GUI native engine -- vectorized Newton-Raphson on the Cox partial likelihood
+#one sort by duration, risk-set sums by reverse cumulative sums, Breslow or Efron ties, O(n*p^2) per iteration.
+#results mirror the parts of lifelines.CoxPHFitter the GUI uses (summary, params_, predict_*, baseline hazard).
+import math
+import weakref
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from cox_trace import stage
+
+SUMMARY_COLUMNS = ["coef", "exp(coef)", "se(coef)", "coef lower 95%", "coef upper 95%",
+                   "exp(coef) lower 95%", "exp(coef) upper 95%", "cmp to", "z", "p", "-log2(p)"]
+TIES_METHODS = ("efron", "breslow")
+
+#fitted model -> (timeline, baseline cumulative hazard, centring, coefficients, central values); see _curve_basis
+_curve_bases = weakref.WeakKeyDictionary()
+
+
+class ConvergenceError(RuntimeError):
+    pass
+
+
+class RiskSetIndex:
+    #everything about the (sorted) durations and events that does not depend on the coefficients;
+    #computed once per fit and reused by every Newton iteration
+    def __init__(self, durations, events):
+        order = np.argsort(durations, kind="stable")
+        self.order = order
+        self.T = durations[order]
+        self.E = events[order].astype(np.float64)
+        #distinct event times, ascending, with the number of events at each
+        self.event_times, self.deaths = np.unique(self.T[self.E > 0], return_counts=True)
+        #first sorted row at each event time; rows from there on form its risk set (ties included)
+        self.risk_start = np.searchsorted(self.T, self.event_times, side="left")
+        #number of event times at or before each row's duration
+        self.groups_upto = np.searchsorted(self.event_times, self.T, side="right")
+        #Efron expands each tied group of d deaths into d slots with fractions 0, 1/d, ..., (d-1)/d
+        self.slot_group = np.repeat(np.arange(len(self.deaths)), self.deaths)
+        group_start = np.cumsum(self.deaths) - self.deaths
+        self.slot_fraction = (np.arange(self.slot_group.size) - group_start[self.slot_group]) / self.deaths[self.slot_group]
+
+
+def _reverse_cumsum(a):
+    return np.cumsum(a[::-1], axis=0)[::-1]
+
+
+def _segment_sums(values, risk_start):
+    #sums of `values` between consecutive event times; rows before the first event time belong to no risk set
+    if risk_start.size == 0:
+        return np.zeros((0,) + values.shape[1:])
+    return np.add.reduceat(values[risk_start[0]:], risk_start - risk_start[0], axis=0)
+
+
+def _risk_set_sums(values, risk_start):
+    #a reverse cumulative sum over the (few) event times instead of over all n rows
+    return _reverse_cumsum(_segment_sums(values, risk_start))
+
+
+def _converged(old_loglik, new_loglik, step, tol):
+    return abs(new_loglik - old_loglik) <= tol * max(1.0, abs(old_loglik)) and np.linalg.norm(step) < 1e-6
+
+
+def tie_terms(eta, shift, index, ties="efron", carried=0.0):
+    #the Breslow/Efron algebra every likelihood here shares. an event time with d deaths has d tie slots with
+    #denominators phi = S0 - f D0 (f = 0, 1/d, ..., (d-1)/d for Efron, 0 for Breslow), where S0 is the risk set's
+    #weight plus `carried`, the weight of rows after this block of sorted rows (same shift).
+    #returns w = exp(eta - shift), the log-likelihood and, per event time, the sums over its slots of
+    #1/phi, f/phi, 1/phi^2, f/phi^2 and f^2/phi^2
+    E = index.E
+    w = np.exp(eta - shift)
+    S0 = _risk_set_sums(w, index.risk_start) + carried
+    #rows of a segment that are events all share that segment's event time
+    D0 = _segment_sums(w * E, index.risk_start)
+    g = index.slot_group
+    f = index.slot_fraction if ties == "efron" else np.zeros(g.size)
+    phi = S0[g] - f * D0[g]
+    loglik = E @ eta - (np.log(phi).sum() + shift * phi.size)
+    n_groups = len(index.deaths)
+    sums = [np.bincount(g, weights=v, minlength=n_groups) for v in (1.0 / phi, f / phi, 1.0 / phi ** 2, f / phi ** 2, f ** 2 / phi ** 2)]
+    return w, loglik, sums
+
+
+def block_derivatives(X, eta, shift, index, ties="efron", carried=None):
+    #log-likelihood, gradient and information contributions of the event times of one block of sorted, centred rows.
+    #carried: (sum of w, of wX, of wXX') over the rows after the block, which are in all of its risk sets; None if none.
+    #all per-event-time quantities are (n_event_times x p) at most; the only n x p x p work is one matrix product.
+    c0, c1, c2 = carried if carried is not None else (0.0, 0.0, None)
+    E = index.E
+    w, loglik, (a, b, q0, q1, q2) = tie_terms(eta, shift, index, ties, c0)
+    wX = w[:, None] * X
+    S1 = _risk_set_sums(wX, index.risk_start) + c1
+    D1 = _segment_sums(wX * E[:, None], index.risk_start)
+    gradient = E @ X - (a @ S1 - b @ D1)
+
+    #sum over slots of (S2_g - f D2_g)/phi without materialising S2 per event time:
+    #sum_g a_g S2_g = X' diag(w * A) X with A_i the running sum of a_g over event times <= T_i,
+    #and the D2 part only touches each event row once, with its own group's b_g
+    A = np.concatenate(([0.0], np.cumsum(a)))[index.groups_upto]
+    B = E * np.concatenate(([0.0], b))[index.groups_upto]
+    information = (wX * (A - B)[:, None]).T @ X
+    if c2 is not None:
+        information += a.sum() * c2
+    #minus the sum over slots of z z' with z = (S1_g - f D1_g)/phi, expanded per group
+    cross = S1.T @ (q1[:, None] * D1)
+    information -= S1.T @ (q0[:, None] * S1) - cross - cross.T + D1.T @ (q2[:, None] * D1)
+    return loglik, gradient, information, w
+
+
+def partial_likelihood(beta, X, index, ties="efron"):
+    #X is already sorted by duration (index.order) and centred; returns log-likelihood, gradient, information
+    eta = X @ beta
+    return block_derivatives(X, eta, eta.max() if eta.size else 0.0, index, ties)[:3]
+
+
+def null_log_likelihood(index, ties="efron"):
+    #log partial likelihood of the model without covariates (every coefficient zero)
+    return float(tie_terms(np.zeros(len(index.T)), 0.0, index, ties)[1])
+
+
+def newton_raphson(X, index, ties="efron", initial_point=None, tol=1e-9, max_iter=50):
+    return maximize_partial_likelihood(lambda beta: partial_likelihood(beta, X, index, ties), X.shape[1], initial_point, tol, max_iter)
+
+
+def maximize_partial_likelihood(likelihood, p, initial_point=None, tol=1e-9, max_iter=50):
+    #likelihood(beta) -> (loglik, gradient, information); in memory (partial_likelihood) or streamed from disk
+    beta = np.zeros(p) if initial_point is None else np.asarray(initial_point, dtype=float).copy()
+    loglik, gradient, information = likelihood(beta)
+    for iteration in range(1, max_iter + 1):
+        try:
+            step = np.linalg.solve(information, gradient)
+        except np.linalg.LinAlgError:
+            step = np.linalg.lstsq(information, gradient, rcond=None)[0]
+        #step halving keeps the likelihood increasing from poor (e.g. stale warm-start) points;
+        #the slack allows for rounding noise once the optimum is reached
+        slack = 1e-10 * max(1.0, abs(loglik))
+        for _ in range(30):
+            candidate = beta + step
+            new_loglik, new_gradient, new_information = likelihood(candidate)
+            if np.isfinite(new_loglik) and new_loglik >= loglik - slack:
+                break
+            step = step / 2
+        else:
+            raise ConvergenceError("Newton-Raphson step halving failed; the model may be separable or collinear.")
+        converged = _converged(loglik, new_loglik, step, tol)
+        beta, loglik, gradient, information = candidate, new_loglik, new_gradient, new_information
+        if converged:
+            return beta, loglik, information, iteration
+    raise ConvergenceError(f"Newton-Raphson did not converge after {max_iter} iterations.")
+
+
+class NativeCoxModel:
+    #fitted result; attribute names follow lifelines so GUI code can use either engine
+    def __init__(self, ties="efron"):
+        if ties not in TIES_METHODS:
+            raise ValueError(f"ties must be one of {TIES_METHODS}")
+        self.ties = ties
+        self.alpha = 0.05
+
+    def fit(self, df, duration_col, event_col, covariates=None, initial_point=None, tol=1e-9, max_iter=50):
+        covariates = list(covariates) if covariates is not None else [c for c in df.columns if c not in (duration_col, event_col)]
+        if not covariates:
+            raise ValueError("the native engine needs at least one covariate")
+        durations = df[duration_col].to_numpy(dtype=np.float64)
+        events = df[event_col].to_numpy(dtype=np.float64)
+        X_raw = df[covariates].to_numpy(dtype=np.float64)
+        index = RiskSetIndex(durations, events)
+        self.fit_arrays(X_raw[index.order], index, covariates, initial_point=initial_point, tol=tol, max_iter=max_iter)
+        self._central_values = df[covariates].median().to_frame("baseline").T
+        return self
+
+    def fit_arrays(self, X_sorted, index, covariates, initial_point=None, tol=1e-9, max_iter=50):
+        #X_sorted rows must already be in index.order; lets callers reuse one RiskSetIndex across fits
+        self.covariates = list(covariates)
+        self._norm_mean = X_sorted.mean(axis=0)
+        norm_std = X_sorted.std(axis=0)
+        norm_std[norm_std == 0] = 1.0
+        X = (X_sorted - self._norm_mean) / norm_std
+        init = None if initial_point is None else np.asarray(initial_point, dtype=float) * norm_std
+
+        beta, loglik, information, iterations = newton_raphson(X, index, self.ties, init, tol, max_iter)
+        params = self._set_estimates(beta, loglik, information, iterations, norm_std)
+        self.baseline_cumulative_hazard_ = self._breslow_baseline(X_sorted, index, params)
+        self.durations, self.event_observed = index.T, index.E.astype(bool)
+        return self
+
+    def _set_estimates(self, beta, loglik, information, iterations, norm_std):
+        #coefficients and their variance back on the covariates' own scale
+        self.iterations_ = iterations
+        self.log_likelihood_ = loglik
+        params = beta / norm_std
+        self.params_ = pd.Series(params, index=self.covariates, name="coef")
+        variance = np.linalg.pinv(information) / np.outer(norm_std, norm_std)
+        self.variance_matrix_ = pd.DataFrame(variance, index=self.covariates, columns=self.covariates)
+        self.standard_errors_ = pd.Series(np.sqrt(np.diag(variance)), index=self.covariates, name="se(coef)")
+        return params
+
+    def _breslow_baseline(self, X_sorted, index, params):
+        partial_hazard = np.exp((X_sorted - self._norm_mean) @ params)
+        risk = _risk_set_sums(partial_hazard, index.risk_start)
+        cumulative = np.cumsum(index.deaths / risk)
+        return pd.DataFrame({"baseline cumulative hazard": cumulative}, index=pd.Index(index.event_times, name="timeline"))
+
+    @property
+    def summary(self):
+        z_crit = NormalDist().inv_cdf(1 - self.alpha / 2)
+        coef, se = self.params_.to_numpy(), self.standard_errors_.to_numpy()
+        z = coef / se
+        p = np.array([math.erfc(abs(v) / math.sqrt(2)) for v in z])
+        with np.errstate(divide="ignore"):
+            log2p = -np.log2(p)
+        df = pd.DataFrame({
+            "coef": coef,
+            "exp(coef)": np.exp(coef),
+            "se(coef)": se,
+            "coef lower 95%": coef - z_crit * se,
+            "coef upper 95%": coef + z_crit * se,
+            "exp(coef) lower 95%": np.exp(coef - z_crit * se),
+            "exp(coef) upper 95%": np.exp(coef + z_crit * se),
+            "cmp to": 0.0,
+            "z": z,
+            "p": p,
+            "-log2(p)": log2p,
+        }, index=pd.Index(self.covariates, name="covariate"))
+        return df[SUMMARY_COLUMNS]
+
+    def predict_log_partial_hazard(self, X):
+        X = X[self.covariates].to_numpy(dtype=np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=np.float64)
+        return (X - self._norm_mean) @ self.params_.to_numpy()
+
+    def predict_partial_hazard(self, X):
+        values = np.exp(self.predict_log_partial_hazard(X))
+        return pd.Series(values, index=X.index if isinstance(X, pd.DataFrame) else None)
+
+    def predict_survival_function(self, X):
+        hazard = self.baseline_cumulative_hazard_.iloc[:, 0].to_numpy()
+        partial = np.exp(self.predict_log_partial_hazard(X))
+        columns = X.index if isinstance(X, pd.DataFrame) else None
+        return pd.DataFrame(np.exp(-np.outer(hazard, partial)), index=self.baseline_cumulative_hazard_.index, columns=columns)
+
+
+def fit_cox_model(fit_df, duration_col, event_col, covariates, ties=None, initial_point=None):
+    #engine dispatch shared by the GUI and batch runs.
+    #ties=None -> lifelines.CoxPHFitter with a formula; "efron"/"breslow" -> NativeCoxModel
+    if covariates and ties is not None:
+        with stage(f"fit (native {ties})", rows=len(fit_df), covariates=len(covariates)) as span:
+            model = NativeCoxModel(ties).fit(fit_df, duration_col, event_col, covariates, initial_point=initial_point)
+            span.args["iterations"] = model.iterations_
+        return model
+    with stage("import lifelines"):
+        from lifelines import CoxPHFitter #deferred: importing lifelines alone takes over a second
+    cph = CoxPHFitter()
+    with stage("fit (lifelines)", rows=len(fit_df), covariates=len(covariates)):
+        if covariates:
+            #this is the formula section for adjusted, the cox function needs specific formula style
+            cph.fit(fit_df, duration_col=duration_col, event_col=event_col, formula=" + ".join(covariates))
+        else:
+            cph.fit(fit_df, duration_col=duration_col, event_col=event_col)
+    return cph
+
+
+def model_concordance(model, fit_df, duration_col, event_col, covariates):
+    from cox_stats import concordance_index
+    #here we predict on the same data used for fit, using only the covariate columns
+    with stage("predict_partial_hazard", rows=len(fit_df)):
+        predictions = model.predict_partial_hazard(fit_df[covariates])
+    with stage("concordance index", rows=len(fit_df)):
+        return concordance_index(fit_df[duration_col], -predictions, fit_df[event_col])
+
+
+def _curve_basis(model):
+    #everything partial-effect curves need from a fitted model (either engine), as arrays, computed once per model
+    basis = _curve_bases.get(model)
+    if basis is None:
+        covariates = list(model.params_.index)
+        hazard = model.baseline_cumulative_hazard_.iloc[:, 0]
+        norm_mean = model._norm_mean.loc[covariates] if isinstance(model._norm_mean, pd.Series) else model._norm_mean
+        basis = (hazard.index, hazard.to_numpy(dtype=np.float64), np.asarray(norm_mean, dtype=np.float64),
+                 model.params_.to_numpy(dtype=np.float64), model._central_values[covariates].iloc[0].to_numpy(dtype=np.float64))
+        _curve_bases[model] = basis
+    return basis
+
+
+def partial_effect_curves(model, covariate, values):
+    #survival curves with `covariate` at each of `values` and every other covariate at its central value,
+    #plus the curve at the central values; same curves as lifelines' plot_partial_effects_on_outcome
+    with stage("partial effect curves", curves=len(values)) as span:
+        timeline, hazard, norm_mean, params, central = _curve_basis(model)
+        span.args["time_points"] = len(timeline)
+        j = list(model.params_.index).index(covariate)
+        X = np.tile(central, (len(values) + 1, 1))
+        X[1:, j] = values
+        survival = np.exp(-np.outer(hazard, np.exp((X - norm_mean) @ params)))
+    curves = pd.DataFrame(survival[:, 1:], index=timeline, columns=[f"{covariate}={v}" for v in values])
+    return curves, pd.Series(survival[:, 0], index=timeline, name="baseline")
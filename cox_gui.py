@@ -2,11 +2,495 @@
 #easy to use Cox regression based on lifelines lib 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
+import numpy as np
 import pandas as pd
-from lifelines import CoxPHFitter #using lifeline cox fitter
-from lifelines.utils import concordance_index
-import matplotlib.pyplot as plt #for plots
+from cox_data import Dataset, DataPreparationError #compact loader, columnar cache, prepared-data cache
+from cox_screening import SCREEN_RESULT_COLUMNS, build_screening_matrix, screen_univariate
+from cox_penalized import N_LAMBDAS, penalized_path #elastic-net path with cross-validated penalty
+from cox_stepwise import STEP_RESULT_COLUMNS, STEPWISE_DIRECTIONS, DesignMatrix, stepwise_select
+from cox_subgroups import GROUP_RESULT_COLUMNS, POOLED_RESULT_COLUMNS, fit_by_group, partition_by_group
+#lifelines (via cox_engine.fit_cox_model) and matplotlib are imported on first use, which keeps startup fast
+from cox_engine import fit_cox_model, model_concordance, partial_effect_curves #lifelines CoxPHFitter or native numpy engine
+from cox_stats import validate_concordance
+from cox_store import StoredCoxModel, list_models, load_model, model_key, save_model #fitted models on disk, by data + spec hash
+from cox_ph import TIME_TRANSFORMS, proportional_hazard_table #cached scaled Schoenfeld residual test, either engine
+from cox_trace import TRACER, export_chrome_trace, format_breakdown, stage #per-stage wall time, peak memory, rows
 import traceback #error reporting
+import itertools
+import os
+import re
+import threading
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    #one unit of background work; the worker can poll `cancelled` between steps
+    def __init__(self, job_id, name, runner=None):
+        self.id = job_id
+        self.name = name
+        self.cancelled = threading.Event()
+        self.future = None
+        self.on_cancel = None
+        self._runner = runner
+
+    def report_progress(self, fraction):
+        #callable from the worker; fraction in [0, 1]
+        if self._runner is not None:
+            self._runner.call_in_ui(self._runner._on_job_progress, self, fraction)
+
+
+class JobRunner:
+    #runs heavy work (fits, PH checks, plot data) off the Tk thread.
+    #a single worker keeps jobs in click order: a job queued behind a fit reads the fit's model from its ModelSlot
+    #on the worker, while state the Tk thread reads is only published by on_done callbacks.
+    #results are handed back to the Tk thread through root.after polling, never touched from the worker.
+    def __init__(self, root, on_state_change=None, on_progress=None, max_workers=1, poll_ms=50):
+        self.root = root
+        self.on_state_change = on_state_change
+        self.on_progress = on_progress
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cox-job")
+        self._ui_queue = queue.Queue()
+        self._jobs = []
+        self._running = None
+        self._next_id = 1
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, name, work, on_done=None, on_error=None, on_cancel=None):
+        #on_cancel runs on the Tk thread once a cancelled job is over: at once if it never started, else when it returns
+        job = Job(self._next_id, name, runner=self)
+        job.on_cancel = on_cancel
+        self._next_id += 1
+        job.future = self._executor.submit(self._run, job, work, on_done, on_error)
+        self._jobs.append(job)
+        self._notify()
+        return job
+
+    def call_in_ui(self, func, *args):
+        #safe from any thread; func runs on the Tk thread at the next poll
+        self._ui_queue.put((None, func, args))
+
+    def cancel_all(self):
+        for job in self._jobs:
+            job.cancelled.set()
+            job.future.cancel()
+        never_started = [job for job in self._jobs if job.future.cancelled()]
+        self._jobs = [job for job in self._jobs if not job.future.cancelled()]
+        for job in never_started:
+            if job.on_cancel is not None:
+                job.on_cancel()
+        self._notify()
+
+    def pending(self):
+        return len(self._jobs)
+
+    def running_name(self):
+        return self._running.name if self._running is not None else None
+
+    def shutdown(self):
+        self.cancel_all()
+        self._executor.shutdown(wait=False)
+
+    def _run(self, job, work, on_done, on_error):
+        try:
+            if job.cancelled.is_set():
+                return
+            self._ui_queue.put((job, self._set_running, (job,)))
+            #every job is a top-level stage; the stages the work marks nest under it
+            with stage(job.name, job=job.id):
+                result = work(job)
+        except Exception as e:
+            if on_error is not None:
+                self._ui_queue.put((job, on_error, (e, traceback.format_exc())))
+        else:
+            if on_done is not None:
+                self._ui_queue.put((job, on_done, (result,)))
+        finally:
+            self._ui_queue.put((None, self._finish, (job,)))
+
+    def _on_job_progress(self, job, fraction):
+        if self.on_progress is not None and not job.cancelled.is_set():
+            self.on_progress(job, fraction)
+
+    def _set_running(self, job):
+        self._running = job
+        self._notify()
+
+    def _finish(self, job):
+        if job in self._jobs:
+            self._jobs.remove(job)
+        if self._running is job:
+            self._running = None
+        if job.cancelled.is_set() and job.on_cancel is not None:
+            job.on_cancel()
+        self._notify(cancelled_job=job if job.cancelled.is_set() else None)
+
+    def _notify(self, cancelled_job=None):
+        if self.on_state_change is not None:
+            self.on_state_change(cancelled_job)
+
+    def _poll(self):
+        try:
+            while True:
+                job, func, args = self._ui_queue.get_nowait()
+                #results of cancelled jobs are dropped; bookkeeping (job is None) always runs
+                if job is not None and job.cancelled.is_set() and func is not self._set_running:
+                    continue
+                func(*args)
+        except queue.Empty:
+            pass
+        self.root.after(self.poll_ms, self._poll)
+
+
+class ModelSlot:
+    #the model that jobs queued after a fit (or a saved-model load) work on. the fit fills its slot in on the worker,
+    #so those jobs, which run after it on the same worker, see the new model before the Tk thread has published it;
+    #a slot never filled (the fit failed before fitting, or selected nothing) stands for the model before it
+    def __init__(self, previous=None, result=None):
+        self._previous = previous
+        self._result = result
+        self._filled = previous is None
+
+    def fill(self, result):
+        self._result = result
+        self._filled = True
+        self._previous = None
+
+    @property
+    def result(self):
+        #(model, covariates, fit frame, duration column, event column) or None
+        return self._result if self._filled else self._previous.result
+
+
+#engine choice -> ties method for the native engine (None means lifelines.CoxPHFitter)
+ENGINE_CHOICES = {
+    "lifelines": None,
+    "native (Efron ties)": "efron",
+    "native (Breslow ties)": "breslow",
+}
+
+
+#k for the cross-validated C-index
+CV_FOLDS = 5
+
+#stepwise selection: likelihood-ratio p-value below which a covariate enters, above which it leaves
+STEPWISE_P_ENTER = 0.05
+STEPWISE_P_REMOVE = 0.10
+
+#how the elastic-net path picks its penalty (cross-validated, CV_FOLDS folds)
+PATH_METRIC_CHOICES = {
+    "CV: partial likelihood": "likelihood",
+    "CV: C-index": "c-index",
+}
+
+
+#results log is trimmed to this many lines (oldest first) so long sessions don't grow without bound
+RESULTS_MAX_LINES = 20000
+#coefficient tables longer than this only go to the Coefficients tab, not into the log text
+SUMMARY_TEXT_MAX_ROWS = 30
+
+
+class VirtualTable(ttk.Frame):
+    #ttk.Treeview that only ever holds the rows currently in view; scrolling re-fills them from self.rows,
+    #so tables with tens of thousands of rows cost the same to show as ten rows
+    def __init__(self, parent, columns=(), row_height=20, height=10, selectmode="browse", row_tags=None):
+        super().__init__(parent)
+        self.row_height = row_height
+        self.row_tags = row_tags #optional row -> tuple of Treeview tags, applied as rows are rendered
+        self.tree = ttk.Treeview(self, show="headings", height=height, selectmode=selectmode)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.rows = []
+        self.start = 0
+        self.visible = height
+        self._render_pending = False
+        self._sort_descending = {}
+        self.set_columns(columns)
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_rows(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+
+    def set_columns(self, columns):
+        self.columns = list(columns)
+        self.tree.configure(columns=self.columns)
+        for i, col in enumerate(self.columns):
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=90, anchor=tk.W if i == 0 else tk.E)
+        self._sort_descending = {}
+
+    def set_rows(self, rows):
+        #rows: sequences of raw values in column order
+        self.rows = [list(row) for row in rows]
+        self.start = 0
+        self._schedule_render()
+
+    def append_row(self, row):
+        self.rows.append(list(row))
+        self._schedule_render()
+
+    def clear(self):
+        self.set_rows([])
+
+    @staticmethod
+    def _format(value):
+        if value is None or (isinstance(value, float) and value != value):
+            return ""
+        if isinstance(value, float):
+            return f"{value:.4g}"
+        return str(value)
+
+    def sort_by(self, col):
+        #numbers sort numerically, text alphabetically after them, blanks always last
+        j = self.columns.index(col)
+        descending = self._sort_descending.get(col, False)
+        def is_blank(v):
+            return v is None or v == "" or (isinstance(v, float) and v != v)
+        def is_number(v):
+            return isinstance(v, (int, float)) and not isinstance(v, bool)
+        numeric = [row for row in self.rows if not is_blank(row[j]) and is_number(row[j])]
+        text = [row for row in self.rows if not is_blank(row[j]) and not is_number(row[j])]
+        blank = [row for row in self.rows if is_blank(row[j])]
+        numeric.sort(key=lambda row: row[j], reverse=descending)
+        text.sort(key=lambda row: str(row[j]), reverse=descending)
+        self.rows = numeric + text + blank
+        self._sort_descending[col] = not descending
+        self.start = 0
+        self._schedule_render()
+
+    def scroll_rows(self, delta):
+        self._set_start(self.start + delta)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._set_start(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self._set_start(self.start + int(amount) * step)
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.row_height) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self._schedule_render()
+
+    def _set_start(self, start):
+        start = max(0, min(start, max(0, len(self.rows) - self.visible)))
+        if start != self.start:
+            self.start = start
+            self._schedule_render()
+
+    def _schedule_render(self):
+        #many appends in a row (e.g. streamed screening results) cost one redraw
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        if not self.winfo_exists():
+            return
+        self.start = max(0, min(self.start, max(0, len(self.rows) - self.visible)))
+        window = self.rows[self.start:self.start + self.visible]
+        self.tree.delete(*self.tree.get_children())
+        for row in window:
+            tags = self.row_tags(row) if self.row_tags is not None else ()
+            self.tree.insert("", tk.END, values=[self._format(v) for v in row], tags=tags)
+        n = max(len(self.rows), 1)
+        self.scrollbar.set(self.start / n, min(1.0, (self.start + self.visible) / n))
+
+
+class ResultsTableWindow:
+    #sortable table in its own window; rows can be streamed in while a job is still running
+    def __init__(self, root, title, columns):
+        self.columns = list(columns)
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.geometry("900x400")
+        frame = ttk.Frame(self.window, padding="5")
+        frame.pack(expand=True, fill=tk.BOTH)
+        self.table = VirtualTable(frame, self.columns)
+        self.table.pack(expand=True, fill=tk.BOTH)
+
+    def add_row(self, row):
+        if self.window.winfo_exists():
+            self.table.append_row([row.get(col) for col in self.columns])
+
+    def set_rows(self, rows):
+        if self.window.winfo_exists():
+            self.table.set_rows([[row.get(col) for col in self.columns] for row in rows])
+
+
+class ColumnPicker(ttk.Frame):
+    #multi-select column list for very wide datasets: rows are drawn by a VirtualTable, so 100k columns cost
+    #the same as ten; the list is narrowed by name (substring or regex) and dtype before selecting
+    DTYPE_FILTERS = ("All types", "Numeric", "Integer", "Float", "Categorical / text")
+    FILTER_DELAY_MS = 150
+
+    def __init__(self, parent, height=5):
+        super().__init__(parent)
+        self.names, self.kinds, self.rows, self.matching = [], [], [], []
+        self.selected = set()
+        self._lowered = []
+        self._filter_job = None
+
+        controls = ttk.Frame(self)
+        controls.pack(fill=tk.X)
+        self.filter_var = tk.StringVar()
+        self.filter_entry = ttk.Entry(controls, textvariable=self.filter_var, width=18)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.filter_entry.bind("<Return>", lambda e: self.select_matching())
+        self.regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Regex", variable=self.regex_var, command=self._apply_filter).pack(side=tk.LEFT, padx=(5,0))
+        self.dtype_var = tk.StringVar(value=self.DTYPE_FILTERS[0])
+        dtype_combo = ttk.Combobox(controls, textvariable=self.dtype_var, values=self.DTYPE_FILTERS, state="readonly", width=16)
+        dtype_combo.pack(side=tk.LEFT, padx=(5,0))
+        dtype_combo.bind("<<ComboboxSelected>>", lambda e: self._apply_filter())
+        #typing re-filters after a short pause instead of on every key
+        self.filter_var.trace_add("write", lambda *args: self._schedule_filter())
+
+        self.table = VirtualTable(self, ("column", "type"), height=height, selectmode="none", row_tags=self._row_tags)
+        self.table.tree.column("column", width=170)
+        self.table.tree.column("type", width=70)
+        self.table.tree.tag_configure("selected", background="#cce4ff")
+        self.table.tree.bind("<Button-1>", self._on_click)
+        self.table.pack(fill=tk.BOTH, expand=True, pady=2)
+
+        actions = ttk.Frame(self)
+        actions.pack(fill=tk.X)
+        ttk.Button(actions, text="Select matching", command=self.select_matching).pack(side=tk.LEFT)
+        ttk.Button(actions, text="Deselect matching", command=self.deselect_matching).pack(side=tk.LEFT, padx=2)
+        ttk.Button(actions, text="Clear", command=self.clear_selection).pack(side=tk.LEFT)
+        self.status_var = tk.StringVar()
+        ttk.Label(actions, textvariable=self.status_var).pack(side=tk.LEFT, padx=5)
+
+    @staticmethod
+    def _dtype_kinds(dtype):
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            return {"Numeric", "Integer"}
+        if pd.api.types.is_float_dtype(dtype):
+            return {"Numeric", "Float"}
+        if pd.api.types.is_numeric_dtype(dtype):
+            return {"Numeric"}
+        return {"Categorical / text"}
+
+    def set_columns(self, names, dtypes=None):
+        #dtypes: optional Series of column -> dtype (e.g. Dataset.dtypes()); columns without one count as text
+        self.names = list(names)
+        self._lowered = [str(name).lower() for name in self.names]
+        dtypes = dict(dtypes.items()) if dtypes is not None else {}
+        #classify each distinct dtype once; wide files have 100k columns but only a handful of dtypes
+        kinds_by_dtype = {str(dtype): self._dtype_kinds(dtype) for dtype in set(dtypes.values())}
+        labels = [str(dtypes[name]) if name in dtypes else "" for name in self.names]
+        self.kinds = [kinds_by_dtype.get(label, {"Categorical / text"}) for label in labels]
+        self.rows = [[name, label] for name, label in zip(self.names, labels)]
+        self.selected = set()
+        self._apply_filter()
+
+    def _schedule_filter(self):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(self.FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        indices = range(len(self.names))
+        kind = self.dtype_var.get()
+        if kind != self.DTYPE_FILTERS[0]:
+            indices = [i for i in indices if kind in self.kinds[i]]
+        pattern = self.filter_var.get().strip()
+        if pattern:
+            if self.regex_var.get():
+                try:
+                    rx = re.compile(pattern, re.IGNORECASE)
+                except re.error as e:
+                    self.status_var.set(f"Invalid regex: {e}")
+                    return
+                indices = [i for i in indices if rx.search(str(self.names[i]))]
+            else:
+                needle = pattern.lower()
+                indices = [i for i in indices if needle in self._lowered[i]]
+        self.matching = [self.names[i] for i in indices]
+        self.table.set_rows([self.rows[i] for i in indices])
+        self._update_status()
+
+    def _row_tags(self, row):
+        return ("selected",) if row[0] in self.selected else ()
+
+    def _on_click(self, event):
+        #a click toggles one column; the Treeview's own selection is off because its items are recycled on scroll
+        item = self.table.tree.identify_row(event.y)
+        if not item:
+            return
+        position = self.table.start + self.table.tree.index(item)
+        if position >= len(self.table.rows):
+            return
+        name = self.table.rows[position][0]
+        if name in self.selected:
+            self.selected.discard(name)
+        else:
+            self.selected.add(name)
+        self._refresh()
+
+    def select_matching(self):
+        self.selected.update(self.matching)
+        self._refresh()
+
+    def deselect_matching(self):
+        self.selected.difference_update(self.matching)
+        self._refresh()
+
+    def clear_selection(self):
+        self.selected.clear()
+        self._refresh()
+
+    def set_selection(self, names):
+        self.selected = set(names) & set(self.names)
+        self._refresh()
+
+    def _refresh(self):
+        self.table._schedule_render()
+        self._update_status()
+
+    def _update_status(self):
+        self.status_var.set(f"{len(self.matching)} of {len(self.names)} shown, {len(self.selected)} selected")
+
+    def selected_columns(self):
+        #in dataset order, so the same selection always gives the same model (and prepared-data cache key)
+        if not self.selected:
+            return []
+        return [name for name in self.names if name in self.selected]
+
+
+class ColumnCombobox(ttk.Combobox):
+    #editable combobox with type-ahead: the drop-down only ever holds the first MAX_VALUES columns matching
+    #what has been typed, so opening it stays instant on datasets with 100k columns
+    MAX_VALUES = 200
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.all_values = []
+        self._lowered = []
+        self.bind("<KeyRelease>", self._on_key)
+
+    def set_columns(self, columns):
+        self.all_values = list(columns)
+        self._lowered = [str(c).lower() for c in self.all_values]
+        self.configure(values=self.all_values[:self.MAX_VALUES])
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        needle = self.get().strip().lower()
+        if needle:
+            matches = (c for c, low in zip(self.all_values, self._lowered) if needle in low)
+        else:
+            matches = iter(self.all_values)
+        self.configure(values=list(itertools.islice(matches, self.MAX_VALUES)))
+
 
 class CoxRegressionApp:
     def __init__(self, root):
@@ -14,10 +498,14 @@ class CoxRegressionApp:
         self.root.title("Cox Regression GUI Analyzer")
         self.root.geometry("800x700")
 
-        self.df = None
+        self.dataset = None
         self.fitted_model = None
         self.last_run_covariates = []
         self.last_run_data_subset = None
+        self.last_run_outcome = (None, None) #duration and event columns of the current model
+        self.last_screening_results = None
+        self._design = None #DesignMatrix of the last native fit: sorted columns and coefficients, for warm refits
+        self._model_slot = ModelSlot() #the model a job submitted now will see, once the jobs before it have run
 
 
         #GUI setup
@@ -40,27 +528,23 @@ class CoxRegressionApp:
 
         ttk.Label(columns_frame, text="Duration (Time-to-Event):").grid(row=0, column=0, padx=5, pady=2, sticky=tk.W)
         self.duration_var = tk.StringVar()
-        self.duration_combo = ttk.Combobox(columns_frame, textvariable=self.duration_var, state="readonly", width=25)
+        self.duration_combo = ColumnCombobox(columns_frame, textvariable=self.duration_var, width=25)
         self.duration_combo.grid(row=0, column=1, padx=5, pady=2, sticky=tk.W)
 
         ttk.Label(columns_frame, text="Event (1=Event, 0=Censored):").grid(row=1, column=0, padx=5, pady=2, sticky=tk.W)
         self.event_var = tk.StringVar()
-        self.event_combo = ttk.Combobox(columns_frame, textvariable=self.event_var, state="readonly", width=25)
+        self.event_combo = ColumnCombobox(columns_frame, textvariable=self.event_var, width=25)
         self.event_combo.grid(row=1, column=1, padx=5, pady=2, sticky=tk.W)
 
         ttk.Label(columns_frame, text="Variable of Interest:").grid(row=2, column=0, padx=5, pady=2, sticky=tk.W)
         self.voi_var = tk.StringVar()
-        self.voi_combo = ttk.Combobox(columns_frame, textvariable=self.voi_var, state="readonly", width=25)
+        self.voi_combo = ColumnCombobox(columns_frame, textvariable=self.voi_var, width=25)
         self.voi_combo.grid(row=2, column=1, padx=5, pady=2, sticky=tk.W)
 
         ttk.Label(columns_frame, text="Covariates (for Adjusted Model):").grid(row=0, column=2, padx=15, pady=2, sticky=tk.W)
-        self.covariates_listbox_frame = ttk.Frame(columns_frame)
-        self.covariates_listbox_frame.grid(row=0, column=3, rowspan=3, padx=5, pady=2, sticky=tk.NSEW)
-        self.covariates_listbox = tk.Listbox(self.covariates_listbox_frame, selectmode=tk.MULTIPLE, exportselection=False, height=5, width=30)
-        self.covariates_listbox_scrollbar = ttk.Scrollbar(self.covariates_listbox_frame, orient=tk.VERTICAL, command=self.covariates_listbox.yview)
-        self.covariates_listbox.configure(yscrollcommand=self.covariates_listbox_scrollbar.set)
-        self.covariates_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.covariates_listbox_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        #filter box (substring, or regex when ticked) + dtype filter; click rows to toggle, Enter selects all matches
+        self.covariates_picker = ColumnPicker(columns_frame, height=5)
+        self.covariates_picker.grid(row=0, column=3, rowspan=3, padx=5, pady=2, sticky=tk.NSEW)
 
         analysis_frame = ttk.LabelFrame(main_frame, text="3. Run Analysis", padding="10")
         analysis_frame.pack(fill=tk.X, pady=5)
@@ -70,6 +554,9 @@ class CoxRegressionApp:
 
         self.run_adjusted_button = ttk.Button(analysis_frame, text="Run Adjusted Cox Regression", command=self.run_adjusted_cox)
         self.run_adjusted_button.grid(row=0, column=1, padx=5, pady=5)
+
+        self.screen_button = ttk.Button(analysis_frame, text="Screen All Selected (Unadjusted)", command=self.run_screening)
+        self.screen_button.grid(row=0, column=2, padx=5, pady=5)
         
         self.check_prophaz_button = ttk.Button(analysis_frame, text="Check Proportional Hazards", command=self.check_proportional_hazards)
         self.check_prophaz_button.grid(row=1, column=0, padx=5, pady=5)
@@ -81,13 +568,155 @@ class CoxRegressionApp:
         self.plot_covariate_var = tk.StringVar()
         self.plot_covariate_combo = ttk.Combobox(plot_effects_frame, textvariable=self.plot_covariate_var, state="readonly", width=20)
         self.plot_covariate_combo.pack(side=tk.LEFT)
+        #once a plot is showing, picking another covariate redraws it straight away
+        self.plot_covariate_combo.bind("<<ComboboxSelected>>", self._on_plot_covariate_selected)
+
+        engine_frame = ttk.Frame(analysis_frame)
+        engine_frame.grid(row=1, column=2, padx=5, pady=5, sticky=tk.W)
+        ttk.Label(engine_frame, text="Engine:").pack(side=tk.LEFT, padx=(0,5))
+        self.engine_var = tk.StringVar(value="lifelines")
+        self.engine_combo = ttk.Combobox(engine_frame, textvariable=self.engine_var, values=list(ENGINE_CHOICES), state="readonly", width=20)
+        self.engine_combo.pack(side=tk.LEFT)
+
+        self.validate_button = ttk.Button(analysis_frame, text="Validate C-index (Bootstrap + CV)", command=self.validate_c_index)
+        self.validate_button.grid(row=2, column=0, padx=5, pady=5)
+
+        self.saved_models_button = ttk.Button(analysis_frame, text="Saved Models...", command=self.open_saved_models)
+        self.saved_models_button.grid(row=2, column=1, padx=5, pady=5)
+
+        #timing breakdown after each job; memory peaks need tracemalloc, which slows allocation-heavy stages
+        trace_frame = ttk.Frame(analysis_frame)
+        trace_frame.grid(row=2, column=2, padx=5, pady=5, sticky=tk.W)
+        self.trace_var = tk.BooleanVar(value=True)
+        self.trace_memory_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(trace_frame, text="Stage timings", variable=self.trace_var, command=self._on_trace_toggled).pack(side=tk.LEFT)
+        ttk.Checkbutton(trace_frame, text="Peak memory", variable=self.trace_memory_var, command=self._on_trace_toggled).pack(side=tk.LEFT, padx=5)
+        ttk.Button(trace_frame, text="Export Trace...", command=self.export_trace).pack(side=tk.LEFT)
+        self._trace_shown = 0 #TRACER.roots_finished already printed to the log
+
+        #the adjusted model once per level of a grouping column (site, sex, period, ...), fitted in parallel, then pooled
+        group_frame = ttk.Frame(analysis_frame)
+        group_frame.grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.fit_by_group_button = ttk.Button(group_frame, text="Fit Adjusted by Group:", command=self.run_by_group)
+        self.fit_by_group_button.pack(side=tk.LEFT, padx=(0,5))
+        self.group_var = tk.StringVar()
+        self.group_combo = ColumnCombobox(group_frame, textvariable=self.group_var, width=20)
+        self.group_combo.pack(side=tk.LEFT)
+
+        #elastic-net path over the selected covariates (thousands are fine), penalty picked by cross-validation
+        path_frame = ttk.Frame(analysis_frame)
+        path_frame.grid(row=3, column=2, padx=5, pady=5, sticky=tk.W)
+        self.penalized_path_button = ttk.Button(path_frame, text="Elastic-Net Path", command=self.run_penalized_path)
+        self.penalized_path_button.pack(side=tk.LEFT, padx=(0,5))
+        self.path_metric_var = tk.StringVar(value=next(iter(PATH_METRIC_CHOICES)))
+        ttk.Combobox(path_frame, textvariable=self.path_metric_var, values=list(PATH_METRIC_CHOICES), state="readonly", width=22).pack(side=tk.LEFT)
+
+        #forward/backward selection over the selected covariates by likelihood-ratio tests, on warm-started refits
+        stepwise_frame = ttk.Frame(analysis_frame)
+        stepwise_frame.grid(row=4, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.stepwise_button = ttk.Button(stepwise_frame, text="Stepwise Selection:", command=self.run_stepwise)
+        self.stepwise_button.pack(side=tk.LEFT, padx=(0,5))
+        self.stepwise_direction_var = tk.StringVar(value="both")
+        ttk.Combobox(stepwise_frame, textvariable=self.stepwise_direction_var, values=list(STEPWISE_DIRECTIONS), state="readonly", width=10).pack(side=tk.LEFT)
+
+        jobs_frame = ttk.Frame(analysis_frame)
+        jobs_frame.grid(row=5, column=0, columnspan=3, padx=5, pady=5, sticky=tk.EW)
+        self.job_progress = ttk.Progressbar(jobs_frame, mode="indeterminate", length=200)
+        self.job_progress.pack(side=tk.LEFT, padx=(0,5))
+        self.cancel_jobs_button = ttk.Button(jobs_frame, text="Cancel", command=self.cancel_jobs, state="disabled")
+        self.cancel_jobs_button.pack(side=tk.LEFT, padx=5)
+        self.job_status_label = ttk.Label(jobs_frame, text="Idle.")
+        self.job_status_label.pack(side=tk.LEFT, padx=5)
 
         results_frame = ttk.LabelFrame(main_frame, text="4. Results", padding="10")
         results_frame.pack(expand=True, fill=tk.BOTH, pady=5)
 
-        self.results_text = scrolledtext.ScrolledText(results_frame, wrap=tk.WORD, height=15, width=80)
+        self.results_notebook = ttk.Notebook(results_frame)
+        self.results_notebook.pack(expand=True, fill=tk.BOTH)
+        log_tab = ttk.Frame(self.results_notebook)
+        self.results_notebook.add(log_tab, text="Log")
+        self.results_text = scrolledtext.ScrolledText(log_tab, wrap=tk.WORD, height=15, width=80)
         self.results_text.pack(expand=True, fill=tk.BOTH)
         self.results_text.configure(state='disabled')
+        self._pending_results_text = []
+        self._results_flush_scheduled = False
+        coef_tab = ttk.Frame(self.results_notebook)
+        self.results_notebook.add(coef_tab, text="Coefficients")
+        self.coefficients_table = VirtualTable(coef_tab)
+        self.coefficients_table.pack(expand=True, fill=tk.BOTH)
+        #one figure and canvas for the life of the app, created on the first plot (that is when matplotlib loads)
+        self.plot_tab = ttk.Frame(self.results_notebook)
+        self.results_notebook.add(self.plot_tab, text="Plot")
+        self.plot_figure = None
+        self.plot_canvas = None
+
+        self.jobs = JobRunner(root, on_state_change=self._on_jobs_changed, on_progress=self._on_job_progress)
+        self._on_trace_toggled()
+
+    def _on_jobs_changed(self, cancelled_job=None):
+        self._show_new_timings()
+        if cancelled_job is not None:
+            self.results_text_append(f"\nJob '{cancelled_job.name}' was cancelled; its results were discarded.\n")
+        pending = self.jobs.pending()
+        if pending:
+            running = self.jobs.running_name() or "starting"
+            queued = pending - 1 if self.jobs.running_name() else pending
+            self.job_status_label.config(text=f"Running: {running} ({queued} queued)")
+            self.cancel_jobs_button.config(state="normal")
+            if str(self.job_progress['mode']) != "determinate":
+                self.job_progress.start(10)
+        else:
+            self.job_status_label.config(text="Idle.")
+            self.cancel_jobs_button.config(state="disabled")
+            self.job_progress.stop()
+            self.job_progress.config(mode="indeterminate", value=0)
+
+    def _on_job_progress(self, job, fraction):
+        #jobs that report progress switch the bar from "busy" to a real percentage
+        if str(self.job_progress['mode']) != "determinate":
+            self.job_progress.stop()
+            self.job_progress.config(mode="determinate", maximum=100)
+        self.job_progress.config(value=100 * fraction)
+
+    def _on_trace_toggled(self):
+        if self.trace_var.get():
+            TRACER.start(memory=self.trace_memory_var.get())
+        else:
+            TRACER.stop()
+
+    def _show_new_timings(self):
+        #stages finished since the last call (a job and anything the Tk thread timed), as a compact table
+        roots, self._trace_shown = TRACER.roots_since(self._trace_shown)
+        if roots and self.trace_var.get():
+            self.results_text_append("\n--- Timing ---\n" + format_breakdown(roots) + "\n")
+
+    def export_trace(self):
+        if not TRACER.roots_finished:
+            messagebox.showinfo("Export Trace", "No stages have been timed yet. Tick 'Stage timings' and run something first.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="cox_trace.json",
+                                            filetypes=[("Chrome trace (JSON)", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        metadata = {"data": self.dataset.file_path if self.dataset is not None else None,
+                    "engine": self.engine_var.get(), "exported": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        try:
+            n_stages = export_chrome_trace(path, metadata=metadata)
+        except OSError as e:
+            messagebox.showerror("Export Trace", f"Could not write the trace file.\nError: {e}")
+            return
+        self.results_text_append(f"\nWrote {n_stages} timed stages to {path} (open in chrome://tracing or ui.perfetto.dev).\n")
+
+    def cancel_jobs(self):
+        #queued jobs never start; a fit already inside lifelines can't be interrupted, so its result is dropped
+        self.jobs.cancel_all()
+        self._model_slot = ModelSlot(result=self._published_model())
+        self.results_text_append("\nCancellation requested for queued and running jobs.\n")
+
+    def _published_model(self):
+        if self.fitted_model is None:
+            return None
+        return (self.fitted_model, self.last_run_covariates, self.last_run_data_subset) + tuple(self.last_run_outcome)
 
     def load_csv(self):
         file_path = filedialog.askopenfilename(
@@ -96,52 +725,109 @@ class CoxRegressionApp:
         )
         if not file_path:
             return
-        try:
-            self.df = pd.read_csv(file_path)
-            self.file_label.config(text=file_path.split('/')[-1])
-            self.update_column_selectors()
-            self.results_text_clear()
-            self.results_text_append("CSV file loaded successfully.\n")
-            self.results_text_append(f"Shape: {self.df.shape[0]} rows, {self.df.shape[1]} columns.\n")
-            self.results_text_append("First 5 rows:\n")
-            self.results_text_append(str(self.df.head()) + "\n")
-            self.fitted_model = None
-            self.last_run_covariates = []
-            self.last_run_data_subset = None 
-            self.plot_covariate_combo['values'] = []
-            self.plot_covariate_var.set('')
-        except Exception as e:
-            messagebox.showerror("Error Loading CSV", f"Failed to load or parse CSV file.\nError: {e}")
-            self.df = None
-            self.file_label.config(text="No file loaded.")
-            self.update_column_selectors()
+        self.jobs.cancel_all() #queued work refers to the previous dataset
+        slot = self._model_slot = ModelSlot(result=self._published_model())
+        self.file_label.config(text=f"Loading {os.path.basename(file_path)}...")
+
+        def work(job):
+            #parsed in chunks on the worker; with pyarrow installed a Parquet sidecar makes the next open near-instant
+            dataset = Dataset.open(file_path, progress=job.report_progress, cancelled=job.cancelled.is_set)
+            if dataset is not None:
+                slot.fill(None) #the new data has no model yet
+            return dataset
+
+        self.jobs.submit(
+            "Load CSV",
+            work,
+            on_done=lambda dataset: self._on_csv_loaded(file_path, dataset),
+            on_error=self._on_csv_load_error,
+            on_cancel=self._restore_file_label,
+        )
+
+    def _on_csv_loaded(self, file_path, dataset):
+        if dataset is None:
+            return
+        self.dataset = dataset
+        self.file_label.config(text=os.path.basename(file_path))
+        self.update_column_selectors()
+        self.results_text_clear()
+        self.results_text_append("CSV file loaded successfully.\n")
+        if dataset.from_cache:
+            self.results_text_append("(Read from the cached columnar copy of this file.)\n")
+        self.results_text_append(f"Shape: {self.dataset.shape[0]} rows, {self.dataset.shape[1]} columns.\n")
+        self.results_text_append("First 5 rows:\n")
+        self.results_text_append(str(self.dataset.head()) + "\n")
+        self.fitted_model = None
+        self.last_run_covariates = []
+        self.last_run_data_subset = None 
+        self.last_run_outcome = (None, None)
+        self._design = None
+        self.coefficients_table.clear()
+        self.plot_covariate_combo['values'] = []
+        self.plot_covariate_var.set('')
+        self._clear_plot()
+
+    def _on_csv_load_error(self, e, tb):
+        messagebox.showerror("Error Loading CSV", f"Failed to load or parse CSV file.\nError: {e}")
+        self._restore_file_label()
+
+    def _restore_file_label(self):
+        #a failed or cancelled load leaves the previous dataset (if any) in use, so the label names it again
+        self.file_label.config(text=os.path.basename(self.dataset.file_path) if self.dataset is not None else "No file loaded.")
 
     def update_column_selectors(self):
-        columns = list(self.df.columns) if self.df is not None else []
-        self.duration_combo['values'] = columns
-        self.event_combo['values'] = columns
-        self.voi_combo['values'] = columns
-        self.covariates_listbox.delete(0, tk.END)
-        for col in columns:
-            self.covariates_listbox.insert(tk.END, col)
+        columns = list(self.dataset.columns) if self.dataset is not None else []
+        self.duration_combo.set_columns(columns)
+        self.event_combo.set_columns(columns)
+        self.voi_combo.set_columns(columns)
+        self.group_combo.set_columns(columns)
+        self.covariates_picker.set_columns(columns, self.dataset.dtypes() if self.dataset is not None else None)
         if not columns:
             self.duration_var.set('')
             self.event_var.set('')
             self.voi_var.set('')
+            self.group_var.set('')
 
     def results_text_append(self, text_to_append):
+        if threading.current_thread() is not threading.main_thread():
+            self.jobs.call_in_ui(self.results_text_append, text_to_append)
+            return
+        #buffered: the widget is updated once per idle cycle, however many appends happened in between
+        self._pending_results_text.append(text_to_append)
+        if not self._results_flush_scheduled:
+            self._results_flush_scheduled = True
+            self.root.after_idle(self._flush_results_text)
+
+    def _flush_results_text(self):
+        self._results_flush_scheduled = False
+        if not self._pending_results_text:
+            return
+        text = "".join(self._pending_results_text)
+        self._pending_results_text = []
         self.results_text.configure(state='normal')
-        self.results_text.insert(tk.END, text_to_append)
+        self.results_text.insert(tk.END, text)
+        #ring buffer: drop the oldest lines beyond the cap
+        line_count = int(self.results_text.index('end-1c').split('.')[0])
+        if line_count > RESULTS_MAX_LINES:
+            self.results_text.delete('1.0', f"{line_count - RESULTS_MAX_LINES + 1}.0")
         self.results_text.configure(state='disabled')
         self.results_text.see(tk.END)
 
     def results_text_clear(self):
+        self._pending_results_text = []
         self.results_text.configure(state='normal')
         self.results_text.delete('1.0', tk.END)
         self.results_text.configure(state='disabled')
 
-    def _get_selected_columns(self, include_covariates_for_adjusted=False, include_voi=False):
-        if self.df is None:
+    def show_coefficients(self, summary_df):
+        #full coefficient table, however many covariates, in the virtualized Coefficients tab
+        columns = [summary_df.index.name or "covariate"] + [str(c) for c in summary_df.columns]
+        self.coefficients_table.set_columns(columns)
+        self.coefficients_table.set_rows([[str(name)] + [float(v) for v in values] for name, values in zip(summary_df.index, summary_df.to_numpy())])
+
+    def _get_selection(self, include_covariates_for_adjusted=False, include_voi=False):
+        #checks the choices on the Tk thread; the data itself is prepared in the job (_prepare_selection)
+        if self.dataset is None:
             messagebox.showerror("Error", "Please load a CSV file first.")
             return None
 
@@ -152,35 +838,13 @@ class CoxRegressionApp:
             messagebox.showerror("Error", "Please select Duration and Event columns.")
             return None
 
-        selected_data = self.df.copy() 
-
-        try:
-            selected_data[duration_col] = pd.to_numeric(selected_data[duration_col])
-            if selected_data[duration_col].isnull().any(): 
-                self.results_text_append(f"Warning: Duration column '{duration_col}' has missing values after numeric conversion. Rows with these NaNs will be dropped.\n")
-        except ValueError: 
-            messagebox.showerror("Error", f"Duration column '{duration_col}' must be convertible to a numeric type.")
-            return None
-        
-        try:
-            selected_data[event_col] = pd.to_numeric(selected_data[event_col])
-            if selected_data[event_col].isnull().any():
-                 self.results_text_append(f"Warning: Event column '{event_col}' has missing values after numeric conversion. Rows with these NaNs will be dropped.\n")
-            if not selected_data[event_col].dropna().isin([0, 1]).all(): 
-                messagebox.showwarning("Warning", f"Event column '{event_col}' contains values other than 0 and 1 (and NaNs). Ensure 1 means event and 0 means censored.")
-        except ValueError:
-            messagebox.showerror("Error", f"Event column '{event_col}' must be convertible to a numeric type.")
-            return None
-
-        cols_to_use_for_dropna = [duration_col, event_col]
         raw_covariate_col_names = [] 
         
         if include_covariates_for_adjusted:
-            selected_indices = self.covariates_listbox.curselection()
-            if not selected_indices:
+            raw_covariate_col_names = self.covariates_picker.selected_columns()
+            if not raw_covariate_col_names:
                 messagebox.showerror("Error", "Please select at least one covariate for the adjusted model.")
                 return None
-            raw_covariate_col_names = [self.covariates_listbox.get(i) for i in selected_indices]
         elif include_voi:
             voi_col_name = self.voi_var.get()
             if not voi_col_name:
@@ -188,234 +852,634 @@ class CoxRegressionApp:
                 return None
             raw_covariate_col_names = [voi_col_name]
 
-        processed_covariate_cols_for_formula = []
-        for col_name in raw_covariate_col_names:
-            if col_name == duration_col or col_name == event_col:
-                messagebox.showerror("Error", f"Covariate/VOI '{col_name}' cannot be the same as Duration or Event column.")
-                return None
-            try:
-                #forcing to numeric, coercing errors. If a column is truly categorical and
-                #needs to be treated as such by lifelines (e.g. with C() syntax),
-                #this simple conversion might not be ideal. But for basic numeric covariates, it's fine.
-                numeric_col_series = pd.to_numeric(selected_data[col_name], errors='coerce')
-                
-                if numeric_col_series.isnull().all():
-                    msg = f"Covariate/VOI '{col_name}' contains no valid numeric data after conversion and will be excluded."
-                    if include_voi: messagebox.showerror("Data Error", msg); return None
-                    else: messagebox.showwarning("Data Warning", msg); continue 
-                
-                selected_data[col_name] = numeric_col_series 
-                cols_to_use_for_dropna.append(col_name)
-                processed_covariate_cols_for_formula.append(col_name) 
-
-            except Exception as e: 
-                msg = f"Could not process covariate/VOI '{col_name}' as numeric (Error: {e}). It will be skipped."
-                if include_voi: messagebox.showerror("Data Error", msg); return None
-                else: messagebox.showwarning("Conversion Warning", msg); continue
-        
-        if include_voi and not processed_covariate_cols_for_formula:
-             messagebox.showerror("Error", "The selected Variable of Interest could not be processed or was invalid.")
-             return None
-        if include_covariates_for_adjusted and not processed_covariate_cols_for_formula:
-            messagebox.showerror("Error", "No valid covariates selected or remaining after initial processing for the adjusted model.")
-            return None
+        return self.dataset, duration_col, event_col, raw_covariate_col_names, include_voi
 
-        original_rows = len(selected_data)
-        selected_data.dropna(subset=cols_to_use_for_dropna, inplace=True)
-        
-        if len(selected_data) < original_rows:
-            self.results_text_append(f"Note: {original_rows - len(selected_data)} rows with missing values in selected columns (Duration, Event, and processed Covariates/VOI) were dropped.\n")
-        
-        if len(selected_data) == 0:
-            messagebox.showerror("Error", "No data remains after dropping missing values from selected columns.")
-            return None
+    def _prepare_selection(self, selection):
+        #runs on the worker; a DataPreparationError reaches the job's on_error (see _on_data_error)
+        dataset, duration_col, event_col, raw_covariate_col_names, strict = selection
+        with stage("select columns", covariates=len(raw_covariate_col_names)):
+            prepared = dataset.prepare(duration_col, event_col, raw_covariate_col_names, strict_covariates=strict)
+        self._report_prepared(prepared)
+        #prepared.frame is cached and shared (no copies); it must not be modified downstream
+        return prepared.frame, duration_col, event_col, prepared.covariate_cols
 
-        final_valid_formula_cols = []
-        if processed_covariate_cols_for_formula: 
-            for col_name in processed_covariate_cols_for_formula:
-                if selected_data[col_name].nunique(dropna=True) <= 1: 
-                    msg = f"Covariate/VOI '{col_name}' has no variance (all values are the same) in the filtered data and will be excluded."
-                    if include_voi and len(processed_covariate_cols_for_formula) == 1: 
-                        messagebox.showerror("Data Error", msg)
-                        return None
-                    else: 
-                        messagebox.showwarning("Data Warning", msg)
-                        continue 
-                final_valid_formula_cols.append(col_name)
-        
-        if (include_voi or include_covariates_for_adjusted) and not final_valid_formula_cols:
-            messagebox.showerror("Error", "No usable covariates/VOI with variance remain after data cleaning. Cannot fit model.")
-            return None
-            
-        return selected_data, duration_col, event_col, final_valid_formula_cols
+    def _report_prepared(self, prepared):
+        for note in prepared.notes:
+            self.results_text_append(note)
+        for warning in prepared.warnings:
+            self.jobs.call_in_ui(messagebox.showwarning, "Data Warning", warning)
 
+    def _on_data_error(self, e):
+        #True if the job failed while preparing its data; shown like the selection checks, without a traceback
+        if not isinstance(e, DataPreparationError):
+            return False
+        messagebox.showerror("Data Error", str(e))
+        self.results_text_append(f"\nCould not prepare the data: {e}\n")
+        return True
 
-    def run_cox_model(self, data_subset, duration_col, event_col, covariate_cols_for_formula):
-        cph = CoxPHFitter()
-        self.last_run_data_subset = None 
-        try:
-            current_formula_str = None
-            columns_for_fit_df = [duration_col, event_col] 
-
-            if covariate_cols_for_formula:
-                #this is the formula section for adjusted, the cox function needs specific formula style
-                current_formula_str = " + ".join(covariate_cols_for_formula) 
-                self.results_text_append(f"Fitting model with formula: '{current_formula_str}'\n")
-                columns_for_fit_df.extend(covariate_cols_for_formula)
-                #ensure no duplicate columns
-                columns_for_fit_df = sorted(list(set(columns_for_fit_df))) 
-                fit_df = data_subset[columns_for_fit_df].copy()
-                cph.fit(fit_df, duration_col=duration_col, event_col=event_col, formula=current_formula_str)
-            else:
-                self.results_text_append("Warning: No valid covariates provided. Fitting a baseline Cox model (intercept only).\n")
-                fit_df = data_subset[columns_for_fit_df].copy()
-                cph.fit(fit_df, duration_col=duration_col, event_col=event_col)
+    def run_cox_model(self, selection, describe):
+        #preparation and fit run on the job worker; widgets are only updated in the _on_ callbacks (Tk thread).
+        #describe(data_subset, duration_col, event_col, covariates) logs the prepared data before the fit
+        ties = ENGINE_CHOICES.get(self.engine_var.get())
+        slot = self._model_slot = ModelSlot(self._model_slot)
 
-            self.results_text_append("\n--- Cox Model Summary ---\n")
-            summary_df = cph.summary
+        def work(job):
+            data_subset, duration_col, event_col, covariate_cols_for_formula = self._prepare_selection(selection)
+            describe(data_subset, duration_col, event_col, covariate_cols_for_formula)
+            return self._fit_cox_model(job, slot, data_subset, duration_col, event_col, covariate_cols_for_formula, ties)
+
+        self.jobs.submit(
+            "Cox model fit",
+            work,
+            on_done=self._on_cox_model_done,
+            on_error=self._on_cox_model_error,
+        )
+        self.results_text_append("Model fit queued...\n")
+
+    def _fit_cox_model(self, job, slot, data_subset, duration_col, event_col, covariate_cols_for_formula, ties=None):
+        #runs on the worker: the model is returned and put in the slot for queued jobs, not stored;
+        #_on_cox_model_done publishes it on the Tk thread
+        current_formula_str = None
+        slot.fill(None) #a failed fit leaves no current model, as _on_cox_model_error does on the Tk thread
+        #the prepared frame holds exactly duration, event and the model's covariates, so it is used
+        #as-is (lifelines copies internally); other callers get a column projection
+        columns_for_fit_df = [duration_col, event_col] + list(covariate_cols_for_formula)
+        if list(data_subset.columns) == columns_for_fit_df:
+            fit_df = data_subset
+        else:
+            fit_df = data_subset[columns_for_fit_df]
+
+        if covariate_cols_for_formula and ties is not None:
+            self.results_text_append(f"Fitting model with the native engine ({ties} ties) on: {', '.join(covariate_cols_for_formula)}\n")
+        elif covariate_cols_for_formula:
+            current_formula_str = " + ".join(covariate_cols_for_formula) 
+            self.results_text_append(f"Fitting model with formula: '{current_formula_str}'\n")
+        else:
+            self.results_text_append("Warning: No valid covariates provided. Fitting a baseline Cox model (intercept only).\n")
+        #identical data + spec + engine -> the stored result instead of a refit
+        with stage("result store lookup", rows=len(fit_df)):
+            store_key = model_key(fit_df, duration_col, event_col, covariate_cols_for_formula, ties) if covariate_cols_for_formula else None
+            cph = load_model(store_key) if store_key else None
+        if cph is not None:
+            self.results_text_append(f"Identical model found in the result store (saved {time.strftime('%Y-%m-%d %H:%M', time.localtime(cph.meta['created']))}); not refitted.\n")
+        elif covariate_cols_for_formula and ties is not None:
+            #rows already sorted for an earlier model are reused, new covariates warm-start from zero
+            design = self._design_for(fit_df, duration_col, event_col, covariate_cols_for_formula)
+            warm = design.warm_start(covariate_cols_for_formula, ties) is not None
+            cph = design.fit(covariate_cols_for_formula, ties)
+            self.results_text_append(f"Converged in {cph.iterations_} Newton-Raphson iterations{' (warm start)' if warm else ''}.\n")
+        else:
+            cph = fit_cox_model(fit_df, duration_col, event_col, covariate_cols_for_formula, ties=ties)
+
+        if job.cancelled.is_set():
+            return None
+
+        self.results_text_append("\n--- Cox Model Summary ---\n")
+        summary_df = cph.summary
+        self.jobs.call_in_ui(self.show_coefficients, summary_df)
+        if len(summary_df) <= SUMMARY_TEXT_MAX_ROWS:
             self.results_text_append(str(summary_df) + "\n")
+        else:
+            self.results_text_append(f"{len(summary_df)} coefficients; see the Coefficients tab (click a heading to sort).\n")
 
-            if covariate_cols_for_formula and not summary_df.empty : 
+        if covariate_cols_for_formula and not summary_df.empty : 
+            c_index = getattr(cph, "concordance_index_", None) if isinstance(cph, StoredCoxModel) else None
+            try:
+                if c_index is None:
+                    c_index = model_concordance(cph, fit_df, duration_col, event_col, covariate_cols_for_formula)
+                self.results_text_append(f"\nConcordance Index (C-statistic): {c_index:.4f}\n")
+            except Exception as ci_e:
+                self.results_text_append(f"\nCould not calculate Concordance Index: {ci_e}\n")
+            if not isinstance(cph, StoredCoxModel):
+                info = {"data": os.path.basename(self.dataset.file_path) if self.dataset is not None else None,
+                        "duration": duration_col, "event": event_col, "n_rows": len(fit_df)}
                 try:
-                    #here we predict on the same data used for fit, using only the covariate columns
-                    predictions = cph.predict_partial_hazard(fit_df[covariate_cols_for_formula]) 
-                    c_index = concordance_index(fit_df[duration_col], -predictions, fit_df[event_col])
-                    self.results_text_append(f"\nConcordance Index (C-statistic): {c_index:.4f}\n")
-                except Exception as ci_e:
-                    self.results_text_append(f"\nCould not calculate Concordance Index: {ci_e}\n")
-            else:
-                 self.results_text_append("\nConcordance Index not applicable (no covariates in the final model).\n")
-            
-            self.fitted_model = cph 
-            self.last_run_covariates = covariate_cols_for_formula 
-            self.last_run_data_subset = fit_df.copy() #store the exact df used for fitting
+                    with stage("save to result store"):
+                        save_model(store_key, cph, c_index, info, fit_df=fit_df)
+                except OSError as store_e:
+                    self.results_text_append(f"(Could not save the model to the result store: {store_e})\n")
+        else:
+             self.results_text_append("\nConcordance Index not applicable (no covariates in the final model).\n")
 
-            self.plot_covariate_combo['values'] = self.last_run_covariates
-            if self.last_run_covariates:
-                self.plot_covariate_var.set(self.last_run_covariates[0])
-            else:
-                self.plot_covariate_var.set('')
+        #fit_df is the exact (shared, read-only) df used for fitting
+        result = cph, covariate_cols_for_formula, fit_df, duration_col, event_col
+        slot.fill(result)
+        return result
 
-        except Exception as e:
-            messagebox.showerror("Cox Regression Error", f"An error occurred during model fitting: {e}")
-            self.results_text_append(f"\nError during Cox regression: {e}\n")
-            self.results_text_append(f"Traceback:\n{traceback.format_exc()}\n")
-            self.fitted_model = None
-            self.last_run_covariates = []
-            self.last_run_data_subset = None
-            self.plot_covariate_combo['values'] = []
+    def _design_for(self, fit_df, duration_col, event_col, covariates):
+        #the last design while the rows stay the same (covariates added or removed); otherwise a new one, which
+        #still takes over the last coefficients as warm starts when the outcome columns are unchanged
+        design = self._design
+        if design is None or not design.matches(fit_df, duration_col, event_col):
+            with stage("sort design", rows=len(fit_df)):
+                new_design = DesignMatrix(fit_df, duration_col, event_col)
+            if design is not None and (design.duration_col, design.event_col) == (duration_col, event_col):
+                new_design.coefs = design.coefs
+            design = self._design = new_design
+        design.add_columns(fit_df, covariates)
+        return design
+
+    def _on_cox_model_done(self, result):
+        if result is None:
+            return
+        self.fitted_model, covariate_cols_for_formula, self.last_run_data_subset, *outcome = result
+        self.last_run_outcome = tuple(outcome)
+        self.last_run_covariates = covariate_cols_for_formula
+        self.plot_covariate_combo['values'] = covariate_cols_for_formula
+        if covariate_cols_for_formula:
+            self.plot_covariate_var.set(covariate_cols_for_formula[0])
+        else:
             self.plot_covariate_var.set('')
 
+    def _on_cox_model_error(self, e, tb):
+        if self._on_data_error(e):
+            return #nothing was fitted; the current model stays
+        messagebox.showerror("Cox Regression Error", f"An error occurred during model fitting: {e}")
+        self.results_text_append(f"\nError during Cox regression: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
+        self.fitted_model = None
+        self.last_run_covariates = []
+        self.last_run_data_subset = None
+        self.last_run_outcome = (None, None)
+        self.plot_covariate_combo['values'] = []
+        self.plot_covariate_var.set('')
+
 
     def run_unadjusted_cox(self):
         self.results_text_clear()
         self.results_text_append("Running Unadjusted Cox Regression...\n")
         
-        prepared_data = self._get_selected_columns(include_voi=True)
-        if prepared_data is None:
+        selection = self._get_selection(include_voi=True)
+        if selection is None:
             self.results_text_append("Failed to prepare data for unadjusted model (see error popups for details).\n")
             return
-        
-        data_subset, duration_col, event_col, voi_col_list_for_formula = prepared_data
-        
-        if not voi_col_list_for_formula: 
-            self.results_text_append("Error: Variable of Interest list is empty after data preparation, cannot run model.\n")
-            messagebox.showerror("Model Error", "No valid Variable of Interest to use for the model.")
-            return
 
-        self.results_text_append(f"Duration column: {duration_col}\n")
-        self.results_text_append(f"Event column: {event_col}\n")
-        self.results_text_append(f"Variable of Interest (for formula): {voi_col_list_for_formula[0]}\n")
-        self.results_text_append(f"Data subset for model has {len(data_subset)} rows.\n")
-        
-        cols_to_show = [duration_col, event_col] + voi_col_list_for_formula
-        self.results_text_append(f"Head of relevant columns in data_subset:\n{str(data_subset[cols_to_show].head())}\n")
-        self.results_text_append(f"Info for VOI '{voi_col_list_for_formula[0]}' in data_subset:\n{str(data_subset[voi_col_list_for_formula[0]].describe())}\n")
+        def describe(data_subset, duration_col, event_col, voi_col_list_for_formula):
+            if not voi_col_list_for_formula: 
+                raise DataPreparationError("No valid Variable of Interest to use for the model.")
+
+            self.results_text_append(f"Duration column: {duration_col}\n")
+            self.results_text_append(f"Event column: {event_col}\n")
+            self.results_text_append(f"Variable of Interest (for formula): {voi_col_list_for_formula[0]}\n")
+            self.results_text_append(f"Data subset for model has {len(data_subset)} rows.\n")
+            
+            cols_to_show = [duration_col, event_col] + voi_col_list_for_formula
+            self.results_text_append(f"Head of relevant columns in data_subset:\n{str(data_subset[cols_to_show].head())}\n")
+            self.results_text_append(f"Info for VOI '{voi_col_list_for_formula[0]}' in data_subset:\n{str(data_subset[voi_col_list_for_formula[0]].describe())}\n")
 
-        self.run_cox_model(data_subset, duration_col, event_col, voi_col_list_for_formula)
+        self.run_cox_model(selection, describe)
 
     def run_adjusted_cox(self):
         self.results_text_clear()
         self.results_text_append("Running Adjusted Cox Regression...\n")
 
-        prepared_data = self._get_selected_columns(include_covariates_for_adjusted=True)
-        if prepared_data is None:
+        selection = self._get_selection(include_covariates_for_adjusted=True)
+        if selection is None:
             self.results_text_append("Failed to prepare data for adjusted model (see error popups for details).\n")
             return
 
-        data_subset, duration_col, event_col, covariate_cols_for_formula = prepared_data
-        
-        if not covariate_cols_for_formula:
-            self.results_text_append("Error: No valid covariates remaining after data preparation, cannot run adjusted model.\n")
-            messagebox.showerror("Model Error", "No valid covariates to use for the adjusted model.")
+        def describe(data_subset, duration_col, event_col, covariate_cols_for_formula):
+            if not covariate_cols_for_formula:
+                raise DataPreparationError("No valid covariates to use for the adjusted model.")
+                
+            self.results_text_append(f"Covariates for formula: {', '.join(covariate_cols_for_formula)}\n")
+            self.results_text_append(f"Data subset for model has {len(data_subset)} rows.\n")
+            cols_to_show = [duration_col, event_col] + covariate_cols_for_formula
+            self.results_text_append(f"Head of relevant columns in data_subset:\n{str(data_subset[cols_to_show].head())}\n")
+
+        self.run_cox_model(selection, describe)
+
+    def run_screening(self):
+        #one unadjusted model per selected covariate (all columns if none are selected), fitted on a process pool
+        if self.dataset is None:
+            messagebox.showerror("Error", "Please load a CSV file first.")
             return
-            
-        self.results_text_append(f"Covariates for formula: {', '.join(covariate_cols_for_formula)}\n")
-        self.results_text_append(f"Data subset for model has {len(data_subset)} rows.\n")
-        cols_to_show = [duration_col, event_col] + covariate_cols_for_formula
-        self.results_text_append(f"Head of relevant columns in data_subset:\n{str(data_subset[cols_to_show].head())}\n")
+        duration_col = self.duration_var.get()
+        event_col = self.event_var.get()
+        if not duration_col or not event_col:
+            messagebox.showerror("Error", "Please select Duration and Event columns.")
+            return
+
+        candidates = self.covariates_picker.selected_columns() or list(self.dataset.columns)
+        candidates = [col for col in candidates if col not in (duration_col, event_col)]
+        if not candidates:
+            messagebox.showerror("Error", "No candidate columns to screen.")
+            return
+
+        self.results_text_clear()
+        self.results_text_append(f"Screening {len(candidates)} candidate columns with unadjusted Cox models...\n")
+        table = ResultsTableWindow(self.root, f"Univariate screening: {duration_col} / {event_col}", SCREEN_RESULT_COLUMNS)
+
+        dataset = self.dataset
+
+        def work(job):
+            #rows with a usable outcome, shared by every candidate's model
+            base = dataset.prepare(duration_col, event_col, [])
+            self._report_prepared(base)
+            matrix = build_screening_matrix(base, dataset.load(candidates))
+            def on_result(row, n_done, n_total):
+                self.jobs.call_in_ui(table.add_row, row)
+                job.report_progress(n_done / n_total)
+            return screen_univariate(matrix, candidates, on_result=on_result, cancelled=job.cancelled.is_set)
+
+        self.jobs.submit("Univariate screening", work, on_done=lambda results: self._on_screening_done(table, results), on_error=self._on_screening_error)
 
-        self.run_cox_model(data_subset, duration_col, event_col, covariate_cols_for_formula)
+    def _on_screening_done(self, table, results):
+        if results is None:
+            return
+        self.last_screening_results = results
+        #final rows carry the FDR-adjusted q-values, which need every p-value first
+        table.set_rows(results.to_dict("records"))
+        fitted = results["p"].notna().sum()
+        significant = (results["q (FDR)"] < 0.05).sum()
+        self.results_text_append(f"Screening finished: {fitted} of {len(results)} columns fitted; {significant} with FDR q < 0.05.\n")
+        self.results_text_append("Rows are sorted by p-value; click a column heading in the table to re-sort.\n")
+
+    def _on_screening_error(self, e, tb):
+        if self._on_data_error(e):
+            return
+        messagebox.showerror("Screening Error", f"An error occurred during univariate screening: {e}")
+        self.results_text_append(f"\nError during screening: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
+
+    def run_by_group(self):
+        group_col = self.group_var.get()
+        if self.dataset is not None and not group_col:
+            messagebox.showerror("Error", "Please select the column to group by.")
+            return
+        selection = self._get_selection(include_covariates_for_adjusted=True)
+        if selection is None:
+            return
+        _, duration_col, event_col, raw_covariates, _ = selection
+        if group_col in [duration_col, event_col] + list(raw_covariates):
+            messagebox.showerror("Error", "The grouping column cannot also be the Duration, Event or a covariate column.")
+            return
+        if self.dataset.missing_columns([group_col]):
+            messagebox.showerror("Error", f"Column '{group_col}' is not in the dataset.")
+            return
+        ties = ENGINE_CHOICES.get(self.engine_var.get()) or "efron"
+
+        self.results_text_clear()
+        self.results_text_append(f"Fitting the adjusted model separately for each value of '{group_col}'...\n")
+        table = ResultsTableWindow(self.root, f"Fit by group: {group_col}", GROUP_RESULT_COLUMNS)
+        dataset = self.dataset
+
+        def work(job):
+            data_subset, duration_col, event_col, covariates = self._prepare_selection(selection)
+            self.results_text_append(f"Covariates: {', '.join(covariates)}\n")
+            #one partition of the prepared rows; every group is then fitted on the process pool
+            with stage("partition by group", rows=len(data_subset)):
+                partition = partition_by_group(data_subset, duration_col, event_col, covariates, dataset.load([group_col])[group_col])
+            self.results_text_append(f"{len(partition)} groups.\n")
+            if partition.dropped_rows:
+                self.results_text_append(f"Note: {partition.dropped_rows} rows with a missing '{group_col}' were left out.\n")
+            def on_result(rows, n_done, n_total):
+                for row in rows:
+                    self.jobs.call_in_ui(table.add_row, row)
+                job.report_progress(n_done / n_total)
+            with stage("fit groups", rows=len(partition.matrix), groups=len(partition)):
+                return fit_by_group(partition, ties, on_result=on_result, cancelled=job.cancelled.is_set)
+
+        self.jobs.submit(f"Fit by '{group_col}'", work, on_done=lambda result: self._on_by_group_done(group_col, ties, table, result),
+                         on_error=self._on_by_group_error)
+
+    def _on_by_group_done(self, group_col, ties, table, result):
+        if result is None:
+            return
+        per_group, pooled = result
+        #rows arrive in finishing order; the final table is in group order
+        table.set_rows(per_group.to_dict("records"))
+        failed = per_group.loc[per_group["HR"].isna(), ["group", "note"]].drop_duplicates("group")
+        for group, note in failed.itertuples(index=False):
+            self.results_text_append(f"Group {group}: {note or 'no estimate'}\n")
+        self.results_text_append(f"\n--- Pooled across groups of '{group_col}' (native engine, {ties} ties) ---\n")
+        if len(pooled) <= SUMMARY_TEXT_MAX_ROWS:
+            for row in pooled.to_dict("records"):
+                if not row["groups"]:
+                    self.results_text_append(f"{row['covariate']}: no usable group estimates\n")
+                    continue
+                self.results_text_append(
+                    f"{row['covariate']}: fixed HR {row['HR (fixed)']:.3f} [{row['HR (fixed) lower 95%']:.3f}, {row['HR (fixed) upper 95%']:.3f}], "
+                    f"random HR {row['HR (random)']:.3f} [{row['HR (random) lower 95%']:.3f}, {row['HR (random) upper 95%']:.3f}]; "
+                    f"Q={row['Q']:.2f} (df {row['df']}, p={row['p (Q)']:.3g}), I2={100 * row['I2']:.0f}%, tau2={row['tau2']:.3g} ({row['groups']} groups)\n")
+        else:
+            self.results_text_append(f"{len(pooled)} covariates; see the pooled estimates window.\n")
+        window = ResultsTableWindow(self.root, f"Pooled estimates by {group_col}", POOLED_RESULT_COLUMNS)
+        window.set_rows(pooled.to_dict("records"))
+        self.results_text_append("Fixed: inverse-variance weights. Random: DerSimonian-Laird. A small p (Q) or a large I2 means the groups disagree.\n")
+
+    def _on_by_group_error(self, e, tb):
+        if self._on_data_error(e):
+            return
+        messagebox.showerror("Fit by Group Error", f"An error occurred while fitting by group: {e}")
+        self.results_text_append(f"\nError during fit by group: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
+
+    def run_penalized_path(self):
+        selection = self._get_selection(include_covariates_for_adjusted=True)
+        if selection is None:
+            return
+        alpha = simpledialog.askfloat("Elastic-Net Path", "L1 share of the penalty (alpha; 1 = lasso, small = close to ridge):",
+                                      initialvalue=0.5, minvalue=0.01, maxvalue=1.0, parent=self.root)
+        if alpha is None:
+            return
+        ties = ENGINE_CHOICES.get(self.engine_var.get()) or "efron"
+        metric = PATH_METRIC_CHOICES[self.path_metric_var.get()]
+        self.results_text_clear()
+
+        def work(job):
+            data_subset, duration_col, event_col, covariates = self._prepare_selection(selection)
+            self.results_text_append(f"Elastic-net path (alpha={alpha:g}, {ties} ties) over {len(covariates)} covariates; "
+                                     f"penalty chosen by {CV_FOLDS}-fold CV {'C-index' if metric == 'c-index' else 'partial likelihood'}...\n")
+            with stage("elastic-net path", rows=len(data_subset), covariates=len(covariates)):
+                return penalized_path(
+                    data_subset[duration_col].to_numpy(dtype=float), data_subset[event_col].to_numpy(dtype=float),
+                    data_subset[covariates].to_numpy(dtype=float), covariates, alpha=alpha, n_folds=CV_FOLDS,
+                    metric=metric, ties=ties, progress=job.report_progress, cancelled=job.cancelled.is_set)
+
+        self.jobs.submit("Elastic-net path", work, on_done=self._on_penalized_path_done, on_error=self._on_penalized_path_error)
+
+    def _on_penalized_path_done(self, result):
+        if result is None:
+            return
+        lambdas, best, best_1se = result.lambdas, result.best, result.best_1se
+        score = "C-index" if result.metric == "c-index" else "partial log-likelihood per event"
+        self.results_text_append(f"{len(lambdas)} penalties from {lambdas[0]:.4g} down to {lambdas[-1]:.4g}"
+                                 f"{' (the path stopped early)' if len(lambdas) < N_LAMBDAS else ''}.\n")
+        for label, k in (("lambda_min", best), ("lambda_1se", best_1se)):
+            self.results_text_append(f"{label} = {lambdas[k]:.4g}: {result.nonzero[k]} non-zero coefficients, "
+                                     f"CV {score} {result.cv_mean[k]:.4f} (SE {result.cv_se[k]:.4f})\n")
+        selected = result.selected()
+        self.coefficients_table.set_columns(["covariate", "coef", "exp(coef)"])
+        self.coefficients_table.set_rows([[name, float(coef), float(np.exp(coef))] for name, coef in selected.items()])
+        if len(selected) <= SUMMARY_TEXT_MAX_ROWS:
+            self.results_text_append("\n--- Coefficients at lambda_min ---\n")
+            for name, coef in selected.items():
+                self.results_text_append(f"{name}: {coef:.4f} (HR {np.exp(coef):.3f})\n")
+        else:
+            self.results_text_append(f"{len(selected)} non-zero coefficients at lambda_min; see the Coefficients tab.\n")
+        self.results_text_append("Penalized estimates are shrunk towards zero and come without standard errors; refit the "
+                                 "selected covariates for inference.\n")
+        with stage("draw plot", rows=len(lambdas)):
+            self._draw_penalized_path(result)
+        self.results_notebook.select(self.plot_tab)
+        if len(selected) and messagebox.askyesno("Elastic-Net Path", f"Select the {len(selected)} covariates with non-zero coefficients "
+                                                                     "at lambda_min as the adjusted model's covariates?"):
+            self.covariates_picker.set_selection(selected.index)
+
+    def _draw_penalized_path(self, result):
+        from matplotlib.collections import LineCollection
+        figure = self._ensure_plot_canvas()
+        path_ax, cv_ax = figure.subplots(2, 1, sharex=True)
+        x = np.log10(result.lambdas)
+        coefs = result.coefs.to_numpy()
+        #one polyline per covariate that ever enters, drawn as a single collection (there can be thousands)
+        entered = np.flatnonzero((coefs != 0).any(axis=0))
+        path_ax.add_collection(LineCollection([np.column_stack([x, coefs[:, j]]) for j in entered],
+                                               colors=[f"C{i % 10}" for i in range(len(entered))], linewidths=1))
+        path_ax.autoscale()
+        path_ax.set_ylabel("coefficient")
+        path_ax.set_title(f"Elastic-net path (alpha={result.alpha:g})")
+        cv_ax.errorbar(x, result.cv_mean, yerr=result.cv_se, fmt="o", ms=3, color="C3", ecolor="0.6")
+        cv_ax.set_ylabel("CV C-index" if result.metric == "c-index" else "CV partial log-lik / event")
+        cv_ax.set_xlabel("log10(lambda)")
+        for ax in (path_ax, cv_ax):
+            ax.axvline(x[result.best], ls="--", color="k", lw=1)
+            ax.axvline(x[result.best_1se], ls=":", color="k", lw=1)
+        cv_ax.invert_xaxis() #shared: the path reads left to right, strongest penalty first
+        figure.tight_layout()
+        self.plot_canvas.draw_idle()
+
+    def _on_penalized_path_error(self, e, tb):
+        if self._on_data_error(e):
+            return
+        messagebox.showerror("Elastic-Net Path Error", f"An error occurred while computing the elastic-net path: {e}")
+        self.results_text_append(f"\nError during the elastic-net path: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
+
+    def run_stepwise(self):
+        selection = self._get_selection(include_covariates_for_adjusted=True)
+        if selection is None:
+            return
+        direction = self.stepwise_direction_var.get()
+        ties = ENGINE_CHOICES.get(self.engine_var.get()) or "efron"
+
+        self.results_text_clear()
+        table = ResultsTableWindow(self.root, f"Stepwise selection ({direction})", STEP_RESULT_COLUMNS)
+        slot = self._model_slot = ModelSlot(self._model_slot)
+
+        def on_step(row):
+            self.jobs.call_in_ui(table.add_row, row)
+            if row["action"] == "start":
+                self.results_text_append(f"Start: {row['covariates'] or '(no covariates)'}; log-likelihood {row['log-likelihood']:.3f}\n")
+            else:
+                self.results_text_append(f"Step {row['step']}: {row['action']} {row['covariate']} (LR chi2 {row['LR chi2']:.2f}, p={row['p']:.3g}); "
+                                         f"log-likelihood {row['log-likelihood']:.3f}, AIC {row['AIC']:.1f}\n")
+
+        def work(job):
+            data_subset, duration_col, event_col, covariates = self._prepare_selection(selection)
+            self.results_text_append(f"Stepwise selection ({direction}, {ties} ties) over {len(covariates)} covariates on {len(data_subset)} rows; "
+                                     f"enter at p < {STEPWISE_P_ENTER}, leave at p > {STEPWISE_P_REMOVE} (likelihood-ratio tests).\n")
+            #every candidate model is a warm-started refit on one sorted design, fitted on the process pool
+            design = self._design_for(data_subset, duration_col, event_col, covariates)
+            with stage("stepwise selection", rows=len(data_subset), candidates=len(covariates)):
+                result = stepwise_select(design, covariates, ties, direction, alpha_enter=STEPWISE_P_ENTER,
+                                         alpha_remove=STEPWISE_P_REMOVE, on_step=on_step, cancelled=job.cancelled.is_set)
+            if result is None or not result[1]:
+                return result, None
+            _, selected = result
+            model = design.fit(selected, ties)
+            fitted = model, selected, data_subset[[duration_col, event_col] + selected], duration_col, event_col
+            slot.fill(fitted)
+            return result, fitted
+
+        self.jobs.submit(f"Stepwise selection ({direction})", work, on_done=self._on_stepwise_done, on_error=self._on_stepwise_error)
+
+    def _on_stepwise_done(self, outcome):
+        result, fitted = outcome
+        if result is None:
+            return
+        _, selected = result
+        if fitted is None:
+            self.results_text_append("\nNo covariate was selected; the selected model is empty.\n")
+            return
+        self.results_text_append(f"\nSelected {len(selected)} of the candidate covariates: {', '.join(selected)}\n")
+        summary_df = fitted[0].summary
+        self.show_coefficients(summary_df)
+        if len(summary_df) <= SUMMARY_TEXT_MAX_ROWS:
+            self.results_text_append(str(summary_df) + "\n")
+        self.results_text_append("p-values after stepwise selection are optimistic; validate the selected model on other data.\n")
+        #the selected model becomes the current one, so the PH check and plots apply to it
+        self._on_cox_model_done(fitted)
+        if messagebox.askyesno("Stepwise Selection", f"Select these {len(selected)} covariates as the adjusted model's covariates?"):
+            self.covariates_picker.set_selection(selected)
+
+    def _on_stepwise_error(self, e, tb):
+        if self._on_data_error(e):
+            return
+        messagebox.showerror("Stepwise Selection Error", f"An error occurred during stepwise selection: {e}")
+        self.results_text_append(f"\nError during stepwise selection: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
+
+    def _model_in_slot(self, slot, needs_data=True):
+        #the checks a follow-up job makes before using the current model: on the Tk thread when nothing is queued,
+        #otherwise on the worker once the fits queued before it have run (the slot is only final then)
+        if slot.result is None:
+            raise ValueError("Please run a Cox model first.")
+        model, covariates, data, duration_col, event_col = slot.result
+        if data is None and (needs_data or not isinstance(model, StoredCoxModel)):
+            raise ValueError("The current model has no data (it was loaded from the result store); refit it on the loaded data first.")
+        if not covariates:
+            raise ValueError("No covariates were in the last fitted model.")
+        return model, list(covariates), data, duration_col, event_col
+
+    def _check_slot_now(self, slot, needs_data=True):
+        #False (after an error popup) if the model can't be used; with jobs queued the job checks it instead
+        if self.jobs.pending():
+            return True
+        try:
+            self._model_in_slot(slot, needs_data)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return False
+        return True
+
+    def validate_c_index(self):
+        #bootstrap (optimism-corrected) and k-fold cross-validated C-index of the last fitted model's covariates
+        slot = self._model_slot
+        if not self._check_slot_now(slot):
+            return
+        n_bootstrap = simpledialog.askinteger("Bootstrap", "Number of bootstrap replicates:", initialvalue=200, minvalue=10, maxvalue=10000, parent=self.root)
+        if n_bootstrap is None:
+            return
+
+        ties = ENGINE_CHOICES.get(self.engine_var.get()) or "efron"
+        self.results_text_append(f"\n--- C-index Validation ({n_bootstrap} bootstrap replicates, {CV_FOLDS}-fold CV) ---\n")
+
+        def work(job):
+            _, covariates, data, duration_col, event_col = self._model_in_slot(slot)
+            return validate_concordance(
+                data[duration_col].to_numpy(dtype=float), data[event_col].to_numpy(dtype=float),
+                data[covariates].to_numpy(dtype=float), n_bootstrap=n_bootstrap, n_folds=CV_FOLDS, ties=ties,
+                progress=job.report_progress, cancelled=job.cancelled.is_set)
+
+        self.jobs.submit("C-index validation", work, on_done=self._on_validation_done, on_error=self._on_validation_error)
+
+    def _on_validation_done(self, result):
+        if result is None:
+            return
+        low, high = result["bootstrap_ci"]
+        self.results_text_append(f"Apparent C-index (training data): {result['apparent']:.4f}\n")
+        self.results_text_append(f"Bootstrap C-index: mean {result['bootstrap_mean']:.4f}, 95% CI [{low:.4f}, {high:.4f}] ({result['n_bootstrap']} usable replicates, seed {result['seed']})\n")
+        self.results_text_append(f"Optimism: {result['optimism']:.4f}  ->  optimism-corrected C-index: {result['optimism_corrected']:.4f}\n")
+        self.results_text_append(f"{CV_FOLDS}-fold cross-validated C-index: {result['cv_mean']:.4f} (SD {result['cv_sd']:.4f}, {result['n_cv_folds']} usable folds)\n")
+        for fold, failure in result["cv_failures"]:
+            self.results_text_append(f"  fold {fold + 1} left out: {failure}\n")
+        self.results_text_append("Replicates are refitted with the native engine, which gives the same estimates as lifelines.\n")
+
+    def _on_validation_error(self, e, tb):
+        messagebox.showerror("Validation Error", f"An error occurred during C-index validation: {e}")
+        self.results_text_append(f"\nError during C-index validation: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
+
+    def open_saved_models(self):
+        #browse the result store; double-click an entry to load it (no data needed for its summary)
+        entries = list_models()
+        if not entries:
+            messagebox.showinfo("Saved Models", "The result store is empty. Models are saved there automatically when they are fitted.")
+            return
+        columns = ["saved", "data", "engine", "duration", "event", "covariates", "C-index", "n rows", "key"]
+        rows = [{
+            "saved": time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["created"])),
+            "data": meta.get("data"),
+            "engine": meta["engine"],
+            "duration": meta.get("duration"),
+            "event": meta.get("event"),
+            "covariates": ", ".join(map(str, meta["covariates"])),
+            "C-index": meta["concordance_index"],
+            "n rows": meta.get("n_rows"),
+            "key": meta["key"],
+        } for meta in entries]
+        window = ResultsTableWindow(self.root, "Saved models (double-click to load)", columns)
+        window.set_rows(rows)
+        table = window.table
+        def on_double_click(event):
+            item = table.tree.identify_row(event.y)
+            if item:
+                position = table.start + table.tree.index(item)
+                if position < len(table.rows):
+                    self.load_saved_model(table.rows[position][columns.index("key")])
+        table.tree.bind("<Double-1>", on_double_click)
+
+    def load_saved_model(self, key):
+        #queued like a fit, so plots and checks clicked after it apply to the loaded model
+        slot = self._model_slot = ModelSlot(self._model_slot)
+
+        def work(job):
+            model = load_model(key)
+            if model is not None:
+                slot.fill((model, list(model.covariates), None, model.meta.get("duration"), model.meta.get("event")))
+            return model
+
+        self.jobs.submit("Load saved model", work, on_done=self._on_saved_model_loaded,
+                         on_error=lambda e, tb: messagebox.showerror("Saved Models", f"Could not load the model: {e}"))
+
+    def _on_saved_model_loaded(self, model):
+        if model is None:
+            messagebox.showerror("Saved Models", "This entry could not be read; it has been removed from the store.")
+            return
+        meta = model.meta
+        self.results_text_append(f"\n--- Saved model: {meta['engine']}, {meta.get('duration')} / {meta.get('event')} on {meta.get('data')} ---\n")
+        self.show_coefficients(model.summary)
+        if len(model.summary) <= SUMMARY_TEXT_MAX_ROWS:
+            self.results_text_append(str(model.summary) + "\n")
+        if model.concordance_index_ is not None:
+            self.results_text_append(f"\nConcordance Index (C-statistic): {model.concordance_index_:.4f}\n")
+        #the stored model carries no data: it plots from its stored quantiles, PH checks need a refit on loaded data
+        self._on_cox_model_done((model, list(model.covariates), None, meta.get("duration"), meta.get("event")))
 
     def check_proportional_hazards(self):
-        if self.fitted_model is None or self.last_run_data_subset is None:
-            messagebox.showerror("Error", "Please run a Cox model first and ensure data was available for it.")
+        #the worker gets the model through the slot, never reads it from self; a fit still queued fills it first
+        slot = self._model_slot
+        if not self._check_slot_now(slot):
             return
-        
-        if not self.last_run_covariates: 
-             messagebox.showwarning("Info", "No covariates were in the last successfully fitted model. Proportional hazards check is for covariates.")
-             return
+        self.jobs.submit("PH assumption check", lambda job: self._check_proportional_hazards_work(job, slot), on_error=self._on_ph_check_error)
 
+    def _check_proportional_hazards_work(self, job, slot):
+        fitted_model, _, df_for_ph_check, duration_col, event_col = self._model_in_slot(slot)
         self.results_text_append("\n--- Proportional Hazards Assumption Check ---\n")
-        try:
-            df_for_ph_check = self.last_run_data_subset 
-            
-            self.results_text_append(f"Checking PH on data with {len(df_for_ph_check)} rows. Model's internal formula will be used.\n")
-            
-            results_ph = self.fitted_model.check_assumptions(df_for_ph_check, p_value_threshold=0.05, show_plots=False)
-            
-            self.results_text_append(f"Type of result from check_assumptions: {type(results_ph)}\n")
-            if isinstance(results_ph, (list, pd.DataFrame)):
-                 self.results_text_append(f"Content of result: {str(results_ph)}\n")
+        self.results_text_append(f"Scaled Schoenfeld residual test on {len(df_for_ph_check)} rows, time transforms: {', '.join(TIME_TRANSFORMS)}.\n")
+        #residuals are cached per model, so re-running the check is nearly free
+        ph_table = proportional_hazard_table(fitted_model, df_for_ph_check, duration_col, event_col)
+        if job.cancelled.is_set():
+            return
 
-            self.results_text_append("Test Results (p-values for deviation from proportionality):\n")
-            
-            if isinstance(results_ph, pd.DataFrame):
-                if not results_ph.empty:
-                    self.results_text_append(results_ph.to_string() + "\n")
-                else:
-                    self.results_text_append("Proportional hazards test returned an empty DataFrame.\n"
-                                             "This may occur if no violations are detected or if the test is not applicable to the specific covariates/data.\n")
-            elif isinstance(results_ph, list):
-                if not results_ph: 
-                    self.results_text_append("Proportional hazards test returned an empty list.\n"
-                                             "This can happen with single continuous covariates or specific data conditions where the standard p-value table is not generated by the `lifelines` library.\n"
-                                             "It means the automated test didn't produce a summary p-value for the covariate(s) in this specific scenario.\n")
-                                             
-                else: 
-                    self.results_text_append("Proportional hazards test returned a list of results (which is unexpected when `show_plots=False` is used with `lifelines`):\n")
-                    for i, item in enumerate(results_ph):
-                        self.results_text_append(f"Item {i}: {str(item)}\n")
-            elif results_ph is None:
-                 self.results_text_append("Proportional hazards test did not return any results (None).\n")
-            else: 
-                 self.results_text_append(f"Proportional hazards test returned an unexpected type: {type(results_ph)}. Content: {str(results_ph)}\n")
-
-            self.results_text_append("A low p-value (e.g., < 0.05) in the test results would suggest that the proportional hazard assumption may be violated for that covariate.\n")
-            
-        except Exception as e:
-            if "must have at least one column" in str(e) or "Found no covariates" in str(e) or "less than 2 levels" in str(e):
-                 messagebox.showwarning("Assumption Check Info", f"The proportional hazards test could not be performed. This might be due to the nature of the covariates (e.g., all constant after some filtering by the test) or specific data conditions. Details: {e}")
-                 self.results_text_append(f"\nProportional hazards test not applicable or failed. Reason: {e}\n")
-            else:
-                messagebox.showerror("Assumption Check Error", f"Error during proportional hazards check: {e}")
-                self.results_text_append(f"\nError during assumption check: {e}\n")
-                self.results_text_append(f"Traceback:\n{traceback.format_exc()}\n")
+        self.results_text_append("Test Results (p-values for deviation from proportionality):\n")
+        p_columns = [f"p ({name})" for name in TIME_TRANSFORMS]
+        if len(ph_table) <= SUMMARY_TEXT_MAX_ROWS:
+            self.results_text_append(ph_table[p_columns].to_string(float_format=lambda v: f"{v:.4g}") + "\n")
+        else:
+            self.jobs.call_in_ui(self._show_ph_table, ph_table)
+            self.results_text_append(f"{len(ph_table)} covariates; see the table window (click a heading to sort).\n")
+        flagged = ph_table.index[(ph_table[p_columns] < 0.05).any(axis=1)]
+        if len(flagged):
+            self.results_text_append(f"p < 0.05 under at least one transform: {', '.join(map(str, flagged[:SUMMARY_TEXT_MAX_ROWS]))}{' ...' if len(flagged) > SUMMARY_TEXT_MAX_ROWS else ''}\n")
+        self.results_text_append("A low p-value (e.g., < 0.05) in the test results would suggest that the proportional hazard assumption may be violated for that covariate.\n")
+
+    def _show_ph_table(self, ph_table):
+        table = ResultsTableWindow(self.root, "Proportional hazards test", ["covariate"] + list(ph_table.columns))
+        table.set_rows(ph_table.reset_index().to_dict("records"))
+
+    def _on_ph_check_error(self, e, tb):
+        messagebox.showerror("Assumption Check Error", f"Error during proportional hazards check: {e}")
+        self.results_text_append(f"\nError during assumption check: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
 
 
     def plot_partial_effects(self):
-        if self.fitted_model is None or self.last_run_data_subset is None:
-            messagebox.showerror("Error", "Please run a Cox model first and ensure data was available for it.")
+        #a model loaded from the result store has no data; its curves only need the model itself
+        slot = self._model_slot
+        if not self._check_slot_now(slot, needs_data=False):
             return
 
         covariate_to_plot = self.plot_covariate_var.get()
@@ -423,44 +1487,97 @@ class CoxRegressionApp:
             messagebox.showerror("Error", "Please select a covariate to plot from the dropdown.")
             return
 
-        if covariate_to_plot not in self.last_run_covariates: 
+        if not self.jobs.pending() and covariate_to_plot not in slot.result[1]:
             messagebox.showerror("Error", f"Covariate '{covariate_to_plot}' was not in the last model run or is not available for plotting.")
             return
         
         self.results_text_append(f"\n--- Plotting Partial Effects for '{covariate_to_plot}' ---\n")
+        self.jobs.submit(
+            f"Partial effects for '{covariate_to_plot}'",
+            lambda job: self._partial_effects_work(job, slot, covariate_to_plot),
+            on_done=self._on_partial_effects_done,
+            on_error=lambda e, tb: self._on_partial_effects_error(covariate_to_plot, e, tb),
+        )
+
+    def _on_plot_covariate_selected(self, event):
+        if self.plot_canvas is not None:
+            self.plot_partial_effects()
+
+    def _partial_effects_work(self, job, slot, covariate_to_plot):
+        #everything except drawing happens here; matplotlib figures are only created on the Tk thread
+        fitted_model, covariates, data_subset, _, _ = self._model_in_slot(slot, needs_data=False)
+        if covariate_to_plot not in covariates:
+            raise ValueError(f"'{covariate_to_plot}' is not a covariate of the current model")
+        plot_values = None 
+        if data_subset is None:
+            #a stored model: the quantiles of its training data, widened to the extremes if they all coincide
+            quantiles = getattr(fitted_model, "quantiles_", None)
+            if quantiles is not None:
+                plot_values = np.unique(quantiles[covariate_to_plot].loc[[0.1, 0.25, 0.5, 0.75, 0.9]].to_numpy()).tolist()
+                if len(plot_values) < 2:
+                    plot_values = np.unique(quantiles[covariate_to_plot].to_numpy()).tolist()
+                if len(plot_values) < 2:
+                    plot_values = None
+            if plot_values is None:
+                raise ValueError(f"the stored model has no quantiles of '{covariate_to_plot}'; refit it on the data to plot it")
+        elif covariate_to_plot in data_subset.columns:
+            cov_series = data_subset[covariate_to_plot].dropna()
+            if pd.api.types.is_numeric_dtype(cov_series) and cov_series.nunique() > 1:
+                quantiles = cov_series.quantile([0.1, 0.25, 0.5, 0.75, 0.9]).unique()
+                quantiles.sort()
+                if len(quantiles) >= 2 : 
+                    plot_values = quantiles.tolist()
+                elif cov_series.nunique() > 0 : 
+                    plot_values = sorted(list(cov_series.unique()))[:5] 
+                    if len(plot_values) < 2: plot_values = None 
+        if plot_values is None:
+            raise ValueError(f"could not find at least two distinct values of '{covariate_to_plot}' to plot")
         
-        try:
-            fig, ax = plt.subplots() 
-            
-            plot_values = None 
-            if covariate_to_plot in self.last_run_data_subset.columns:
-                cov_series = self.last_run_data_subset[covariate_to_plot].dropna()
-                if pd.api.types.is_numeric_dtype(cov_series) and cov_series.nunique() > 1:
-                    quantiles = cov_series.quantile([0.1, 0.25, 0.5, 0.75, 0.9]).unique()
-                    quantiles.sort()
-                    if len(quantiles) >= 2 : 
-                        plot_values = quantiles.tolist()
-                    elif cov_series.nunique() > 0 : 
-                        plot_values = sorted(list(cov_series.unique()))[:5] 
-                        if len(plot_values) < 2: plot_values = None 
-            
-            self.results_text_append(f"Attempting to plot '{covariate_to_plot}' with values: {plot_values}\n")
-
-            self.fitted_model.plot_partial_effects_on_outcome(
-                covariates=[covariate_to_plot], 
-                values=plot_values, 
-                plot_baseline=True, 
-                ax=ax 
-            )
-            plt.tight_layout() 
-            plt.show() 
-            
-            self.results_text_append(f"Plot for '{covariate_to_plot}' displayed in a new window.\n")
+        self.results_text_append(f"Attempting to plot '{covariate_to_plot}' with values: {plot_values}\n")
 
-        except Exception as e:
-            messagebox.showerror("Plotting Error", f"Error plotting partial effects for {covariate_to_plot}: {e}")
-            self.results_text_append(f"\nError plotting partial effects for {covariate_to_plot}: {e}\n")
-            self.results_text_append(f"Traceback:\n{traceback.format_exc()}\n")
+        #other covariates held at their central values, as in lifelines' plot_partial_effects_on_outcome;
+        #the baseline hazard is cached per model, so switching covariates is one small matrix product
+        curves, baseline = partial_effect_curves(fitted_model, covariate_to_plot, plot_values)
+        return covariate_to_plot, curves, baseline
+
+    def _ensure_plot_canvas(self):
+        if self.plot_canvas is None:
+            from matplotlib.figure import Figure #deferred, see the imports at the top
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+            #a bare Figure, not pyplot: nothing is registered globally, so redraws never accumulate figures
+            self.plot_figure = Figure(figsize=(6, 4))
+            self.plot_canvas = FigureCanvasTkAgg(self.plot_figure, master=self.plot_tab)
+            NavigationToolbar2Tk(self.plot_canvas, self.plot_tab).update() #zoom and save to PNG
+            self.plot_canvas.get_tk_widget().pack(expand=True, fill=tk.BOTH)
+        self.plot_figure.clear() #each plot lays out its own axes
+        return self.plot_figure
+
+    def _clear_plot(self):
+        if self.plot_canvas is not None:
+            self.plot_figure.clear()
+            self.plot_canvas.draw_idle()
+
+    def _on_partial_effects_done(self, result):
+        covariate_to_plot, curves, baseline = result
+        with stage("draw plot", rows=len(curves)):
+            ax = self._ensure_plot_canvas().add_subplot()
+            timeline = curves.index.to_numpy()
+            for column in curves.columns:
+                ax.step(timeline, curves[column].to_numpy(), where="post", label=column)
+            ax.step(timeline, baseline.to_numpy(), where="post", ls=":", color="k", label="baseline")
+            ax.set_title(f"Partial effects of '{covariate_to_plot}'")
+            ax.set_xlabel("time")
+            ax.set_ylabel("survival probability")
+            ax.legend()
+            self.plot_figure.tight_layout()
+            self.plot_canvas.draw_idle()
+        self.results_notebook.select(self.plot_tab)
+        self.results_text_append(f"Plot for '{covariate_to_plot}' displayed in the Plot tab.\n")
+
+    def _on_partial_effects_error(self, covariate_to_plot, e, tb):
+        messagebox.showerror("Plotting Error", f"Error plotting partial effects for {covariate_to_plot}: {e}")
+        self.results_text_append(f"\nError plotting partial effects for {covariate_to_plot}: {e}\n")
+        self.results_text_append(f"Traceback:\n{tb}\n")
 
 
 
@@ -469,3 +1586,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = CoxRegressionApp(root)
     root.mainloop()
+    app.jobs.shutdown()
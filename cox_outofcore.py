@@ -0,0 +1,284 @@
+#Cox GUI out-of-core fitting -- for files larger than memory
+#the model's columns are cleaned chunk by chunk, externally sorted by duration into one memory-mapped .npy file,
+#and every Newton iteration is a streaming pass over it from the latest duration back, carrying running risk-set
+#sums between blocks. memory use is bounded by the block size, not by the number of rows.
+import bisect
+import glob
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from cox_data import DataPreparationError, compact_column
+from cox_engine import NativeCoxModel, RiskSetIndex, _risk_set_sums, block_derivatives, maximize_partial_likelihood
+
+#rows per streamed block; blocks are widened to whole tied-duration runs
+BLOCK_ROWS = 1_000_000
+#rows sampled (evenly spaced) for the covariate medians used as central values in partial-effect plots
+MEDIAN_SAMPLE_ROWS = 1_000_000
+
+
+class SortedSurvivalData:
+    #duration-sorted, NaN-free model columns (duration, event, covariates) in a memory-mapped .npy file,
+    #with the per-column statistics a fit needs; a context manager that deletes the file on exit
+    def __init__(self, path, duration_col, event_col, covariates, n_events, mean, std, median, notes, warnings):
+        self.path = path
+        self.duration_col = duration_col
+        self.event_col = event_col
+        self.covariates = list(covariates)
+        self.n_events = n_events
+        self.mean, self.std, self.median = mean, std, median
+        self.notes, self.warnings = notes, warnings
+        self.data = np.load(path, mmap_mode="r")
+        self.n_rows = len(self.data)
+
+    def close(self):
+        if self.data is not None:
+            self.data = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _numeric_chunk(chunk, duration_col, event_col, covariates, float32):
+    #same conversions as prepare_survival_data on the same compact dtypes as the in-memory loader
+    columns = []
+    for col in [duration_col, event_col]:
+        try:
+            #the duration is never compacted: its order and ties define the risk sets
+            columns.append(pd.to_numeric(compact_column(chunk[col], float32 and col != duration_col)).to_numpy(dtype=np.float64, na_value=np.nan))
+        except (ValueError, TypeError):
+            kind = "Duration" if col == duration_col else "Event"
+            raise DataPreparationError(f"{kind} column '{col}' must be convertible to a numeric type.")
+    for col in covariates:
+        columns.append(pd.to_numeric(compact_column(chunk[col], float32), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan))
+    return np.column_stack(columns)
+
+
+def _write_sorted_runs(file_path, duration_col, event_col, covariates, run_prefix, chunk_rows, float32, progress, cancelled):
+    #pass 1: clean each chunk, sort it by duration and save it as its own run file
+    runs, dropped, nan_durations, nan_events, odd_events = [], 0, 0, 0, False
+    valid = np.zeros(len(covariates), dtype=np.int64)
+    total_bytes = max(os.path.getsize(file_path), 1)
+    with open(file_path, "rb") as handle:
+        reader = pd.read_csv(handle, usecols=[duration_col, event_col] + covariates, chunksize=chunk_rows, low_memory=False)
+        for i, chunk in enumerate(reader):
+            if cancelled is not None and cancelled():
+                return None
+            block = _numeric_chunk(chunk, duration_col, event_col, covariates, float32)
+            nan_durations += int(np.isnan(block[:, 0]).sum())
+            nan_events += int(np.isnan(block[:, 1]).sum())
+            events = block[:, 1][~np.isnan(block[:, 1])]
+            odd_events = odd_events or bool(((events != 0) & (events != 1)).any())
+            valid += (~np.isnan(block[:, 2:])).sum(axis=0)
+            keep = ~np.isnan(block).any(axis=1)
+            dropped += int((~keep).sum())
+            block = block[keep]
+            run_path = f"{run_prefix}.run{i}.npy"
+            np.save(run_path, block[np.argsort(block[:, 0], kind="stable")])
+            runs.append(run_path)
+            if progress is not None:
+                progress(0.5 * min(handle.tell() / total_bytes, 1.0))
+    #rows are dropped chunk by chunk, so an all-missing covariate cannot be skipped after the fact as in memory
+    empty = [col for col, count in zip(covariates, valid) if count == 0]
+    if empty:
+        raise DataPreparationError(f"Covariate/VOI '{empty[0]}' contains no valid numeric data after conversion; deselect it for an out-of-core fit.")
+    return runs, dropped, nan_durations, nan_events, odd_events
+
+
+def _merge_runs(runs, path, width, chunk_rows, progress, cancelled):
+    #pass 2, a sample sort: splitters taken from the sorted runs cut every run into contiguous slices per bucket;
+    #each bucket (about chunk_rows rows) is merged in memory and written in place. within a duration, rows keep
+    #file order, so the result equals one stable sort of the whole file.
+    arrays = [np.load(run, mmap_mode="r") for run in runs]
+    n = sum(len(a) for a in arrays)
+    n_buckets = max(1, -(-n // chunk_rows))
+    sample = np.sort(np.concatenate([np.asarray(a[::max(1, len(a) // (8 * n_buckets)), 0]) for a in arrays] + [np.empty(0)]))
+    splitters = np.unique(sample[(np.arange(1, n_buckets) * len(sample)) // n_buckets]) if len(sample) else np.empty(0)
+    cuts = [np.concatenate(([0], np.searchsorted(np.asarray(a[:, 0]), splitters, side="left"), [len(a)])) for a in arrays]
+
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n, width))
+    #running column statistics (Chan et al. pairwise combination), so no extra pass is needed
+    count, mean, m2, n_events = 0, np.zeros(width - 2), np.zeros(width - 2), 0.0
+    position = 0
+    for b in range(len(splitters) + 1):
+        if cancelled is not None and cancelled():
+            return None
+        bucket = np.concatenate([a[c[b]:c[b + 1]] for a, c in zip(arrays, cuts)] + [np.empty((0, width))])
+        if not len(bucket):
+            continue
+        bucket = bucket[np.argsort(bucket[:, 0], kind="stable")]
+        out[position:position + len(bucket)] = bucket
+        position += len(bucket)
+        X = bucket[:, 2:]
+        block_mean = X.mean(axis=0)
+        block_m2 = ((X - block_mean) ** 2).sum(axis=0)
+        delta = block_mean - mean
+        total = count + len(X)
+        mean = mean + delta * len(X) / total
+        m2 = m2 + block_m2 + delta ** 2 * count * len(X) / total
+        count = total
+        n_events += float(bucket[:, 1].sum())
+        if progress is not None:
+            progress(0.5 + 0.5 * position / max(n, 1))
+    out.flush()
+    del out, arrays
+    std = np.sqrt(m2 / count) if count else np.zeros(width - 2)
+    return n, n_events, mean, std
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def build_sorted_data(file_path, duration_col, event_col, covariates, work_dir=None, chunk_rows=BLOCK_ROWS,
+                      float32=True, strict_covariates=False, progress=None, cancelled=None):
+    #the out-of-core counterpart of Dataset.prepare: complete cases of the model's columns, sorted by duration.
+    #returns None if cancelled. covariates without variance are excluded (or an error with strict_covariates).
+    covariates = list(covariates)
+    for col in covariates:
+        if col in (duration_col, event_col):
+            raise DataPreparationError(f"Covariate/VOI '{col}' cannot be the same as Duration or Event column.")
+    handle, path = tempfile.mkstemp(prefix="coxgui-sorted-", suffix=".npy", dir=work_dir)
+    os.close(handle)
+    run_prefix = path[:-len(".npy")]
+    try:
+        passed = _write_sorted_runs(file_path, duration_col, event_col, covariates, run_prefix, chunk_rows, float32, progress, cancelled)
+        if passed is None:
+            raise _Cancelled()
+        runs, dropped, nan_durations, nan_events, odd_events = passed
+        merged = _merge_runs(runs, path, 2 + len(covariates), chunk_rows, progress, cancelled)
+        if merged is None:
+            raise _Cancelled()
+    except BaseException as e:
+        os.remove(path)
+        if isinstance(e, _Cancelled):
+            return None
+        raise
+    finally:
+        for run in glob.glob(f"{run_prefix}.run*.npy"):
+            os.remove(run)
+    n, n_events, mean, std = merged
+
+    notes, warnings = [], []
+    if nan_durations:
+        notes.append(f"Warning: Duration column '{duration_col}' has missing values after numeric conversion. Rows with these NaNs will be dropped.\n")
+    if nan_events:
+        notes.append(f"Warning: Event column '{event_col}' has missing values after numeric conversion. Rows with these NaNs will be dropped.\n")
+    if odd_events:
+        warnings.append(f"Event column '{event_col}' contains values other than 0 and 1 (and NaNs). Ensure 1 means event and 0 means censored.")
+    if dropped:
+        notes.append(f"Note: {dropped} rows with missing values in selected columns (Duration, Event, and processed Covariates/VOI) were dropped.\n")
+    if n == 0:
+        os.remove(path)
+        raise DataPreparationError("No data remains after dropping missing values from selected columns.")
+    constant = [col for col, s in zip(covariates, std) if s == 0]
+    if constant and strict_covariates and len(covariates) == 1:
+        os.remove(path)
+        raise DataPreparationError(f"Covariate/VOI '{constant[0]}' has no variance (all values are the same) in the filtered data and will be excluded.")
+    if covariates and len(constant) == len(covariates):
+        os.remove(path)
+        raise DataPreparationError("No usable covariates/VOI with variance remain after data cleaning. Cannot fit model.")
+    for col in constant:
+        warnings.append(f"Covariate/VOI '{col}' has no variance (all values are the same) in the filtered data and will be excluded.")
+
+    data = np.load(path, mmap_mode="r")
+    median = np.median(np.asarray(data[::max(1, n // MEDIAN_SAMPLE_ROWS), 2:]), axis=0)
+    del data
+    return SortedSurvivalData(path, duration_col, event_col, covariates, n_events, mean, std, median, notes, warnings)
+
+
+def _tie_aligned_blocks(durations, block_rows):
+    #[start, stop) row ranges of about block_rows rows that never split a run of equal durations,
+    #so each event time's tied deaths are all in one block. bisect reads only O(log n) values of the memmap.
+    n = len(durations)
+    starts = [0]
+    for nominal in range(block_rows, n, block_rows):
+        start = bisect.bisect_left(durations, durations[nominal], starts[-1], nominal)
+        if start > starts[-1]:
+            starts.append(start)
+    return list(zip(starts, starts[1:] + [n]))
+
+
+def _streaming_likelihood(data, blocks, cols, mean, std, ties):
+    #partial_likelihood, one block at a time from the latest duration back. rows in later blocks belong to every
+    #risk set of this block, so their sums (w, wX, wXX') are carried in c0, c1, c2 and handed to block_derivatives.
+    def likelihood(beta):
+        p = len(beta)
+        loglik, gradient, information = 0.0, np.zeros(p), np.zeros((p, p))
+        c0, c1, c2 = 0.0, np.zeros(p), np.zeros((p, p))
+        shift = -np.inf
+        for start, stop in reversed(blocks):
+            block = np.asarray(data[start:stop])
+            X = (block[:, cols] - mean) / std
+            eta = X @ beta
+            if eta.max() > shift:
+                #keep one exp() shift for all sums: rescale what has been carried so far
+                if np.isfinite(shift):
+                    scale = np.exp(shift - eta.max())
+                    c0, c1, c2 = c0 * scale, c1 * scale, c2 * scale
+                shift = eta.max()
+            index = RiskSetIndex(block[:, 0], block[:, 1])
+            if len(index.deaths):
+                block_loglik, block_gradient, block_information, w = block_derivatives(X, eta, shift, index, ties, (c0, c1, c2))
+                loglik += block_loglik
+                gradient += block_gradient
+                information += block_information
+            else:
+                w = np.exp(eta - shift)
+            wX = w[:, None] * X
+            c0 += w.sum()
+            c1 = c1 + wX.sum(axis=0)
+            c2 = c2 + wX.T @ X
+        return loglik, gradient, information
+    return likelihood
+
+
+def _streaming_baseline(data, blocks, cols, mean, params):
+    #Breslow cumulative baseline hazard, as NativeCoxModel._breslow_baseline, in one more backwards pass
+    times, increments, carried = [], [], 0.0
+    for start, stop in reversed(blocks):
+        block = np.asarray(data[start:stop])
+        index = RiskSetIndex(block[:, 0], block[:, 1])
+        partial_hazard = np.exp((block[:, cols] - mean) @ params)
+        if len(index.deaths):
+            risk = _risk_set_sums(partial_hazard, index.risk_start) + carried
+            times.append(index.event_times)
+            increments.append(index.deaths / risk)
+        carried += partial_hazard.sum()
+    times = np.concatenate(times[::-1]) if times else np.empty(0)
+    cumulative = np.cumsum(np.concatenate(increments[::-1])) if increments else np.empty(0)
+    return pd.DataFrame({"baseline cumulative hazard": cumulative}, index=pd.Index(times, name="timeline"))
+
+
+def fit_out_of_core(sorted_data, covariates=None, ties="efron", block_rows=BLOCK_ROWS, initial_point=None, tol=1e-9, max_iter=50):
+    #same estimates as NativeCoxModel.fit on the same rows; covariates default to those with variance
+    if covariates is None:
+        covariates = [col for col, s in zip(sorted_data.covariates, sorted_data.std) if s > 0]
+    covariates = list(covariates)
+    if not covariates:
+        raise ValueError("the native engine needs at least one covariate")
+    positions = [sorted_data.covariates.index(col) for col in covariates]
+    cols = [2 + j for j in positions]
+    mean = sorted_data.mean[positions]
+    std = sorted_data.std[positions].copy()
+    std[std == 0] = 1.0
+    data = sorted_data.data
+    blocks = _tie_aligned_blocks(data[:, 0], block_rows)
+
+    model = NativeCoxModel(ties)
+    model.covariates = covariates
+    model._norm_mean = mean
+    init = None if initial_point is None else np.asarray(initial_point, dtype=float) * std
+    likelihood = _streaming_likelihood(data, blocks, cols, mean, std, ties)
+    beta, loglik, information, iterations = maximize_partial_likelihood(likelihood, len(cols), init, tol, max_iter)
+    params = model._set_estimates(beta, loglik, information, iterations, std)
+    model.baseline_cumulative_hazard_ = _streaming_baseline(data, blocks, cols, mean, params)
+    model._central_values = pd.DataFrame([sorted_data.median[positions]], index=["baseline"], columns=covariates)
+    return model
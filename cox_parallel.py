@@ -0,0 +1,56 @@
+#Cox GUI process-pool helpers -- share one float64 matrix with spawned workers through shared memory
+#workers attach once in their initializer and index into the matrix, so nothing large is pickled per task.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+#per-process views of attached shared matrices, keyed by block name
+_attached = {}
+
+
+class SharedMatrix:
+    #owner side: copies `matrix` into a new shared memory block; use as a context manager so it is unlinked
+    def __init__(self, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        self.shape = matrix.shape
+        self._shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        np.ndarray(self.shape, dtype=np.float64, buffer=self._shm.buf)[:] = matrix
+        self.name = self._shm.name
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_shared(name, shape):
+    #pool initializer: map the block for the life of the worker
+    shm = shared_memory.SharedMemory(name=name)
+    _attached[name] = (shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+
+
+def shared(name):
+    return _attached[name][1]
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def process_pool(shared_matrix, max_workers=None):
+    #spawn, not fork: the GUI process has Tk and worker threads that must not be forked
+    return ProcessPoolExecutor(
+        max_workers=max_workers or default_workers(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=attach_shared,
+        initargs=(shared_matrix.name, shared_matrix.shape),
+    )
@@ -0,0 +1,290 @@
+#Cox GUI elastic-net path -- penalized Cox regression over a descending grid of penalties, chosen by k-fold CV
+#objective (as in glmnet): -loglik / n + lam * (alpha * |b|_1 + (1 - alpha) / 2 * |b|^2) on standardized covariates.
+#each penalty is solved by IRLS on a diagonal quadratic approximation in the linear predictor, warm-started from the
+#previous penalty, over a strong-rule screened set (KKT-checked afterwards): coordinate descent on that set's Gram
+#matrix finds the non-zeros and their signs, a direct solve on them finishes. anything over all p covariates is one
+#matrix product. the path stops at a deviance plateau or once too many coefficients are non-zero for the events.
+#cross-validation folds run on a process pool.
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+from cox_engine import RiskSetIndex, tie_terms
+from cox_parallel import SharedMatrix, default_workers, process_pool, shared
+from cox_stats import concordance_index
+
+N_LAMBDAS = 50
+CV_METRICS = ("likelihood", "c-index")
+CV_SEED = 20250701
+GATHER_ROWS = 8192 #rows copied at a time when building the covariate-major training matrix
+
+
+def _eta_derivatives(eta, index, ties="efron"):
+    #log partial likelihood and its first and (diagonal) second derivatives with respect to each row's linear
+    #predictor; same risk-set sums as partial_likelihood, without any n x p work. rows are in index order.
+    E = index.E
+    w, loglik, (a, b, c0, c1, c2) = tie_terms(eta, eta.max() if eta.size else 0.0, index, ties)
+    upto = index.groups_upto
+    A = np.concatenate(([0.0], np.cumsum(a)))[upto]
+    B = E * np.concatenate(([0.0], b))[upto]
+    C = np.concatenate(([0.0], np.cumsum(c0)))[upto] - E * np.concatenate(([0.0], 2 * c1 - c2))[upto]
+    gradient = E - w * (A - B)
+    hessian = np.maximum(w * (A - B) - w ** 2 * C, 0.0)
+    return loglik, gradient, hessian
+
+
+def _covariate_major(matrix, rows, first_col=2):
+    #covariates x rows copy of matrix[rows, first_col:], gathered in blocks so no second full-size temporary is made
+    XT = np.empty((matrix.shape[1] - first_col, len(rows)))
+    for start in range(0, len(rows), GATHER_ROWS):
+        XT[:, start:start + GATHER_ROWS] = matrix[rows[start:start + GATHER_ROWS], first_col:].T
+    return XT
+
+
+def _standardize(XT):
+    #in place; returns the scale of each covariate (constant covariates keep scale 1 and can never enter)
+    XT -= XT.mean(axis=1, keepdims=True)
+    scale = np.sqrt((XT ** 2).mean(axis=1))
+    scale[scale == 0] = 1.0
+    XT /= scale[:, None]
+    return scale
+
+
+def _sweep(b, q, gram, d, l1, l2):
+    #one cyclic coordinate descent pass (soft-thresholding) over every position; returns the largest weighted change
+    max_change = 0.0
+    for i in range(len(b)):
+        old = b[i]
+        z = q[i] + d[i] * old
+        new = (z - l1 if z > l1 else z + l1 if z < -l1 else 0.0) / (d[i] + l2)
+        if new != old:
+            q -= (new - old) * gram[i]
+            b[i] = new
+            max_change = max(max_change, d[i] * (new - old) ** 2)
+    return max_change
+
+
+def _lasso_gram(b, q, gram, l1, l2, tol, max_rounds=200):
+    #elastic-net quadratic over a small set of coordinates, q being minus its gradient at b. a sweep finds which
+    #coordinates are non-zero and their signs; a direct solve with those signs held fixed (cut short at the first
+    #sign change) then replaces the many sweeps that correlated covariates would otherwise need
+    q = q.copy()
+    d = gram.diagonal().copy()
+    for _ in range(max_rounds):
+        if _sweep(b, q, gram, d, l1, l2) < tol:
+            break
+        active = np.flatnonzero(b)
+        if len(active) == 0:
+            continue
+        signs = np.sign(b[active])
+        sub = gram[np.ix_(active, active)]
+        rhs = q[active] + sub @ b[active] - l1 * signs
+        sub[np.diag_indices_from(sub)] += l2
+        try:
+            target = np.linalg.solve(sub, rhs)
+        except np.linalg.LinAlgError:
+            target = np.linalg.lstsq(sub, rhs, rcond=None)[0]
+        step = target - b[active]
+        crossing = np.flatnonzero(np.sign(target) != signs)
+        if len(crossing):
+            ratios = -b[active][crossing] / step[crossing]
+            step *= ratios.min()
+            step[crossing[ratios.argmin()]] = -b[active][crossing[ratios.argmin()]] #lands exactly on zero
+        q -= gram[:, active] @ step
+        b[active] += step
+    return b
+
+
+class _PathProblem:
+    #one data set (full data or a CV training set): covariate-major standardized X in index order
+    def __init__(self, XT, index, ties):
+        self.XT = XT
+        self.index = index
+        self.ties = ties
+        self.n = XT.shape[1]
+
+    def objective(self, loglik, beta, l1, l2):
+        return -loglik / self.n + l1 * np.abs(beta).sum() + 0.5 * l2 * (beta @ beta)
+
+    def lambda_max(self, alpha):
+        _, gradient, _ = _eta_derivatives(np.zeros(self.n), self.index, self.ties)
+        return float(np.abs(self.XT @ gradient).max() / (self.n * alpha))
+
+    def solve(self, beta, lam, alpha, strong, tol=1e-9, max_outer=50):
+        #minimizes the objective at one penalty over the covariates in `strong` (sorted indices), from beta. each
+        #step minimizes a weighted least-squares approximation (diagonal Hessian in the linear predictor, as glmnet)
+        #plus the penalty; its Gram matrix is formed at the first step and reused for the rest, the step length being
+        #checked against the true objective either way
+        l1, l2 = lam * alpha, lam * (1 - alpha)
+        XS = self.XT[strong] #every non-zero is in the strong set, so this also gives the linear predictor
+        loglik, gradient, hessian = _eta_derivatives(beta[strong] @ XS, self.index, self.ties)
+        objective = self.objective(loglik, beta, l1, l2)
+        gram = None
+        for _ in range(max_outer):
+            if gram is None:
+                root = XS * np.sqrt(hessian / self.n)
+                gram = root @ root.T #numpy hands x @ x.T to a symmetric (half-cost) product
+            target = beta.copy()
+            target[strong] = _lasso_gram(beta[strong], XS @ gradient / self.n, gram, l1, l2, tol)
+            step = target - beta
+            #halve the step while the true objective does not decrease
+            for _ in range(30):
+                candidate = beta + step
+                new_loglik, new_gradient, new_hessian = _eta_derivatives(candidate[strong] @ XS, self.index, self.ties)
+                new_objective = self.objective(new_loglik, candidate, l1, l2)
+                if new_objective <= objective + 1e-12 * abs(objective):
+                    break
+                step = step / 2
+            else:
+                return beta, loglik, gradient
+            improvement = objective - new_objective
+            beta, loglik, gradient, hessian, objective = candidate, new_loglik, new_gradient, new_hessian, new_objective
+            if improvement <= tol * max(abs(objective), 1e-8):
+                break
+        return beta, loglik, gradient
+
+    def path(self, lambdas, alpha, tol=1e-9, stop_early=True, max_nonzero=None, cancelled=None):
+        #(betas on the standardized scale, one row per penalty, and the log-likelihoods); stops at a plateau like glmnet
+        #or once more than max_nonzero coefficients (default: a quarter of the events) are non-zero
+        p = self.XT.shape[0]
+        beta = np.zeros(p)
+        null_loglik, gradient, _ = _eta_derivatives(np.zeros(self.n), self.index, self.ties)
+        score = self.XT @ gradient / self.n
+        betas, logliks = [], []
+        lam_prev = lambdas[0]
+        for lam in lambdas:
+            if cancelled is not None and cancelled():
+                return None
+            #sequential strong rule, then KKT checks on everything it screened out
+            strong = (np.abs(score) >= alpha * (2 * lam - lam_prev)) | (beta != 0)
+            while True:
+                beta, loglik, gradient = self.solve(beta, lam, alpha, np.flatnonzero(strong), tol)
+                score = self.XT @ gradient / self.n
+                violations = ~strong & (np.abs(score) > lam * alpha * (1 + 1e-6))
+                if not violations.any():
+                    break
+                strong |= violations
+            betas.append(beta.copy())
+            logliks.append(loglik)
+            lam_prev = lam
+            if not stop_early:
+                continue
+            #below about four events per non-zero coefficient the rest of the path only overfits, and each penalty
+            #there costs more than everything before it (the Gram matrices grow with the active set)
+            if np.count_nonzero(beta) > (max_nonzero if max_nonzero is not None else self.index.E.sum() / 4):
+                break
+            #fraction of the null deviance explained, as glmnet's dev.ratio; stop once it no longer moves
+            if len(logliks) > 1 and null_loglik < 0:
+                ratio, previous = 1 - loglik / null_loglik, 1 - logliks[-2] / null_loglik
+                if ratio - previous < 1e-5 * ratio or ratio > 0.999:
+                    break
+        return np.array(betas), np.array(logliks)
+
+
+def _problem(matrix, rows, ties):
+    T, E = matrix[rows, 0], matrix[rows, 1]
+    index = RiskSetIndex(T, E)
+    XT = _covariate_major(matrix, rows[index.order])
+    scale = _standardize(XT)
+    return _PathProblem(XT, index, ties), scale
+
+
+def _cv_fold(shm_name, fold, folds_seed, n_folds, lambdas, alpha, ties, metric):
+    #scores of one held-out fold along the whole grid: the Verweij-van Houwelingen partial likelihood contribution
+    #(full-data loglik minus training loglik at the training coefficients), per held-out event, or the C-index
+    matrix = shared(shm_name)
+    n = matrix.shape[0]
+    folds = np.random.default_rng(folds_seed).permutation(n) % n_folds
+    train, test = np.flatnonzero(folds != fold), np.flatnonzero(folds == fold)
+    problem, scale = _problem(matrix, train, ties)
+    betas, train_logliks = problem.path(lambdas, alpha, stop_early=False)
+    full_index = RiskSetIndex(matrix[:, 0], matrix[:, 1]) if metric == "likelihood" else None
+    held_out_events = max(float(matrix[test, 1].sum()), 1.0)
+    scores = np.full(len(lambdas), np.nan)
+    for k, beta in enumerate(betas):
+        active = np.flatnonzero(beta)
+        coef = beta[active] / scale[active]
+        if metric == "likelihood":
+            eta = matrix[:, 2 + active] @ coef if len(active) else np.zeros(n)
+            full_loglik = _eta_derivatives(eta[full_index.order], full_index, ties)[0]
+            scores[k] = (full_loglik - train_logliks[k]) / held_out_events
+        else:
+            eta = matrix[np.ix_(test, 2 + active)] @ coef if len(active) else np.zeros(len(test))
+            try:
+                scores[k] = concordance_index(matrix[test, 0], -eta, matrix[test, 1])
+            except ZeroDivisionError:
+                pass
+    return fold, scores
+
+
+class PenalizedPath:
+    #coefficients (original covariate scale) along the penalty grid, with the cross-validated score of each penalty
+    def __init__(self, covariates, lambdas, coefs, logliks, alpha, metric, cv_mean, cv_se, n_folds):
+        self.covariates = covariates
+        self.lambdas = lambdas
+        self.coefs = pd.DataFrame(coefs, index=pd.Index(lambdas, name="lambda"), columns=covariates)
+        self.logliks = logliks
+        self.alpha = alpha
+        self.metric = metric
+        self.cv_mean = cv_mean
+        self.cv_se = cv_se
+        self.n_folds = n_folds
+        self.nonzero = (coefs != 0).sum(axis=1)
+        if np.isnan(cv_mean).all():
+            raise ValueError(f"no penalty could be scored in any of the {n_folds} cross-validation folds "
+                             f"(too few events or comparable pairs per fold); try fewer folds or the likelihood metric")
+        #higher is better for both metrics; lambda_1se: the largest penalty within one SE of the best
+        self.best = int(np.nanargmax(cv_mean))
+        within = np.flatnonzero(cv_mean >= cv_mean[self.best] - cv_se[self.best])
+        self.best_1se = int(within.min()) if len(within) else self.best
+
+    def selected(self, one_se=False):
+        #non-zero coefficients at the chosen penalty, largest magnitude first
+        coefs = self.coefs.iloc[self.best_1se if one_se else self.best]
+        coefs = coefs[coefs != 0]
+        return coefs.reindex(coefs.abs().sort_values(ascending=False).index)
+
+
+def lambda_grid(lambda_max, n_lambdas=N_LAMBDAS, ratio=None, n=None, p=None):
+    #geometric, descending; glmnet's default ratio: 1e-4 with more rows than covariates, else 1e-2
+    if ratio is None:
+        ratio = 1e-4 if n is not None and p is not None and n > p else 1e-2
+    return lambda_max * np.geomspace(1.0, ratio, n_lambdas)
+
+
+def penalized_path(T, E, X, covariates, alpha=0.5, n_lambdas=N_LAMBDAS, ratio=None, n_folds=5, metric="likelihood",
+                   ties="efron", seed=CV_SEED, max_nonzero=None, max_workers=None, progress=None,
+                   cancelled=None):
+    #the full-data path runs first, so the folds only cover the penalties it reached; the folds then run on the pool
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha (the L1 share of the penalty) must be in (0, 1]")
+    if metric not in CV_METRICS:
+        raise ValueError(f"metric must be one of {CV_METRICS}")
+    matrix = np.column_stack([T, E, X]).astype(np.float64)
+    n, p = X.shape
+    problem, scale = _problem(matrix, np.arange(n), ties)
+    lambdas = lambda_grid(problem.lambda_max(alpha), n_lambdas, ratio, n, p)
+    result = problem.path(lambdas, alpha, max_nonzero=max_nonzero, cancelled=cancelled)
+    if result is None:
+        return None
+    betas, logliks = result
+    lambdas = lambdas[:len(betas)] #the path may have stopped early
+    del problem
+    if progress is not None:
+        progress(1 / (n_folds + 1))
+    scores = np.full((n_folds, len(lambdas)), np.nan)
+    max_workers = min(max_workers or default_workers(), n_folds)
+    with SharedMatrix(matrix) as shm, process_pool(shm, max_workers) as executor:
+        futures = [executor.submit(_cv_fold, shm.name, fold, seed, n_folds, lambdas, alpha, ties, metric) for fold in range(n_folds)]
+        for done, future in enumerate(as_completed(futures), start=2):
+            if cancelled is not None and cancelled():
+                executor.shutdown(wait=True, cancel_futures=True)
+                return None
+            fold, fold_scores = future.result()
+            scores[fold] = fold_scores
+            if progress is not None:
+                progress(done / (n_folds + 1))
+    with np.errstate(invalid="ignore"):
+        cv_mean = np.nanmean(scores, axis=0)
+        cv_se = np.nanstd(scores, axis=0, ddof=1) / np.sqrt(np.sum(~np.isnan(scores), axis=0))
+    return PenalizedPath(list(covariates), lambdas, betas / scale, logliks, alpha, metric, cv_mean,
+                         np.nan_to_num(cv_se), n_folds)
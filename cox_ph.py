@@ -0,0 +1,119 @@
+#Cox GUI proportional hazards test -- Grambsch-Therneau test on scaled Schoenfeld residuals, for either engine
+#residuals are computed once per fitted model and cached; every time transform is then tested in one matrix
+#product. statistics follow lifelines.statistics.proportional_hazard_test (chi-squared, 1 df per covariate).
+import math
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from cox_engine import RiskSetIndex, _risk_set_sums, _segment_sums, tie_terms
+from cox_parallel import default_workers
+from cox_trace import stage
+
+TIME_TRANSFORMS = ("identity", "log", "km", "rank")
+COLUMN_BLOCK = 32 #covariates per thread task; numpy releases the GIL in the sums
+
+#fitted model -> PHResiduals; entries go away with the model
+_residual_cache = weakref.WeakKeyDictionary()
+
+
+class PHResiduals:
+    #scaled Schoenfeld residuals (one row per event, in time order) and the transformed event times
+    def __init__(self, covariates, scaled, times, n_deaths, standard_errors):
+        self.covariates = covariates
+        self.scaled = scaled
+        self.times = times
+        self.n_deaths = n_deaths
+        self.standard_errors = standard_errors
+
+
+def _schoenfeld_block(X, index, w, a, b, event_rows, event_group, deaths):
+    #x_i minus the (Efron- or Breslow-weighted) risk-set mean at the event's time, for a block of columns
+    wX = w[:, None] * X
+    S1 = _risk_set_sums(wX, index.risk_start)
+    D1 = _segment_sums(wX * index.E[:, None], index.risk_start)
+    mean = (a[:, None] * S1 - b[:, None] * D1) / deaths[:, None]
+    return X[event_rows] - mean[event_group]
+
+
+def schoenfeld_residuals(X_sorted, index, beta, ties="efron", max_workers=None):
+    #unscaled residuals of the event rows; X_sorted rows must be in index.order
+    X = X_sorted - X_sorted.mean(axis=0) #residuals are shift-invariant; centring keeps exp() well scaled
+    eta = X @ beta
+    #per event time: a = sum over tie slots of 1/phi, b = sum of f/phi, as in partial_likelihood
+    w, _, (a, b, *_) = tie_terms(eta, eta.max() if eta.size else 0.0, index, ties)
+    event_rows = np.flatnonzero(index.E > 0)
+    event_group = index.groups_upto[event_rows] - 1
+    deaths = index.deaths.astype(np.float64)
+
+    blocks = [slice(start, start + COLUMN_BLOCK) for start in range(0, X.shape[1], COLUMN_BLOCK)]
+    if len(blocks) == 1:
+        return _schoenfeld_block(X, index, w, a, b, event_rows, event_group, deaths)
+    with ThreadPoolExecutor(max_workers=min(len(blocks), max_workers or default_workers())) as executor:
+        parts = executor.map(lambda cols: _schoenfeld_block(X[:, cols], index, w, a, b, event_rows, event_group, deaths), blocks)
+        return np.hstack(list(parts))
+
+
+def _time_transforms(index):
+    #each transform evaluated at the event rows: identity, log, 1 - Kaplan-Meier, and lifelines' rank (cumsum of events)
+    event_rows = np.flatnonzero(index.E > 0)
+    event_group = index.groups_upto[event_rows] - 1
+    at_risk = len(index.T) - index.risk_start
+    survival = np.cumprod(1.0 - index.deaths / at_risk)
+    t = index.T[event_rows]
+    with np.errstate(divide="ignore"):
+        log_t = np.log(t)
+    return {
+        "identity": t,
+        "log": np.where(np.isfinite(log_t), log_t, np.nan),
+        "km": 1.0 - survival[event_group],
+        "rank": np.cumsum(index.E)[event_rows],
+    }
+
+
+def scaled_schoenfeld(model, fit_df, duration_col, event_col, max_workers=None):
+    #cached per model: the residuals belong to the data the model was fitted on
+    cached = _residual_cache.get(model)
+    if cached is not None:
+        return cached
+    with stage("scaled Schoenfeld residuals", rows=len(fit_df)):
+        return _scaled_schoenfeld(model, fit_df, duration_col, event_col, max_workers)
+
+
+def _scaled_schoenfeld(model, fit_df, duration_col, event_col, max_workers):
+    covariates = list(model.params_.index)
+    T = fit_df[duration_col].to_numpy(dtype=np.float64)
+    E = fit_df[event_col].to_numpy(dtype=np.float64)
+    #same row order as lifelines (by duration, then event) so the rank transform matches
+    order = np.lexsort((E, T))
+    index = RiskSetIndex(T[order], E[order])
+    X_sorted = fit_df[covariates].to_numpy(dtype=np.float64)[order]
+    beta = model.params_.to_numpy(dtype=np.float64)
+    residuals = schoenfeld_residuals(X_sorted, index, beta, getattr(model, "ties", "efron"), max_workers)
+    n_deaths = float(index.E.sum())
+    variance = model.variance_matrix_.loc[covariates, covariates].to_numpy(dtype=np.float64)
+    result = PHResiduals(covariates, n_deaths * residuals @ variance, _time_transforms(index), n_deaths,
+                         model.standard_errors_.loc[covariates].to_numpy(dtype=np.float64))
+    _residual_cache[model] = result
+    return result
+
+
+def proportional_hazard_table(model, fit_df, duration_col, event_col, transforms=TIME_TRANSFORMS, max_workers=None):
+    #one row per covariate: test statistic and p-value under each time transform
+    residuals = scaled_schoenfeld(model, fit_df, duration_col, event_col, max_workers)
+    with stage("PH test statistics", covariates=len(residuals.covariates), transforms=len(transforms)):
+        return _test_table(residuals, transforms)
+
+
+def _test_table(residuals, transforms):
+    G = np.column_stack([residuals.times[name] for name in transforms])
+    G = G - G.mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        statistic = (G.T @ residuals.scaled) ** 2 / (
+            residuals.n_deaths * residuals.standard_errors[None, :] ** 2 * (G ** 2).sum(axis=0)[:, None])
+    p = np.vectorize(lambda chi2: math.erfc(math.sqrt(chi2 / 2)) if chi2 == chi2 else np.nan, otypes=[float])(statistic)
+    table = pd.DataFrame(index=pd.Index(residuals.covariates, name="covariate"))
+    for k, name in enumerate(transforms):
+        table[f"chi2 ({name})"] = statistic[k]
+        table[f"p ({name})"] = p[k]
+    return table
@@ -0,0 +1,87 @@
+#Cox GUI univariate screening -- one unadjusted Cox model per candidate column, fitted on a process pool
+#the candidate matrix is placed in shared memory once; workers attach to it instead of receiving pickled data.
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+from cox_parallel import SharedMatrix, process_pool, shared
+
+SCREEN_RESULT_COLUMNS = ["covariate", "HR", "HR lower 95%", "HR upper 95%", "p", "C-index", "n used", "q (FDR)", "note"]
+
+
+def _fit_one(shm_name, j, name):
+    from lifelines import CoxPHFitter
+    matrix = shared(shm_name)
+    #column 0 is duration, 1 is event (both NaN-free); candidates start at column 2
+    x = matrix[:, j]
+    keep = ~np.isnan(x)
+    n_used = int(keep.sum())
+    row = {"covariate": name, "n used": n_used}
+    if n_used == 0:
+        row["note"] = "no valid numeric data"
+        return row
+    x = x[keep]
+    if np.all(x == x[0]):
+        row["note"] = "no variance"
+        return row
+    fit_df = pd.DataFrame({"duration": matrix[keep, 0], "event": matrix[keep, 1], "x": x})
+    try:
+        cph = CoxPHFitter().fit(fit_df, duration_col="duration", event_col="event")
+    except Exception as e:
+        row["note"] = f"fit failed: {e}"
+        return row
+    summary = cph.summary.loc["x"]
+    row.update({
+        "HR": float(summary["exp(coef)"]),
+        "HR lower 95%": float(summary["exp(coef) lower 95%"]),
+        "HR upper 95%": float(summary["exp(coef) upper 95%"]),
+        "p": float(summary["p"]),
+        "C-index": float(cph.concordance_index_),
+    })
+    return row
+
+
+def benjamini_hochberg(p_values):
+    #Benjamini-Hochberg adjusted p-values (q-values); NaNs are ignored and stay NaN
+    p = np.asarray(p_values, dtype=float)
+    q = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p))
+    m = len(valid)
+    if m == 0:
+        return q
+    order = valid[np.argsort(p[valid])]
+    ranked = p[order] * m / np.arange(1, m + 1)
+    #enforce monotonicity from the largest p downwards
+    q[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q
+
+
+def build_screening_matrix(prepared_base, candidates_frame):
+    #prepared_base: PreparedData with only duration/event (its index selects the usable rows)
+    #candidates_frame: raw candidate columns aligned on the original row index
+    candidates = candidates_frame.loc[prepared_base.frame.index]
+    matrix = np.empty((len(candidates), len(candidates.columns) + 2), dtype=np.float64)
+    matrix[:, 0] = prepared_base.frame[prepared_base.duration_col].to_numpy(dtype=np.float64)
+    matrix[:, 1] = prepared_base.frame[prepared_base.event_col].to_numpy(dtype=np.float64)
+    for j, col in enumerate(candidates.columns):
+        matrix[:, j + 2] = pd.to_numeric(candidates[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return matrix
+
+
+def screen_univariate(matrix, names, max_workers=None, on_result=None, cancelled=None):
+    #fits every candidate column of `matrix` (see build_screening_matrix) and returns a results DataFrame
+    #with FDR q-values; on_result(row, n_done, n_total) is called as each fit finishes
+    rows = []
+    with SharedMatrix(matrix) as shm, process_pool(shm, max_workers) as executor:
+        futures = [executor.submit(_fit_one, shm.name, j + 2, name) for j, name in enumerate(names)]
+        for future in as_completed(futures):
+            if cancelled is not None and cancelled():
+                executor.shutdown(wait=True, cancel_futures=True)
+                return None
+            row = future.result()
+            rows.append(row)
+            if on_result is not None:
+                on_result(row, len(rows), len(names))
+
+    results = pd.DataFrame(rows).reindex(columns=SCREEN_RESULT_COLUMNS)
+    results["q (FDR)"] = benjamini_hochberg(results["p"].to_numpy(dtype=float, na_value=np.nan))
+    return results.sort_values("p", na_position="last").reset_index(drop=True)
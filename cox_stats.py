@@ -0,0 +1,186 @@
+#Cox GUI statistics -- fast concordance index and its bootstrap / cross-validated versions
+#concordance_index follows lifelines.utils.concordance_index exactly (same pairs, same tie handling)
+#but is fully vectorized: a bottom-up merge count over time-ordered subjects, O(n log^2 n) in numpy.
+#the extra log is the stable argsort per level, which sees two presorted runs per block and is near-linear in
+#practice; an O(n log n) variant (a stable partition per rank bit) needs random scatters at every level and
+#measured 25-40% slower at 1e6-1e7 subjects, so the merge count stays.
+from concurrent.futures import as_completed
+import numpy as np
+from cox_parallel import SharedMatrix, default_workers, process_pool, shared
+from cox_engine import ConvergenceError, NativeCoxModel, RiskSetIndex
+
+BOOTSTRAP_SEED = 20250501
+
+
+def _count_lower_before(ranks, weights):
+    #for every position j: total weight of positions i < j with ranks[i] < ranks[j].
+    #bottom-up merge sort: at each level the right half of a block is counted against the sorted left half.
+    n = len(ranks)
+    lower = np.zeros(n, dtype=np.int64)
+    if n < 2:
+        return lower
+    arrangement = np.arange(n) #original positions, sorted by rank within blocks of the current size
+    max_rank = int(ranks.max()) + 1
+    size = 1
+    while size < n:
+        is_right = (arrangement // size) & 1
+        #right before left on equal ranks so that only strictly lower left ranks are counted
+        key = ((arrangement // (2 * size)) * max_rank + ranks[arrangement]) * 2 + (1 - is_right)
+        sorter = np.argsort(key, kind="stable")
+        merged, merged_right = arrangement[sorter], is_right[sorter].astype(bool)
+        left_weight = np.where(merged_right, 0, weights[merged])
+        before = np.cumsum(left_weight) - left_weight
+        #each block pair occupies its own contiguous slice of the arrangement, starting at pair * 2 * size
+        pair_start = (np.flatnonzero(merged_right) // (2 * size)) * (2 * size)
+        lower[merged[merged_right]] += before[merged_right] - before[pair_start]
+        arrangement = merged
+        size *= 2
+    return lower
+
+
+def concordance_summary(event_times, predicted_scores, event_observed):
+    #(correct, tied, pairs) with lifelines' conventions: subject i (event) and j are comparable when
+    #T_i < T_j, or T_i == T_j and j is censored; correct when j's predicted score is higher
+    T = np.asarray(event_times, dtype=np.float64)
+    scores = np.asarray(predicted_scores, dtype=np.float64)
+    E = np.asarray(event_observed).astype(bool)
+    if not E.any():
+        return 0, 0, 0
+    _, time_rank = np.unique(T, return_inverse=True)
+    #deaths at a time come before censorings at that time
+    group = time_rank * 2 + (~E)
+    _, score_rank = np.unique(scores, return_inverse=True)
+    #time order, and highest score first inside a group so no within-group pair counts as "lower"
+    order = np.lexsort((-score_rank, group))
+    group, score_rank, deaths = group[order], score_rank[order], E[order].astype(np.int64)
+
+    correct = int(_count_lower_before(score_rank, deaths).sum())
+
+    #ties: earlier deaths with an equal score, minus equal-score pairs inside a single death group
+    by_score = np.lexsort((np.arange(len(score_rank)), score_rank))
+    run_start = np.searchsorted(score_rank[by_score], score_rank[by_score], side="left")
+    deaths_by_score = deaths[by_score]
+    before = np.cumsum(deaths_by_score) - deaths_by_score
+    tied = int((before - before[run_start]).sum())
+    death_groups = group[deaths == 1] * (int(score_rank.max()) + 1) + score_rank[deaths == 1]
+    _, same = np.unique(death_groups, return_counts=True)
+    tied -= int((same * (same - 1) // 2).sum())
+
+    #pairs: every subject against all deaths in strictly earlier groups
+    _, group_index, group_counts = np.unique(group, return_inverse=True, return_counts=True)
+    deaths_per_group = np.bincount(group_index, weights=deaths).astype(np.int64)
+    earlier_deaths = np.cumsum(deaths_per_group) - deaths_per_group
+    pairs = int((earlier_deaths * group_counts).sum())
+    return correct, tied, pairs
+
+
+def concordance_index(event_times, predicted_scores, event_observed=None):
+    #drop-in for lifelines.utils.concordance_index (higher score = longer predicted survival)
+    if event_observed is None:
+        event_observed = np.ones(len(event_times))
+    correct, tied, pairs = concordance_summary(event_times, predicted_scores, event_observed)
+    if pairs == 0:
+        raise ZeroDivisionError("No admissable pairs in the dataset.")
+    return (correct + 0.5 * tied) / pairs
+
+
+def chi2_sf(statistic, df):
+    #upper tail of the chi-squared distribution, for likelihood-ratio and heterogeneity tests
+    from scipy.special import gammaincc #deferred like lifelines (scipy is one of its dependencies)
+    return float(gammaincc(df / 2, statistic / 2))
+
+
+def _fit_params(T, E, X, ties="efron"):
+    index = RiskSetIndex(T, E)
+    model = NativeCoxModel(ties).fit_arrays(X[index.order], index, [f"x{j}" for j in range(X.shape[1])])
+    return model.params_.to_numpy()
+
+
+def _bootstrap_replicates(shm_name, seed, replicates, ties):
+    #matrix columns: duration, event, covariates. returns (C on the bootstrap sample, C of that model on the original data)
+    matrix = shared(shm_name)
+    T, E, X = matrix[:, 0], matrix[:, 1], matrix[:, 2:]
+    n = len(T)
+    results = []
+    for b in replicates:
+        #one generator per replicate: results do not depend on how replicates are spread over workers
+        rng = np.random.default_rng([seed, b])
+        sample = rng.integers(0, n, n)
+        try:
+            beta = _fit_params(T[sample], E[sample], X[sample], ties)
+            c_boot = concordance_index(T[sample], -(X[sample] @ beta), E[sample])
+            c_orig = concordance_index(T, -(X @ beta), E)
+        except Exception:
+            #failed fit or no comparable pairs: the replicate is left out
+            results.append((np.nan, np.nan))
+            continue
+        results.append((c_boot, c_orig))
+    return results
+
+
+def _cv_fold(shm_name, seed, fold, n_folds, ties):
+    #(fold, C on the held-out rows, None) or, if the fold cannot be scored, (fold, nan, the reason)
+    matrix = shared(shm_name)
+    T, E, X = matrix[:, 0], matrix[:, 1], matrix[:, 2:]
+    folds = np.random.default_rng(seed).permutation(len(T)) % n_folds
+    train, test = folds != fold, folds == fold
+    try:
+        beta = _fit_params(T[train], E[train], X[train], ties)
+        return fold, concordance_index(T[test], -(X[test] @ beta), E[test]), None
+    except (ConvergenceError, np.linalg.LinAlgError) as e:
+        return fold, np.nan, f"fit failed: {e}"
+    except ZeroDivisionError:
+        return fold, np.nan, "no comparable pairs in the held-out rows"
+
+
+def validate_concordance(T, E, X, n_bootstrap=200, n_folds=5, seed=BOOTSTRAP_SEED, ties="efron",
+                         max_workers=None, progress=None, cancelled=None):
+    #apparent C, bootstrap mean / 95% percentile CI, Harrell's optimism-corrected C and k-fold CV C.
+    #replicates are refitted with the native engine and spread over a process pool in batches.
+    #like failed bootstrap replicates, folds that cannot be scored are left out and listed in cv_failures
+    matrix = np.column_stack([T, E, X]).astype(np.float64)
+    apparent = concordance_index(T, -(X @ _fit_params(T, E, X, ties)), E)
+    boot, cv, cv_failures = [], [], []
+    max_workers = max_workers or default_workers()
+    with SharedMatrix(matrix) as shm, process_pool(shm, max_workers) as executor:
+        n_batches = max(1, min(n_bootstrap, 4 * max_workers))
+        batches = [list(batch) for batch in np.array_split(np.arange(n_bootstrap), n_batches) if len(batch)]
+        futures = {executor.submit(_bootstrap_replicates, shm.name, seed, batch, ties): len(batch) for batch in batches}
+        futures.update({executor.submit(_cv_fold, shm.name, seed, fold, n_folds, ties): None for fold in range(n_folds)})
+        done, total = 0, n_bootstrap + n_folds
+        for future in as_completed(futures):
+            if cancelled is not None and cancelled():
+                executor.shutdown(wait=True, cancel_futures=True)
+                return None
+            if futures[future] is None:
+                fold, c_index, failure = future.result()
+                if failure is None:
+                    cv.append(c_index)
+                else:
+                    cv_failures.append((fold, failure))
+                done += 1
+            else:
+                boot.extend(future.result())
+                done += futures[future]
+            if progress is not None:
+                progress(done / total)
+
+    boot = np.array(boot, dtype=np.float64).reshape(-1, 2)
+    boot = boot[~np.isnan(boot).any(axis=1)]
+    #fixed order, so the summaries do not depend on which batch finished first
+    boot = boot[np.lexsort(boot.T[::-1])]
+    optimism = float(np.mean(boot[:, 0] - boot[:, 1])) if len(boot) else np.nan
+    return {
+        "apparent": apparent,
+        "bootstrap_mean": float(np.mean(boot[:, 0])) if len(boot) else np.nan,
+        "bootstrap_ci": tuple(float(v) for v in np.percentile(boot[:, 0], [2.5, 97.5])) if len(boot) else (np.nan, np.nan),
+        "optimism": optimism,
+        "optimism_corrected": apparent - optimism,
+        "n_bootstrap": len(boot),
+        "cv_mean": float(np.mean(cv)) if cv else np.nan,
+        "cv_sd": float(np.std(cv, ddof=1)) if len(cv) > 1 else np.nan,
+        "cv_folds": sorted(float(c) for c in cv),
+        "n_cv_folds": len(cv),
+        "cv_failures": sorted(cv_failures),
+        "seed": seed,
+    }
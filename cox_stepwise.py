@@ -0,0 +1,211 @@
+#Cox GUI incremental refits and stepwise selection -- models over changing covariate sets on one prepared design
+#DesignMatrix keeps the duration-sorted columns, the risk-set index and the last coefficients between fits, so a
+#model that adds or drops a few covariates is a column slice plus a warm-started Newton-Raphson (a few iterations)
+#instead of a preparation, a sort and a cold fit. stepwise selection (forward, backward or both, likelihood-ratio
+#tests) is built on such refits; each step's candidate models run on the process pool.
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+from cox_engine import ConvergenceError, NativeCoxModel, RiskSetIndex, null_log_likelihood
+from cox_parallel import SharedMatrix, default_workers, process_pool, shared
+from cox_stats import chi2_sf
+from cox_trace import stage
+
+DESIGN_MAX_BYTES = 1024 * 1024 * 1024 #sorted covariate columns kept between fits; least recently used go first
+STEPWISE_DIRECTIONS = ("forward", "backward", "both")
+STEP_RESULT_COLUMNS = ["step", "action", "covariate", "LR chi2", "df", "p", "log-likelihood", "AIC", "covariates"]
+
+#per-process risk-set indexes of attached design matrices, keyed by shared block name
+_worker_indexes = {}
+
+
+class DesignMatrix:
+    #one prepared frame's rows, sorted by duration once; covariate columns are added on first use
+    def __init__(self, frame, duration_col, event_col, max_bytes=DESIGN_MAX_BYTES):
+        self.duration_col = duration_col
+        self.event_col = event_col
+        self.rows = frame.index
+        self.index = RiskSetIndex(frame[duration_col].to_numpy(dtype=np.float64), frame[event_col].to_numpy(dtype=np.float64))
+        self.max_bytes = max_bytes
+        self.columns = {} #covariate -> float64 values in index order (insertion order = least recently used first)
+        self.medians = {}
+        self.coefs = {} #ties -> {covariate: coefficient} of the last fit, the warm start for the next
+
+    def matches(self, frame, duration_col, event_col):
+        #same outcome columns and exactly the same rows: the sorted columns can be reused
+        return (duration_col, event_col) == (self.duration_col, self.event_col) and frame.index.equals(self.rows)
+
+    def add_columns(self, frame, covariates):
+        for col in covariates:
+            if col in self.columns:
+                self.columns[col] = self.columns.pop(col)
+                continue
+            values = frame[col].to_numpy(dtype=np.float64)[self.index.order]
+            self.columns[col] = values
+            self.medians.setdefault(col, float(np.median(values)))
+        in_use = set(covariates)
+        n_bytes = 8 * len(self.rows) * len(self.columns)
+        for col in list(self.columns):
+            if n_bytes <= self.max_bytes:
+                break
+            if col not in in_use:
+                del self.columns[col]
+                n_bytes -= 8 * len(self.rows)
+
+    def matrix(self, covariates, with_outcome=False):
+        columns = ([self.index.T, self.index.E] if with_outcome else []) + [self.columns[col] for col in covariates]
+        return np.column_stack(columns)
+
+    def warm_start(self, covariates, ties):
+        #the last fitted coefficient of every covariate that had one, zero for the rest; None if nothing is shared
+        last = self.coefs.get(ties, {})
+        if not any(col in last for col in covariates):
+            return None
+        return [last.get(col, 0.0) for col in covariates]
+
+    def fit(self, covariates, ties="efron", initial_point=None):
+        #covariates must have been added; returns a NativeCoxModel like fit_cox_model's
+        covariates = list(covariates)
+        if initial_point is None:
+            initial_point = self.warm_start(covariates, ties)
+        with stage(f"refit (native {ties})", rows=len(self.rows), covariates=len(covariates)) as span:
+            model = NativeCoxModel(ties).fit_arrays(self.matrix(covariates), self.index, covariates, initial_point=initial_point)
+            span.args["iterations"] = model.iterations_
+            span.args["warm_start"] = initial_point is not None
+        model._central_values = pd.DataFrame([[self.medians[col] for col in covariates]], index=["baseline"], columns=covariates)
+        self.coefs[ties] = dict(zip(covariates, model.params_.to_numpy()))
+        return model
+
+
+def _fit_candidate(shm_name, key, positions, initial_point, ties):
+    #(key, log-likelihood, coefficients) of one candidate model; columns 0 and 1 are the sorted duration and event
+    matrix = shared(shm_name)
+    index = _worker_indexes.get(shm_name)
+    if index is None:
+        index = _worker_indexes[shm_name] = RiskSetIndex(matrix[:, 0], matrix[:, 1])
+    if not positions:
+        return key, null_log_likelihood(index, ties), np.zeros(0)
+    try:
+        model = NativeCoxModel(ties).fit_arrays(matrix[:, [2 + j for j in positions]], index,
+                                                [str(j) for j in positions], initial_point=initial_point)
+    except (ConvergenceError, np.linalg.LinAlgError):
+        return key, np.nan, None
+    return key, float(model.log_likelihood_), model.params_.to_numpy()
+
+
+def _aic(loglik, k):
+    return 2 * k - 2 * loglik
+
+
+def stepwise_select(design, candidates, ties="efron", direction="both", start=None, alpha_enter=0.05, alpha_remove=0.10,
+                    max_steps=None, max_workers=None, on_step=None, cancelled=None):
+    #candidates must have been added to design. forward adds the candidate with the smallest likelihood-ratio p while
+    #it is below alpha_enter; backward drops the one with the largest p while above alpha_remove; both does a
+    #forward step, then backward steps, until neither applies. every comparison is on the same rows, one df each.
+    #returns (steps DataFrame, selected covariates); on_step(row) is called as each step is taken
+    if direction not in STEPWISE_DIRECTIONS:
+        raise ValueError(f"direction must be one of {STEPWISE_DIRECTIONS}")
+    if direction == "both" and alpha_enter > alpha_remove:
+        raise ValueError("alpha_enter must not exceed alpha_remove, or a covariate could enter and leave forever")
+    candidates = list(candidates)
+    position = {col: j for j, col in enumerate(candidates)}
+    if start is None:
+        start = [] if direction != "backward" else candidates
+    current = [col for col in candidates if col in set(start)]
+    max_steps = max_steps if max_steps is not None else 2 * len(candidates) + 1
+    steps = []
+
+    with SharedMatrix(design.matrix(candidates, with_outcome=True)) as shm, process_pool(shm, max_workers or default_workers()) as executor:
+        def evaluate(models):
+            #{key: (loglik, coefs)} for {key: (covariates, warm start)}, fitted on the pool
+            futures = [executor.submit(_fit_candidate, shm.name, key, [position[col] for col in covariates], initial, ties)
+                       for key, (covariates, initial) in models.items()]
+            results = {}
+            for future in as_completed(futures):
+                if cancelled is not None and cancelled():
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    return None
+                key, loglik, coefs = future.result()
+                results[key] = (loglik, coefs)
+            return results
+
+        first = evaluate({None: (current, design.warm_start(current, ties))})
+        if first is None:
+            return None
+        loglik, coefs = first[None]
+        if not np.isfinite(loglik):
+            raise ConvergenceError("the starting model did not converge")
+        current_coefs = dict(zip(current, coefs))
+        steps.append({"step": 0, "action": "start", "covariate": None, "log-likelihood": loglik,
+                      "AIC": _aic(loglik, len(current)), "covariates": ", ".join(current)})
+        if on_step is not None:
+            on_step(steps[-1])
+
+        def take(action, col, statistic, p, new_loglik, new_coefs, covariates):
+            nonlocal loglik, current, current_coefs
+            loglik, current = new_loglik, covariates
+            current_coefs = dict(zip(covariates, new_coefs))
+            steps.append({"step": len(steps), "action": action, "covariate": col, "LR chi2": statistic, "df": 1, "p": p,
+                          "log-likelihood": loglik, "AIC": _aic(loglik, len(current)), "covariates": ", ".join(current)})
+            if on_step is not None:
+                on_step(steps[-1])
+
+        def forward():
+            #warm start: the current coefficients, zero for the entering covariate
+            models = {}
+            for col in candidates:
+                if col not in current:
+                    covariates = [c for c in candidates if c in current or c == col]
+                    models[col] = (covariates, [current_coefs.get(c, 0.0) for c in covariates])
+            results = evaluate(models) if models else {}
+            if results is None:
+                return None
+            best = None
+            for col, (new_loglik, new_coefs) in results.items():
+                if not np.isfinite(new_loglik):
+                    continue
+                statistic = max(2 * (new_loglik - loglik), 0.0)
+                p = chi2_sf(statistic, 1)
+                if best is None or p < best[2] or (p == best[2] and statistic > best[1]):
+                    best = (col, statistic, p, new_loglik, new_coefs, models[col][0])
+            if best is None or best[2] >= alpha_enter:
+                return False
+            take("add", *best)
+            return True
+
+        def backward():
+            models = {}
+            for col in current:
+                covariates = [c for c in current if c != col]
+                models[col] = (covariates, [current_coefs[c] for c in covariates])
+            results = evaluate(models) if models else {}
+            if results is None:
+                return None
+            worst = None
+            for col, (new_loglik, new_coefs) in results.items():
+                if not np.isfinite(new_loglik):
+                    continue
+                statistic = max(2 * (loglik - new_loglik), 0.0)
+                p = chi2_sf(statistic, 1)
+                if worst is None or p > worst[2] or (p == worst[2] and statistic < worst[1]):
+                    worst = (col, statistic, p, new_loglik, new_coefs, models[col][0])
+            if worst is None or worst[2] <= alpha_remove:
+                return False
+            take("remove", *worst)
+            return True
+
+        while len(steps) <= max_steps:
+            moved = backward() if direction == "backward" else forward()
+            if moved is None:
+                return None
+            if not moved:
+                break
+            removed = direction == "both"
+            while removed and len(steps) <= max_steps:
+                removed = backward()
+                if removed is None:
+                    return None
+
+    #the selected model's coefficients warm-start the next refit in the GUI
+    design.coefs[ties] = dict(current_coefs)
+    return pd.DataFrame(steps).reindex(columns=STEP_RESULT_COLUMNS), current
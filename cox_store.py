@@ -0,0 +1,167 @@
+#Cox GUI result store -- fitted models on disk, addressed by a hash of the data they were fitted on and the model spec
+#an identical refit (same prepared columns, same spec and engine) is read back instead of recomputed. entries are
+#self-contained .npz files, so stored results also open without the data; least recently used entries are evicted.
+import glob
+import hashlib
+import json
+import os
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+import cox_data
+from cox_engine import NativeCoxModel
+
+STORE_MAX_BYTES = 256 * 1024 * 1024
+#bump when the stored layout or the key recipe changes; older entries are then simply never hit
+STORE_VERSION = 1
+#covariate quantiles kept with each model, so partial-effect plots of a stored model need no data
+STORED_QUANTILES = [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]
+
+
+def store_dir():
+    #resolved at call time so that overriding cox_data.CACHE_DIR moves the store too
+    return os.path.join(cox_data.CACHE_DIR, "models")
+
+
+def model_key(fit_df, duration_col, event_col, covariates, ties=None):
+    #content address: the spec plus a hash of every value of every column the model sees, in row order
+    digest = hashlib.sha256()
+    spec = {"version": STORE_VERSION, "duration": duration_col, "event": event_col,
+            "covariates": list(covariates), "engine": ties or "lifelines"}
+    digest.update(json.dumps(spec, sort_keys=True).encode("utf-8"))
+    for col in [duration_col, event_col] + list(covariates):
+        column = fit_df[col]
+        digest.update(f"{col}:{column.dtype}:{len(column)}".encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(column, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:32]
+
+
+class StoredCoxModel(NativeCoxModel):
+    #a model read back from the store; summary, predictions, PH test and partial-effect plots work as for a fresh fit
+    def __init__(self, arrays, meta):
+        super().__init__(meta["ties"] or "efron")
+        covariates = meta["covariates"]
+        self.meta = meta
+        self.engine = meta["engine"]
+        self.covariates = covariates
+        self._summary = pd.DataFrame(arrays["summary"], index=pd.Index(covariates, name="covariate"), columns=meta["summary_columns"])
+        self.params_ = pd.Series(arrays["params"], index=covariates, name="coef")
+        self.variance_matrix_ = pd.DataFrame(arrays["variance"], index=covariates, columns=covariates)
+        self.standard_errors_ = self._summary["se(coef)"].rename("se(coef)")
+        self._norm_mean = arrays["norm_mean"]
+        self._central_values = pd.DataFrame([arrays["central"]], index=["baseline"], columns=covariates)
+        self.baseline_cumulative_hazard_ = pd.DataFrame({"baseline cumulative hazard": arrays["hazard"]},
+                                                        index=pd.Index(arrays["timeline"], name="timeline"))
+        self.log_likelihood_ = meta["log_likelihood"]
+        self.concordance_index_ = meta["concordance_index"]
+        self.iterations_ = 0
+        #None for entries saved without their data's quantiles
+        self.quantiles_ = (pd.DataFrame(arrays["quantiles"], index=STORED_QUANTILES, columns=covariates)
+                           if "quantiles" in arrays else None)
+
+    @property
+    def summary(self):
+        return self._summary
+
+
+def save_model(key, model, concordance_index, info=None, max_bytes=None, fit_df=None):
+    #info: extra JSON-able metadata shown when browsing the store (data file, row counts, ...);
+    #fit_df: the data the model was fitted on, for the covariate quantiles (see StoredCoxModel.quantiles_)
+    covariates = list(model.params_.index)
+    summary = model.summary
+    hazard = model.baseline_cumulative_hazard_.iloc[:, 0]
+    norm_mean = model._norm_mean.loc[covariates] if isinstance(model._norm_mean, pd.Series) else model._norm_mean
+    ties = model.ties if isinstance(model, NativeCoxModel) else None
+    meta = dict(info or {})
+    meta.update({
+        "key": key,
+        "created": time.time(),
+        "engine": getattr(model, "engine", ties or "lifelines"),
+        "ties": ties,
+        "covariates": covariates,
+        "summary_columns": list(summary.columns),
+        "log_likelihood": float(model.log_likelihood_),
+        "concordance_index": None if concordance_index is None else float(concordance_index),
+    })
+    directory = store_dir()
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"{key}.tmp.npz")
+    extra = {}
+    if fit_df is not None:
+        #one column at a time: no n x p copy of the fit data just to save a model
+        extra["quantiles"] = np.column_stack([np.quantile(fit_df[col].to_numpy(dtype=np.float64), STORED_QUANTILES)
+                                              for col in covariates])
+    np.savez_compressed(
+        tmp_path,
+        params=model.params_.to_numpy(dtype=np.float64),
+        variance=model.variance_matrix_.loc[covariates, covariates].to_numpy(dtype=np.float64),
+        norm_mean=np.asarray(norm_mean, dtype=np.float64),
+        central=model._central_values[covariates].iloc[0].to_numpy(dtype=np.float64),
+        summary=summary.to_numpy(dtype=np.float64),
+        timeline=hazard.index.to_numpy(dtype=np.float64),
+        hazard=hazard.to_numpy(dtype=np.float64),
+        meta=np.array(json.dumps(meta)),
+        **extra,
+    )
+    os.replace(tmp_path, os.path.join(directory, f"{key}.npz"))
+    evict(max_bytes)
+    return meta
+
+
+def load_model(key):
+    #None when there is no (readable) entry for key
+    path = os.path.join(store_dir(), f"{key}.npz")
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            arrays = {name: stored[name] for name in stored.files}
+        model = StoredCoxModel(arrays, json.loads(str(arrays["meta"])))
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        #unreadable or from an incompatible layout: drop it so it gets rewritten
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    os.utime(path) #mark as recently used for eviction
+    return model
+
+
+def list_models():
+    #metadata of every stored model, most recently used first; only the small meta array is read from each file
+    entries = []
+    for path in glob.glob(os.path.join(store_dir(), "*.npz")):
+        if path.endswith(".tmp.npz"):
+            continue
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                meta = json.loads(str(stored["meta"]))
+            meta["used"] = os.path.getmtime(path)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            continue
+        entries.append(meta)
+    entries.sort(key=lambda meta: meta["used"], reverse=True)
+    return entries
+
+
+def evict(max_bytes=None):
+    #drop least recently used entries until the store fits in max_bytes; the newest entry is always kept
+    max_bytes = max_bytes if max_bytes is not None else STORE_MAX_BYTES
+    entries = []
+    for path in glob.glob(os.path.join(store_dir(), "*.npz")):
+        try:
+            entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        except OSError:
+            continue
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries[:-1]:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,138 @@
+#Cox GUI fit by group -- the same model fitted separately in every level of a grouping column, plus pooled estimates
+#the prepared rows are sorted by group once and placed in shared memory; each worker fits one contiguous slice with
+#the native engine. per covariate, the group estimates are pooled by inverse variance (fixed effect) and
+#DerSimonian-Laird (random effects), with Cochran's Q, I^2 and tau^2 for heterogeneity.
+import math
+from concurrent.futures import as_completed
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from cox_engine import NativeCoxModel, RiskSetIndex
+from cox_parallel import SharedMatrix, default_workers, process_pool, shared
+from cox_stats import chi2_sf
+
+MAX_GROUPS = 500 #more levels than this almost always means a continuous column was picked
+GROUP_RESULT_COLUMNS = ["group", "covariate", "HR", "HR lower 95%", "HR upper 95%", "p", "coef", "se(coef)", "n", "events", "note"]
+POOLED_RESULT_COLUMNS = ["covariate", "groups", "HR (fixed)", "HR (fixed) lower 95%", "HR (fixed) upper 95%", "p (fixed)",
+                         "HR (random)", "HR (random) lower 95%", "HR (random) upper 95%", "p (random)",
+                         "Q", "df", "p (Q)", "I2", "tau2"]
+Z_95 = NormalDist().inv_cdf(0.975)
+
+
+class GroupPartition:
+    #duration, event and covariates as one float64 matrix with the rows of each group contiguous
+    def __init__(self, matrix, labels, offsets, covariates, dropped_rows):
+        self.matrix = matrix
+        self.labels = labels
+        self.offsets = offsets #group k is matrix[offsets[k]:offsets[k + 1]]
+        self.covariates = covariates
+        self.dropped_rows = dropped_rows
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def partition_by_group(frame, duration_col, event_col, covariates, group_values, max_groups=MAX_GROUPS):
+    #frame: a prepared (NaN-free) model frame; group_values: the grouping column on the dataset's original row index
+    groups = group_values.loc[frame.index]
+    codes, labels = pd.factorize(groups, sort=True) #missing group values get code -1
+    if len(labels) > max_groups:
+        raise ValueError(f"the grouping column has {len(labels)} distinct values (at most {max_groups} are supported)")
+    keep = codes >= 0
+    order = np.flatnonzero(keep)[np.argsort(codes[keep], kind="stable")]
+    matrix = frame[[duration_col, event_col] + list(covariates)].to_numpy(dtype=np.float64)[order]
+    offsets = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    return GroupPartition(matrix, [str(label) for label in labels], offsets, list(covariates), int((~keep).sum()))
+
+
+def _fit_group(shm_name, k, start, stop, ties):
+    #(k, coef, se, n, events, note); covariates without variance inside the group get NaN instead of failing the fit
+    block = shared(shm_name)[start:stop]
+    T, E, X = block[:, 0], block[:, 1], block[:, 2:]
+    coef = np.full(X.shape[1], np.nan)
+    se = np.full(X.shape[1], np.nan)
+    n, events = len(T), int(E.sum())
+    if events == 0:
+        return k, coef, se, n, events, "no events"
+    varying = np.flatnonzero(X.std(axis=0) > 0)
+    if len(varying) == 0:
+        return k, coef, se, n, events, "no covariate varies in this group"
+    index = RiskSetIndex(T, E)
+    try:
+        model = NativeCoxModel(ties).fit_arrays(X[index.order][:, varying], index, [f"x{j}" for j in varying])
+    except Exception as e:
+        return k, coef, se, n, events, f"fit failed: {e}"
+    coef[varying] = model.params_.to_numpy()
+    se[varying] = model.standard_errors_.to_numpy()
+    note = "" if len(varying) == X.shape[1] else f"{X.shape[1] - len(varying)} covariate(s) constant in this group"
+    return k, coef, se, n, events, note
+
+
+def _hr_row(coef, se, hr="HR", p="p"):
+    with np.errstate(over="ignore"): #a separated group can have a huge coefficient; its HR is then inf
+        lower, estimate, upper = np.exp([coef - Z_95 * se, coef, coef + Z_95 * se])
+    return {hr: float(estimate), f"{hr} lower 95%": float(lower), f"{hr} upper 95%": float(upper),
+            p: math.erfc(abs(coef / se) / math.sqrt(2)) if se > 0 else np.nan}
+
+
+def group_rows(partition, k, coef, se, n, events, note):
+    #long format: one row per (group, covariate), as shown in the results table
+    rows = []
+    for j, covariate in enumerate(partition.covariates):
+        row = {"group": partition.labels[k], "covariate": covariate, "coef": coef[j], "se(coef)": se[j],
+               "n": n, "events": events, "note": note}
+        if np.isfinite(coef[j]) and np.isfinite(se[j]):
+            row.update(_hr_row(coef[j], se[j]))
+        rows.append(row)
+    return rows
+
+
+def fit_by_group(partition, ties="efron", max_workers=None, on_result=None, cancelled=None):
+    #(per-group DataFrame, pooled DataFrame); on_result(rows, n_done, n_total) is called as each group finishes
+    n_groups = len(partition)
+    coefs = np.full((n_groups, len(partition.covariates)), np.nan)
+    ses = np.full_like(coefs, np.nan)
+    rows_by_group = [None] * n_groups
+    max_workers = min(max_workers or default_workers(), max(n_groups, 1))
+    with SharedMatrix(partition.matrix) as shm, process_pool(shm, max_workers) as executor:
+        futures = [executor.submit(_fit_group, shm.name, k, int(partition.offsets[k]), int(partition.offsets[k + 1]), ties)
+                   for k in range(n_groups)]
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            if cancelled is not None and cancelled():
+                executor.shutdown(wait=True, cancel_futures=True)
+                return None
+            k, coef, se, n, events, note = future.result()
+            coefs[k], ses[k] = coef, se
+            rows_by_group[k] = group_rows(partition, k, coef, se, n, events, note)
+            if on_result is not None:
+                on_result(rows_by_group[k], n_done, n_groups)
+    per_group = pd.DataFrame([row for rows in rows_by_group for row in rows]).reindex(columns=GROUP_RESULT_COLUMNS)
+    return per_group, pool_estimates(partition.covariates, coefs, ses)
+
+
+def pool_estimates(covariates, coefs, ses):
+    #coefs, ses: (groups x covariates); groups where a covariate has no finite estimate are left out for it
+    rows = []
+    for j, covariate in enumerate(covariates):
+        usable = np.isfinite(coefs[:, j]) & np.isfinite(ses[:, j]) & (ses[:, j] > 0)
+        beta, variance = coefs[usable, j], ses[usable, j] ** 2
+        row = {"covariate": covariate, "groups": int(usable.sum())}
+        if len(beta) == 0:
+            rows.append(row)
+            continue
+        w = 1.0 / variance
+        fixed = float(np.sum(w * beta) / np.sum(w))
+        fixed_se = math.sqrt(1.0 / np.sum(w))
+        row.update(_hr_row(fixed, fixed_se, "HR (fixed)", "p (fixed)"))
+        df = len(beta) - 1
+        Q = float(np.sum(w * (beta - fixed) ** 2))
+        #DerSimonian-Laird between-group variance
+        tau2 = max(0.0, (Q - df) / (np.sum(w) - np.sum(w ** 2) / np.sum(w))) if df > 0 else 0.0
+        w_random = 1.0 / (variance + tau2)
+        random = float(np.sum(w_random * beta) / np.sum(w_random))
+        random_se = math.sqrt(1.0 / np.sum(w_random))
+        row.update(_hr_row(random, random_se, "HR (random)", "p (random)"))
+        row.update({"Q": Q, "df": df, "p (Q)": chi2_sf(Q, df) if df > 0 else np.nan,
+                    "I2": max(0.0, (Q - df) / Q) if Q > 0 else 0.0, "tau2": tau2})
+        rows.append(row)
+    return pd.DataFrame(rows).reindex(columns=POOLED_RESULT_COLUMNS)
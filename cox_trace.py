@@ -0,0 +1,185 @@
+#Cox GUI stage tracing -- wall time, peak memory and row counts for each stage of a run, exportable as a Chrome trace
+#library code marks its stages with `with cox_trace.stage("name", rows=n):`; while tracing is off that costs one
+#attribute check. stages nest per thread. open an exported file in chrome://tracing or https://ui.perfetto.dev.
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_MAX_ROOTS = 1_000 #oldest finished top-level stages are dropped beyond this
+TRACE_MAX_CHILDREN = 1_000 #per stage; e.g. a screening job with one fit per column keeps the first ones only
+
+
+class Span:
+    #one finished (or running) stage; rows and args may be filled in from inside the `with` block
+    def __init__(self, name, parent, start, rows=None, args=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.start = start
+        self.seconds = None
+        self.rows = rows
+        self.args = args or {}
+        self.peak_bytes = None
+        self.dropped_children = 0
+        self.thread = threading.current_thread().name
+        self.thread_id = threading.get_ident()
+        self._base_bytes = 0
+        self._peak_seen = 0
+
+
+_NULL_SPAN = Span("", None, 0.0) #handed out while tracing is off, so callers can set rows unconditionally
+
+
+class Tracer:
+    def __init__(self, max_roots=TRACE_MAX_ROOTS, max_children=TRACE_MAX_CHILDREN):
+        self.enabled = False
+        self.memory = False
+        self.origin = time.perf_counter()
+        self.max_children = max_children
+        self.roots_finished = 0 #running count of finished top-level spans, see roots_since
+        self._roots = deque(maxlen=max_roots)
+        self._open = [] #all running spans, every thread: a memory peak reset must be credited to each
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def start(self, memory=False):
+        #memory=True runs tracemalloc (numpy buffers included); that slows allocation-heavy stages noticeably
+        self.enabled = True
+        if not memory and self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.memory = memory and tracemalloc.is_tracing()
+
+    def stop(self):
+        self.enabled = False
+        self.memory = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def clear(self):
+        with self._lock:
+            self._roots.clear()
+            self.roots_finished = 0
+
+    @contextmanager
+    def stage(self, name, rows=None, **args):
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = Span(name, stack[-1] if stack else None, time.perf_counter(), rows, args)
+        with self._lock:
+            if self.memory:
+                #peaks are process-wide; fold the peak so far into every running span before resetting it
+                current, peak = tracemalloc.get_traced_memory()
+                for other in self._open:
+                    other._peak_seen = max(other._peak_seen, peak)
+                tracemalloc.reset_peak()
+                span._base_bytes = span._peak_seen = current
+            self._open.append(span)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - span.start
+            stack.pop()
+            with self._lock:
+                self._open.remove(span)
+                if self.memory:
+                    span._peak_seen = max(span._peak_seen, tracemalloc.get_traced_memory()[1])
+                    span.peak_bytes = span._peak_seen - span._base_bytes
+                    if span.parent is not None:
+                        span.parent._peak_seen = max(span.parent._peak_seen, span._peak_seen)
+                if span.parent is None:
+                    self._roots.append(span)
+                    self.roots_finished += 1
+                elif len(span.parent.children) < self.max_children:
+                    span.parent.children.append(span)
+                else:
+                    span.parent.dropped_children += 1
+
+    def roots_since(self, count):
+        #top-level spans finished after roots_finished was `count`; returns (spans, new count)
+        with self._lock:
+            new = min(self.roots_finished - count, len(self._roots))
+            return list(self._roots)[len(self._roots) - new:], self.roots_finished
+
+
+TRACER = Tracer()
+
+
+def stage(name, rows=None, **args):
+    return TRACER.stage(name, rows, **args)
+
+
+def format_breakdown(roots, min_seconds=0.0005):
+    #compact indented table; stages faster than min_seconds are folded into their parent
+    lines = []
+
+    def add(span, depth):
+        label = ("  " * depth + span.name)[:40]
+        line = f"{label:<40} {span.seconds:9.3f} s"
+        if span.peak_bytes is not None:
+            line += f"  peak {span.peak_bytes / 1e6:9.1f} MB"
+        if span.rows is not None:
+            line += f"  {span.rows:>12,} rows"
+        lines.append(line)
+        for child in span.children:
+            if child.seconds >= min_seconds:
+                add(child, depth + 1)
+        if span.dropped_children:
+            lines.append("  " * (depth + 1) + f"(+{span.dropped_children:,} more stages not recorded)")
+
+    for root in roots:
+        add(root, 0)
+    return "\n".join(lines)
+
+
+def _walk(span):
+    yield span
+    for child in span.children:
+        yield from _walk(child)
+
+
+def chrome_trace(spans, origin, metadata=None):
+    #Trace Event Format: one complete ("X") event per stage, microseconds from the tracer's origin
+    pid = os.getpid()
+    events, threads = [], {}
+    for span in spans:
+        tid = threads.setdefault(span.thread_id, (len(threads) + 1, span.thread))[0]
+        args = dict(span.args)
+        if span.rows is not None:
+            args["rows"] = span.rows
+        if span.dropped_children:
+            args["dropped_children"] = span.dropped_children
+        if span.peak_bytes is not None:
+            args["peak_mb"] = round(span.peak_bytes / 1e6, 3)
+        events.append({"name": span.name, "cat": "cox", "ph": "X", "pid": pid, "tid": tid,
+                       "ts": round((span.start - origin) * 1e6, 1), "dur": round(span.seconds * 1e6, 1),
+                       "args": {key: value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+                                for key, value in args.items()}})
+    for tid, name in threads.values():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": metadata or {}}
+
+
+def export_chrome_trace(path, tracer=None, metadata=None):
+    #every finished stage the tracer still holds; returns the number of stages written
+    tracer = tracer or TRACER
+    with tracer._lock:
+        roots = list(tracer._roots)
+    spans = [span for root in roots for span in _walk(root)]
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(chrome_trace(spans, tracer.origin, metadata), handle)
+    return len(spans)
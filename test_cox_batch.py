@@ -0,0 +1,45 @@
+#spec validation of the batch mode: every invalid spec is reported with exit code 2 (python -m pytest)
+import json
+import pytest
+from cox_batch import SpecError, load_spec, main, validate_spec
+
+VALID = {"data": "data.csv", "duration": "week", "event": "arrest", "models": [{"covariates": ["age"]}]}
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("spec", [["not", "a", "mapping"], dict(VALID, models=["foo"]), dict(VALID, models=[["age"]])])
+def test_non_mapping_specs_are_spec_errors(spec):
+    with pytest.raises(SpecError):
+        validate_spec(spec)
+
+
+def test_non_mapping_model_exits_2(tmp_path, capsys):
+    path = _write(tmp_path, "spec.json", json.dumps(dict(VALID, models=["foo"])))
+    assert main([path, "--check"]) == 2
+    assert "Invalid spec" in capsys.readouterr().err
+
+
+def test_yaml_syntax_error_exits_2(tmp_path, capsys):
+    pytest.importorskip("yaml")
+    path = _write(tmp_path, "spec.yaml", "data: [unclosed\nmodels:\n  - name: a\n")
+    assert main([path, "--check"]) == 2
+    assert "not valid YAML" in capsys.readouterr().err
+
+
+def test_valid_spec_checks(tmp_path):
+    path = _write(tmp_path, "spec.json", json.dumps(VALID))
+    assert main([path, "--check"]) == 0
+
+
+def test_paths_are_relative_to_the_spec(tmp_path):
+    spec_dir = tmp_path / "specs"
+    spec_dir.mkdir()
+    path = _write(spec_dir, "spec.json", json.dumps(dict(VALID, output_dir="results")))
+    spec = load_spec(path)
+    assert spec["data"] == str(spec_dir / "data.csv")
+    assert spec["output_dir"] == str(spec_dir / "results")
@@ -0,0 +1,68 @@
+#parity of the native engine with lifelines.CoxPHFitter on the bundled rossi data (python -m pytest)
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from cox_engine import SUMMARY_COLUMNS, fit_cox_model
+
+pytest.importorskip("lifelines")
+
+ROSSI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example_dataset", "rossi.csv")
+COVARIATES = ["fin", "age", "race", "wexp", "mar", "paro", "prio"]
+
+
+@pytest.fixture(scope="module")
+def rossi():
+    return pd.read_csv(ROSSI)
+
+
+@pytest.fixture(scope="module")
+def rossi_untied(rossi):
+    #every duration distinct, order between different weeks kept: Efron and Breslow ties give the same model
+    df = rossi.copy()
+    df["week"] = df["week"] + np.arange(len(df)) * 1e-4
+    return df
+
+
+def _lifelines(df):
+    return fit_cox_model(df, "week", "arrest", COVARIATES, ties=None)
+
+
+def _assert_same_model(native, reference):
+    summary = reference.summary
+    summary.index = summary.index.astype(str)
+    pd.testing.assert_frame_equal(native.summary[SUMMARY_COLUMNS].drop(columns="-log2(p)"),
+                                  summary.loc[COVARIATES, SUMMARY_COLUMNS].drop(columns="-log2(p)"),
+                                  check_names=False, check_index_type=False, rtol=1e-5, atol=1e-6)
+    assert native.log_likelihood_ == pytest.approx(reference.log_likelihood_, rel=1e-10)
+    native_hazard = native.baseline_cumulative_hazard_.iloc[:, 0]
+    #lifelines also lists censoring times; compare at the event times
+    reference_hazard = reference.baseline_cumulative_hazard_.iloc[:, 0].loc[native_hazard.index]
+    np.testing.assert_allclose(native_hazard.to_numpy(), reference_hazard.to_numpy(), rtol=1e-7)
+
+
+def _breslow_loglik(df, params):
+    #the Breslow partial likelihood written out one event at a time
+    T, E = df["week"].to_numpy(), df["arrest"].to_numpy()
+    eta = df[COVARIATES].to_numpy(dtype=float) @ params
+    return sum(eta[i] - np.log(np.exp(eta[T >= T[i]]).sum()) for i in np.flatnonzero(E))
+
+
+def test_efron_matches_lifelines(rossi):
+    _assert_same_model(fit_cox_model(rossi, "week", "arrest", COVARIATES, ties="efron"), _lifelines(rossi))
+
+
+@pytest.mark.parametrize("ties", ["efron", "breslow"])
+def test_untied_matches_lifelines(rossi_untied, ties):
+    _assert_same_model(fit_cox_model(rossi_untied, "week", "arrest", COVARIATES, ties=ties), _lifelines(rossi_untied))
+
+
+def test_breslow_maximizes_breslow_likelihood(rossi):
+    #lifelines has no Breslow ties, so the tied fit is checked against the likelihood itself
+    model = fit_cox_model(rossi, "week", "arrest", COVARIATES, ties="breslow")
+    params = model.params_.to_numpy()
+    assert model.log_likelihood_ == pytest.approx(_breslow_loglik(rossi, params), rel=1e-10)
+    step = 1e-5
+    gradient = [(_breslow_loglik(rossi, params + step * e) - _breslow_loglik(rossi, params - step * e)) / (2 * step)
+                for e in np.eye(len(params))]
+    np.testing.assert_allclose(gradient, 0, atol=1e-4)